@@ -0,0 +1,79 @@
+"""Redes sintéticas para los benchmarks: estaciones en rejilla, radiales o en poligonal.
+
+Cada estación visa objetivos repartidos por la zona, de modo que varias
+estaciones ven los mismos y sus rayos se cortan. Las lecturas llevan ruido
+gaussiano en grados (ángulos) y en metros (distancias).
+"""
+from math import ceil, sqrt
+
+import numpy as np
+
+from payomapeo.core.geometry import az_inc_from_dir, eye_point
+from payomapeo.core.model import Observation, Survey
+
+LAYOUTS = ("grid", "radial", "traverse")
+
+def station_layout(layout, n_stations, spacing, rng):
+    """Posiciones (n, 3) de las estaciones."""
+    k = np.arange(n_stations)
+    if layout == "grid":
+        side = ceil(sqrt(n_stations))
+        xy = np.column_stack((k % side, k // side)) * spacing
+    elif layout == "radial":
+        # Una estación central y anillos de 8, 16, 24... a distancia creciente
+        ring = np.floor((1 + np.sqrt(k)) / 2).astype(int)
+        first = 4 * ring * (ring - 1) + 1
+        angle = 2 * np.pi * (k - first) / np.maximum(8 * ring, 1)
+        xy = np.column_stack((np.cos(angle), np.sin(angle))) * (ring * spacing)[:, None]
+    elif layout == "traverse":
+        heading = np.cumsum(rng.normal(0.0, 0.4, n_stations))
+        steps = np.column_stack((np.cos(heading), np.sin(heading))) * spacing
+        xy = np.vstack(([0.0, 0.0], np.cumsum(steps[:-1], axis=0)))
+    else:
+        raise ValueError(f"Distribución desconocida: {layout} (usa {', '.join(LAYOUTS)})")
+    z = rng.normal(0.0, spacing * 0.01, n_stations)
+    return np.column_stack((xy, z))
+
+def make_survey(layout="grid", n_stations=25, rays_per_station=20, noise=0.05, spacing=100.0,
+                segment_ratio=0.3, observer_height=1.5, seed=0):
+    """Genera un Survey sintético. `noise` es la desviación típica de los ángulos (°);
+    las distancias llevan la misma cifra en metros.
+
+    En la poligonal ("traverse") cada estación mide además la siguiente con
+    distancia, y todas salvo la primera quedan como puntos libres para el ajuste.
+    """
+    rng = np.random.default_rng(seed)
+    stations = station_layout(layout, n_stations, spacing, rng)
+    survey = Survey()
+    names = [f"S{i}" for i in range(n_stations)]
+    for i, (name, location) in enumerate(zip(names, stations.tolist())):
+        kind = "punto" if layout == "traverse" and i > 0 else "nodo"
+        survey.add_station(name, location, kind)
+
+    # Objetivos en la zona de la red; cada estación visa al azar entre los más próximos
+    lo, hi = stations[:, :2].min(axis=0) - spacing, stations[:, :2].max(axis=0) + spacing
+    n_targets = max(2, n_stations * rays_per_station // 3)
+    targets = np.column_stack((rng.uniform(lo, hi, (n_targets, 2)), rng.normal(0.0, spacing * 0.02, n_targets)))
+    pool = min(n_targets, 2 * rays_per_station)
+    for name, location in zip(names, stations):
+        eye = np.array(eye_point(location, observer_height))
+        near = np.argsort(((targets[:, :2] - location[:2]) ** 2).sum(axis=1))[:pool]
+        for t in rng.choice(near, size=min(rays_per_station, pool), replace=False):
+            d = targets[t] - eye
+            az, inc = az_inc_from_dir(d)
+            az, inc = az + rng.normal(0.0, noise), inc + rng.normal(0.0, noise)
+            distance = float(np.linalg.norm(d) + rng.normal(0.0, noise)) if rng.random() < segment_ratio else 0.0
+            survey.observe(name, az, inc, distance, observer_height, target=f"T{t}")
+
+    if layout == "traverse":
+        for a, b in zip(names, names[1:]):
+            eye = np.array(eye_point(survey.stations[a].location, observer_height))
+            d = np.array(survey.stations[b].location) - eye
+            az, inc = az_inc_from_dir(d)
+            survey.observations.append(Observation(a, b, az + rng.normal(0.0, noise), inc + rng.normal(0.0, noise),
+                                                   float(np.linalg.norm(d) + rng.normal(0.0, noise)), observer_height))
+        # Las estaciones libres parten de posiciones aproximadas
+        for name in names[1:]:
+            station = survey.stations[name]
+            survey.stations[name] = station._replace(location=tuple(np.array(station.location) + rng.normal(0.0, 1.0, 3)))
+    return survey
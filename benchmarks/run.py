@@ -0,0 +1,220 @@
+"""Benchmarks de PayoMapeo sobre redes sintéticas.
+
+Sin Blender mide el núcleo (payomapeo.core):
+
+    python benchmarks/run.py --layout grid --stations 100 --rays 20 --json base.json
+
+Dentro de Blender mide además los operadores y utilidades del addon:
+
+    blender --background --factory-startup --python benchmarks/run.py -- --layout radial --stations 20
+
+Con --compare se comparan los tiempos con un JSON anterior y el proceso sale
+con código 1 si algún paso es más lento que la tolerancia.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+import numpy as np
+
+from networks import LAYOUTS, make_survey
+from payomapeo.core import adjust as core_adjust
+from payomapeo.core import intersect, parallel
+from payomapeo.core.spatial import LineIndex
+
+try:
+    import bpy
+except ImportError:  # fuera de Blender solo se mide el núcleo
+    bpy = None
+
+class Results:
+    def __init__(self):
+        self.data = {}
+
+    @contextmanager
+    def timed(self, name, count=None):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        entry = self.data.setdefault(name, {"seconds": seconds, "runs": []})
+        entry["runs"].append(seconds)
+        entry["seconds"] = min(entry["runs"])
+        if count is not None:
+            entry["count"] = count
+            entry["per_item_us"] = entry["seconds"] / max(count, 1) * 1e6
+        print(f"  {name:<32} {seconds * 1000:10.2f} ms" + (f"  ({count})" if count is not None else ""))
+
+def bench_core(args, results):
+    """Rutas de cálculo puro: generación, fase amplia, intersección, agrupación y ajuste."""
+    for _ in range(args.repeat):
+        with results.timed("network.generate"):
+            survey = make_survey(args.layout, args.stations, args.rays, args.noise, args.spacing, seed=args.seed)
+        n = len(survey.observations)
+        with results.timed("core.line_arrays", n):
+            origins, heights, directions, kinds, groups = survey.line_arrays()
+            starts, units, lengths = intersect.line_arrays(origins, heights, directions, kinds)
+        with results.timed("core.candidate_pairs", n):
+            i, j = intersect.candidate_pairs(starts, units, lengths, args.margin)
+        with results.timed("core.intersect_pairs", len(i)):
+            intersect.intersect_pairs(starts, units, lengths, i, j, args.margin)
+        with results.timed("core.survey_intersect", n):
+            points = survey.intersect(args.margin)
+        with results.timed("core.adjust", n):
+            adjustment = core_adjust.adjust(survey, sigma_angle=max(args.noise, 1e-3), sigma_distance=max(args.noise, 1e-3))
+        if args.workers:
+            with results.timed("core.parallel_intersect", n):
+                parallel.BackgroundSolve(parallel.intersection_plan, starts, units, lengths, args.margin, groups=groups,
+                                         workers=args.workers).start().wait()
+            with results.timed("core.parallel_adjust", n):
+                parallel.BackgroundSolve(parallel.adjustment_plan, survey, sigma_angle=max(args.noise, 1e-3),
+                                         sigma_distance=max(args.noise, 1e-3), workers=args.workers).start().wait()
+        index = LineIndex(max(25.0, args.margin))
+        with results.timed("core.line_index_insert", n):
+            for k in range(n):
+                index.insert(k, starts[k], units[k], lengths[k], groups[k])
+        with results.timed("core.line_index_candidates", n):
+            for k in range(n):
+                index.candidates(starts[k], units[k], lengths[k], exclude_origin=groups[k])
+    results.data["core.survey_intersect"]["points"] = len(points)
+    results.data["core.adjust"].update(iterations=adjustment.iterations, sigma0=adjustment.sigma0)
+    return survey
+
+def bench_blender(args, results, survey):
+    """Operadores y utilidades del addon sobre una escena vacía con la misma red."""
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    import payomapeo
+    from payomapeo import addon, layers, utils
+
+    with results.timed("addon.register"):
+        payomapeo.register()
+    scene = bpy.context.scene
+    scene.topo_intersection_margin = args.margin
+    scene.topo_compact_geometry = args.compact
+
+    with results.timed("addon.add_node", len(survey.stations)):
+        for name, station in survey.stations.items():
+            bpy.ops.topo.add_node(name=name)
+            bpy.data.objects[name].location = station.location
+
+    # Unas pocas observaciones por el operador (con su búsqueda de intersecciones) y el resto en lote
+    observations = survey.observations
+    by_operator = observations[:args.op_limit]
+    with results.timed("addon.add_node_from_obs", len(by_operator)):
+        for obs in by_operator:
+            bpy.ops.topo.add_node_from_obs(origin=obs.origin, point_name=obs.target or "Punto", azimuth=obs.azimuth,
+                                           inclination=obs.inclination, distance=obs.distance,
+                                           observer_height=obs.observer_height)
+    rest = observations[args.op_limit:]
+    with results.timed("addon.create_observation", len(rest)), addon.scene_batch():
+        new_lines = [addon._create_observation(bpy.context, bpy.data.objects[obs.origin], obs.target or "Punto",
+                                               obs.azimuth, obs.inclination, obs.distance, obs.observer_height)
+                     for obs in rest]
+    with results.timed("addon.check_intersections", len(new_lines)):
+        addon._check_intersections_batch(bpy.context, new_lines)
+    with results.timed("addon.check_intersections.repeat", len(new_lines)):
+        addon._check_intersections_batch(bpy.context, new_lines)  # el registro de pares ya las da por resueltas
+
+    segments = [line for line in layers.iter_lines() if line.get("destino") and not line.get("is_projected")][:args.op_limit]
+    with results.timed("addon.project_to_ground", len(segments)):
+        if args.compact:
+            for line in segments:
+                line.layer.data.edges[line._edge()].select = True
+            for layer in {line.layer for line in segments}:
+                bpy.context.view_layer.objects.active = layer
+                bpy.ops.topo.project_to_ground(borrar_originales=True)
+        else:
+            for line in segments:
+                bpy.context.view_layer.objects.active = line
+                bpy.ops.topo.project_to_ground(borrar_originales=True)
+
+    meshes = [bpy.data.objects.new(f"Bench_{k}", bpy.data.meshes.new(f"Bench_{k}")) for k in range(args.op_limit)]
+    with results.timed("addon.apply_material", len(meshes)):
+        for k, obj in enumerate(meshes):
+            utils.apply_material(obj, utils.COLOR_DISTANCIA if k % 2 else utils.COLOR_RAYO)
+
+    addon._invalidate_caches()
+    with results.timed("addon.nodes_enum_items.cold", len(addon.station_registry())):
+        items = addon.nodes_enum_items(None, bpy.context)
+    with results.timed("addon.nodes_enum_items.warm", 1000):
+        for _ in range(1000):
+            addon.nodes_enum_items(None, bpy.context)
+    results.data["addon.nodes_enum_items.cold"]["items"] = len(items)
+    with results.timed("addon.survey_from_scene"):
+        addon.survey_from_scene()
+    results.data["scene.objects"] = {"count": len(bpy.data.objects)}
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, tolerance):
+    """Imprime la razón actual/base de cada paso; devuelve los que superan la tolerancia."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]
+    slower = []
+    print(f"\nComparación con {baseline_path}:")
+    for name, entry in results.items():
+        base = baseline.get(name, {}).get("seconds")
+        if "seconds" not in entry or not base:
+            continue
+        ratio = entry["seconds"] / base
+        flag = "  <-- más lento" if ratio > tolerance else ""
+        print(f"  {name:<32} x{ratio:5.2f}{flag}")
+        if ratio > tolerance:
+            slower.append(name)
+    return slower
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks de PayoMapeo con redes sintéticas")
+    parser.add_argument("--layout", choices=LAYOUTS, default="grid")
+    parser.add_argument("--stations", type=int, default=25)
+    parser.add_argument("--rays", type=int, default=20, help="observaciones por estación")
+    parser.add_argument("--noise", type=float, default=0.05, help="ruido de las lecturas (° y m)")
+    parser.add_argument("--spacing", type=float, default=100.0, help="separación entre estaciones (m)")
+    parser.add_argument("--margin", type=float, default=0.5, help="margen de intersección (m)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones de las rutas del núcleo (se guarda la mejor)")
+    parser.add_argument("--op-limit", type=int, default=200, help="máximo de llamadas individuales a operadores")
+    parser.add_argument("--compact", action="store_true", help="usar geometría compacta en Blender")
+    parser.add_argument("--workers", type=int, default=0, help="procesos para medir también la resolución en paralelo (0: no)")
+    parser.add_argument("--json", help="guardar los resultados en este fichero")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="razón de tiempo a partir de la cual se avisa")
+    args = parser.parse_args(argv)
+
+    results = Results()
+    mode = "blender" if bpy is not None else "headless"
+    print(f"PayoMapeo benchmarks ({mode}): {args.layout}, {args.stations} estaciones x {args.rays} visuales")
+    survey = bench_core(args, results)
+    if bpy is not None:
+        bench_blender(args, results, survey)
+
+    report = {
+        "suite": "payomapeo",
+        "mode": mode,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "blender": bpy.app.version_string if bpy is not None else None,
+        "params": vars(args),
+        "results": results.data,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        return 1 if compare(results.data, args.compare, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    # Blender pasa sus propios argumentos; los del script van después de "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
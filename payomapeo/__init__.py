@@ -0,0 +1,16 @@
+bl_info = {
+    "name": "PayoMapeo - Red de estaciones (v0.2)",
+    "blender": (3, 0, 0),
+    "category": "3D View",
+    "description": "Crear nodos/estaciones, registrar observaciones, y crear puntos por intersección automática de rayos y segmentos. Creado por el Payocabra",
+}
+
+# bpy solo se importa al registrar: así `payomapeo.core` se puede usar fuera de Blender.
+
+def register():
+    from . import addon
+    addon.register()
+
+def unregister():
+    from . import addon
+    addon.unregister()
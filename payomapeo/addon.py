@@ -0,0 +1,1659 @@
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from functools import partial
+from math import radians, isclose, dist
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+from mathutils import Vector
+
+from . import labels
+from .background import REPORT_ICONS, background_report, background_solve, cancel_background_solve, start_background_solve
+from .batch import (PendingEdge, ensure_collection, ensure_line_layer, get_line, layer_add_line, link_object, paint_object,
+                    scene_batch)
+from .core.export import EXPORT_CHUNK, WRITERS, LineChunk, PointChunk
+from .core.fieldlog import read_readings
+from .core.instrument import count, recorder, stage, timed
+from .core.geometry import RAY_LENGTH, az_inc_from_dir, corrected_azimuth, dir_from_az_inc, eye_point
+from .core.intersect import Intersections, intersect_pairs
+from .core.ledger import PairLedger, line_identity
+from .core.labels import LABEL_DISTANCE, LABEL_LIMIT
+from .core.adjust import MAX_ITERATIONS, SIGMA_ANGLE, SIGMA_DISTANCE, adjust
+from .core.cluster import cluster_hits, fit_points
+from .core.graph import TARGET, DependencyGraph
+from .core.live import LIVE_INTERVAL, LiveFeed, SteadyAim
+from .core.model import DerivedPoint, Observation, Survey, intersection_name
+from .core.parallel import BackgroundSolve, adjustment_plan, intersection_plan
+from .core.spatial import INDEX_CELL_SIZE, LineIndex
+from .labels import create_label, delete_labels, label_mode_changed, label_table, update_label
+from .layers import LINE_LAYERS, LINE_TYPES, EdgeLine, layer_remove_lines, selected_lines
+from .table import (TABLE_TYPES, cache_line, missing_from_cache, observation_cache, prune_observation_cache, read_blob,
+                    save_observation_cache, scene_signature, set_line_props, table_geometries, uncache_lines, write_blob)
+from .utils import COLOR_NODO_PRINCIPAL, COLOR_PUNTO, on_reset, redraw_3d_views, reset_state, set_object_color
+
+# Registro de nodos/puntos: evita recorrer bpy.data.objects cada vez que se dibuja el desplegable
+STATION_TYPES = {"nodo", "punto"}
+_stations = None       # nombre -> objeto; se reconstruye perezosamente tras cargar o deshacer
+_station_items = None  # items del enum en caché (Blender exige mantener viva la lista)
+
+@on_reset
+def _reset_stations(loaded):
+    global _stations, _station_items
+    _stations = _station_items = None
+
+def station_registry():
+    global _stations
+    if _stations is None:
+        _stations = {obj.name: obj for obj in bpy.data.objects if obj.get("tipo") in STATION_TYPES}
+    return _stations
+
+def register_station(obj):
+    global _station_items
+    if _stations is not None:
+        _stations[obj.name] = obj
+    _station_items = None
+
+def _prune_stations():
+    """Actualiza en el registro las estaciones borradas o renombradas. Devuelve True si cambió."""
+    changed = False
+    for name, obj in list(station_registry().items()):
+        try:
+            current = obj.name
+        except ReferenceError:  # objeto borrado
+            current = None
+        if current != name:
+            del _stations[name]
+            if current is not None and obj.get("tipo") in STATION_TYPES:
+                _stations[current] = obj
+            changed = True
+    return changed
+
+@timed("nodes_enum_items")
+def nodes_enum_items(self, context):
+    global _station_items
+    if _prune_stations() or _station_items is None:
+        items = [(name, name, "") for name in sorted(station_registry())]
+        _station_items = items if items else [("NONE", "Ninguna", "No hay nodos/estaciones")]
+    return _station_items
+
+@persistent
+@timed("sync_stations")
+def _sync_stations(scene, depsgraph):
+    """Registra nodos/puntos y líneas creados fuera de los operadores (duplicados, renombrados...)."""
+    if _stations is None:
+        return
+    for update in depsgraph.updates:
+        obj = update.id.original
+        if not isinstance(obj, bpy.types.Object):
+            continue
+        if obj.get("tipo") in STATION_TYPES and obj.name not in _stations:
+            register_station(obj)
+        elif obj.get("tipo") in TABLE_TYPES and missing_from_cache(obj.name):
+            register_line(obj)
+
+# ==========================
+# Índice espacial de líneas
+# ==========================
+
+_line_index = None  # se reconstruye perezosamente tras cargar, deshacer o cambiar el margen
+
+@on_reset
+def _reset_line_index(loaded):
+    global _line_index
+    _line_index = None
+
+def line_geometry(obj):
+    """Devuelve (P, dirección unitaria, longitud) de una línea de observación, o None si está huérfana."""
+    origin_obj = bpy.data.objects.get(obj.get("origen", ""))
+    if origin_obj is None or "vector" not in obj:
+        return None
+    P = origin_obj.location + Vector((0, 0, obj.get("observer_height", 0.0)))
+    v = Vector(obj["vector"])
+    length = v.length if obj["tipo"] == "observacion_segmento" else RAY_LENGTH
+    return P, v.normalized(), length
+
+@timed("survey_from_scene")
+def survey_from_scene():
+    """Vuelca la red de la escena a un `Survey` del núcleo.
+
+    Devuelve (survey, nombres de las líneas), en el orden de `survey.observations`.
+    Las observaciones salen de la caché de observaciones, sin leer las líneas.
+    Los vectores guardados ya llevan la declinación aplicada, así que el Survey se
+    crea sin ella. Los puntos de intersección que guardan sus rayos pasan como
+    puntos derivados; el resto de nodos y puntos, como estaciones.
+    """
+    survey = Survey()
+    _prune_stations()
+    derived = []
+    for name, obj in station_registry().items():
+        if "rayos" in obj:
+            derived.append(obj)
+        else:
+            survey.add_station(name, tuple(obj.location), obj["tipo"])
+    for obj in derived:
+        survey.points[obj.name] = DerivedPoint(obj.name, tuple(obj.location), obj.get("gap_interseccion", 0.0), (),
+                                               obj.get("rms_interseccion", 0.0))
+    table = observation_cache()
+    rows = table.where("tipo", LINE_TYPES)
+    rows = rows[~np.isnan(table.columns["vector"][rows]).any(axis=1)]
+    known = set(survey.stations) | set(survey.points)
+    names, order = [], {}
+    for row, origin, target, tipo, v, h in zip(rows.tolist(), table.column("origen", rows), table.column("destino", rows),
+                                               table.column("tipo", rows), table.column("vector", rows).tolist(),
+                                               np.nan_to_num(table.column("observer_height", rows)).tolist()):
+        if origin not in known:
+            continue
+        az, inc = az_inc_from_dir(v)
+        distance = float(np.linalg.norm(v)) if tipo == "observacion_segmento" else 0.0
+        order[table.names[row]] = len(names)
+        names.append(table.names[row])
+        survey.observations.append(Observation(origin, target, az, inc, distance, h))
+    for obj in derived:
+        rays = tuple(order[name] for name in obj["rayos"] if name in order)
+        survey.points[obj.name] = survey.points[obj.name]._replace(rays=rays)
+    return survey, names
+
+def get_line_index(context):
+    global _line_index
+    margin = context.scene.topo_intersection_margin
+    if _line_index is None or _line_index.cell_size < margin:
+        with stage("line_index.build"):
+            _line_index = LineIndex(max(INDEX_CELL_SIZE, margin))
+            for name, P, u, length, origin in table_geometries():
+                _line_index.insert(name, P, u, length, origin=origin)
+    return _line_index
+
+def index_line(obj):
+    geo = line_geometry(obj)
+    if _line_index is not None and geo is not None:
+        _line_index.insert(obj.name, *geo, origin=obj["origen"])
+
+def unindex_line(name):
+    if _line_index is not None:
+        _line_index.remove(name)
+
+# ==========================
+# Registro de pares intersecados
+# ==========================
+# Qué pares de visuales se han cruzado ya (core.ledger), para que volver a
+# importar o a resolver no repita trabajo ni duplique puntos. Se guarda en su
+# propio bloque de texto junto a la caché; tras deshacer se rehace con los
+# cortes que siguen en la escena, y los pares sin corte se vuelven a probar.
+
+LEDGER_BLOB = "PayoMapeo_pares"  # bloque de texto con el registro (npz en base64)
+
+_ledger = None            # PairLedger; se carga o reconstruye perezosamente
+_ledger_from_blob = False  # tras abrir un archivo el registro puede salir de su bloque
+
+@on_reset
+def _reset_ledger(loaded):
+    global _ledger, _ledger_from_blob
+    _ledger = None
+    _ledger_from_blob = loaded
+
+def _line_identity(line):
+    return line_identity(line.get("origen"), line.get("tipo"), line["vector"], line.get("observer_height", 0.0))
+
+@timed("pair_ledger.build")
+def _build_pair_ledger(margin):
+    """Registro a partir de la escena: cada observación con su identidad y, como resueltos,
+    los pares de visuales de cada punto de intersección."""
+    ledger = PairLedger(margin)
+    table = observation_cache()
+    rows = table.where("tipo", LINE_TYPES)
+    rows = rows[~np.isnan(table.columns["vector"][rows]).any(axis=1)]
+    for row, origin, tipo, v, h in zip(rows.tolist(), table.column("origen", rows), table.column("tipo", rows),
+                                       table.column("vector", rows).tolist(),
+                                       np.nan_to_num(table.column("observer_height", rows)).tolist()):
+        ledger.add(table.names[row], line_identity(origin, tipo, v, h))
+    _prune_stations()
+    a, b = [], []
+    for obj in station_registry().values():
+        ids = ledger.ids(obj.get("rayos", ())).tolist()
+        for n, i in enumerate(ids):
+            a += [i] * (len(ids) - n - 1)
+            b += ids[n + 1:]
+    ledger.record(a, b)
+    return ledger
+
+def pair_ledger(context):
+    global _ledger, _ledger_from_blob
+    margin = context.scene.topo_intersection_margin
+    if _ledger is None and _ledger_from_blob:
+        _ledger = read_blob(LEDGER_BLOB, PairLedger.from_bytes)
+        _ledger_from_blob = False
+    if _ledger is None or _ledger.margin < margin:
+        _ledger = _build_pair_ledger(margin)
+    _ledger.margin = margin  # lo resuelto con un margen mayor sigue valiendo con este
+    return _ledger
+
+def ledger_line(line):
+    """Apunta una observación nueva o cuya geometría ha cambiado: sus pares vuelven a estar por resolver."""
+    if _ledger is not None and line.get("tipo") in LINE_TYPES and "vector" in line:
+        _ledger.add(line.name, _line_identity(line))
+
+def find_observation(context, identity):
+    """Línea que ya tiene esa identidad (la misma lectura, importada antes), o None.
+
+    Un segmento solo cuenta si su punto, el `destino` que guarda y no el nombre
+    pedido, sigue en la escena; si se borró, la lectura se vuelve a crear.
+    """
+    name = pair_ledger(context).find(identity)
+    line = get_line(name) if name else None
+    if line is None or "vector" not in line or _line_identity(line) != identity:
+        return None
+    if line.get("tipo") == "observacion_segmento" and bpy.data.objects.get(line.get("destino") or "") is None:
+        return None
+    return line
+
+@persistent
+@timed("pair_ledger.save")
+def _save_pair_ledger(*_args):
+    """Guarda el registro junto a la caché; si se ha descartado, quita el bloque que ya no cuadra."""
+    if _ledger is not None:
+        write_blob(LEDGER_BLOB, _ledger.to_bytes(), scene_signature())
+    elif not _ledger_from_blob and bpy.data.texts.get(LEDGER_BLOB) is not None:
+        bpy.data.texts.remove(bpy.data.texts[LEDGER_BLOB])  # se rehará desde la escena
+
+# ==========================
+# Edición de líneas
+# ==========================
+
+def delete_lines(lines):
+    """Borra líneas de cualquier tipo, reconstruyendo cada capa compacta una sola vez."""
+    by_layer = {}
+    uncache_lines([line.name for line in lines])
+    for line in lines:
+        unindex_line(line.name)
+        if _graph is not None:
+            _graph.remove_line(line.name)
+        if isinstance(line, EdgeLine):
+            by_layer.setdefault(line.layer.name, (line.layer, []))[1].append(line.line_id)
+        else:
+            bpy.data.objects.remove(line, do_unlink=True)
+    for layer, line_ids in by_layer.values():
+        layer_remove_lines(layer, line_ids)
+
+def set_line_ends(line, a, b):
+    """Mueve los extremos de una línea (objeto o arista de capa compacta)."""
+    if isinstance(line, PendingEdge) and line.pending:
+        line.ends = (tuple(a), tuple(b))
+        return
+    if isinstance(line, EdgeLine):
+        mesh = line.layer.data
+        v0, v1 = mesh.edges[line._edge()].vertices
+    else:
+        mesh, v0, v1 = line.data, 0, 1
+    mesh.vertices[v0].co = a
+    mesh.vertices[v1].co = b
+    mesh.update()
+
+def refresh_line(line):
+    """Recoloca una observación y su texto de distancia tras mover su origen o su destino."""
+    origin = bpy.data.objects.get(line.get("origen", ""))
+    if origin is None:
+        return
+    eye = Vector(eye_point(origin.location, line.get("observer_height", 0.0)))
+    target = bpy.data.objects.get(line.get("destino") or "")
+    if target is not None and line.get("tipo") in {"observacion_segmento", "linea_manual"}:
+        end = target.location.copy()
+        if "vector" in line:
+            set_line_props(line, vector=end - eye)
+    else:
+        end = eye + RAY_LENGTH * Vector(line["vector"]).normalized()
+    set_line_ends(line, eye, end)
+    ledger_line(line)
+    update_label(line.get("dist_texto"), (eye + end) / 2.0, f"{(end - eye).length:.2f} m")
+    # Línea y texto de la altura del observador
+    height_line = get_line(line["altura_viz_linea"]) if "altura_viz_linea" in line else None
+    if height_line is not None:
+        set_line_ends(height_line, origin.location, eye)
+    update_label(line.get("altura_viz_texto"), (origin.location + eye) / 2.0)
+
+# ==========================
+# Dependencias y propagación de cambios
+# ==========================
+
+MOVE_TOL = 1e-4  # desplazamiento (m) por debajo del cual algo no se considera movido
+
+_graph = None            # DependencyGraph de la escena; se reconstruye tras cargar o deshacer
+_known_locations = {}    # estación -> última posición vista, para detectar lo que mueve el usuario
+
+@on_reset
+def _reset_graph(loaded):
+    global _graph
+    _graph = None
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        _graph = DependencyGraph()
+        table = observation_cache()
+        rows = table.rows()
+        for row, origin, target in zip(rows.tolist(), table.column("origen", rows), table.column("destino", rows)):
+            if origin:
+                _graph.add_line(table.names[row], origin, target)
+        for name, obj in station_registry().items():
+            if "rayos" in obj:
+                _graph.set_point_rays(name, list(obj["rayos"]))
+    return _graph
+
+def register_line(line):
+    """Da de alta una línea nueva en la caché de observaciones y en el grafo, si ya existen."""
+    if "origen" not in line:
+        return
+    cache_line(line)
+    if _graph is not None:
+        _graph.add_line(line.name, line["origen"], line.get("destino"))
+    ledger_line(line)
+
+def remember_location(obj):
+    _known_locations[obj.name] = tuple(obj.location)
+
+def _move_object(obj, location):
+    """Mueve una estación sin que el manejador lo tome por un movimiento del usuario."""
+    obj.location = location
+    remember_location(obj)
+
+def _line_stale(line):
+    """True si los extremos de un objeto línea ya no cuadran con su origen y su vector."""
+    origin = bpy.data.objects.get(line.get("origen", ""))
+    if origin is None or "vector" not in line:
+        return False
+    eye = Vector(eye_point(origin.location, line.get("observer_height", 0.0)))
+    v = Vector(line["vector"])
+    end = eye + (v if line.get("tipo") == "observacion_segmento" else RAY_LENGTH * v.normalized())
+    verts = line.data.vertices
+    return (verts[0].co - eye).length > MOVE_TOL or (verts[1].co - end).length > MOVE_TOL
+
+def _on_station_moved(name):
+    node = bpy.data.objects.get(name)
+    if node is not None and "rayos" in node:
+        _refresh_links(bpy.context, node, _ray_geometries(node["rayos"]))
+
+def _update_line(name, cause):
+    """Recalcula una línea. Si su origen se ha movido o se ha editado, el punto observado
+    la acompaña manteniendo la medida; si se ha movido el destino, cambia el vector."""
+    line = get_line(name)
+    if line is None:
+        return None
+    moved = None
+    target = bpy.data.objects.get(line.get("destino") or "")
+    origin = bpy.data.objects.get(line.get("origen", ""))
+    if (cause != TARGET and target is not None and origin is not None
+            and line.get("tipo") == "observacion_segmento" and not line.get("is_projected")):
+        end = Vector(eye_point(origin.location, line.get("observer_height", 0.0))) + Vector(line["vector"])
+        if (end - target.location).length > MOVE_TOL:
+            _move_object(target, end)
+            moved = target.name
+    refresh_line(line)
+    index_line(line)
+    return moved
+
+def _update_point(name):
+    """Recoloca un punto de intersección con sus visuales actuales. True si se ha movido."""
+    node = bpy.data.objects.get(name)
+    if node is None or "rayos" not in node:
+        return False
+    rays = _ray_geometries(node["rayos"])
+    if len(rays) < 2:
+        return False
+    points, gaps, rms = fit_points([g[0] for _, g in rays], [g[1] for _, g in rays], np.zeros(len(rays), dtype=np.int64), 1)
+    node["gap_interseccion"] = float(gaps[0])
+    node["rms_interseccion"] = float(rms[0])
+    if (Vector(points[0]) - node.location).length > MOVE_TOL:
+        _move_object(node, tuple(points[0]))
+        return True
+    _refresh_links(bpy.context, node, rays)
+    return False
+
+def propagate_changes(stations=(), lines=()):
+    """Recalcula solo lo que depende de las estaciones movidas y las líneas editadas."""
+    return get_graph().propagate(stations, lines, _on_station_moved, _update_line, _update_point)
+
+@persistent
+@timed("propagate_edits")
+def _propagate_edits(scene, depsgraph):
+    """Cuando el usuario mueve una estación o edita una observación, actualiza lo que cuelga de ella."""
+    moved, edited = [], []
+    for update in depsgraph.updates:
+        obj = update.id.original
+        if not isinstance(obj, bpy.types.Object):
+            continue
+        tipo = obj.get("tipo")
+        if tipo in STATION_TYPES:
+            location = tuple(obj.location)
+            known = _known_locations.get(obj.name)
+            _known_locations[obj.name] = location
+            if known is not None and dist(known, location) > MOVE_TOL:
+                moved.append(obj.name)
+        elif tipo in LINE_TYPES and _line_stale(obj):
+            edited.append(obj.name)
+    if moved or edited:
+        propagate_changes(moved, edited)
+
+def _remember_stations():
+    """Apunta dónde está cada estación, para que el manejador no tome lo cargado por un movimiento."""
+    global _known_locations
+    _known_locations = {name: tuple(obj.location) for name, obj in station_registry().items()}
+
+@persistent
+def _invalidate_caches(*_args):
+    """Tras deshacer o rehacer, cada parte suelta lo que había leído de la escena."""
+    reset_state()
+    _remember_stations()
+
+@persistent
+def _file_loaded(*_args):
+    reset_state(loaded=True)
+    _remember_stations()
+
+# ==========================
+# Lógica de Creación y Geometría
+# ==========================
+
+@timed("create_line")
+def _create_line(context, name, a, b, collection, category, **props):
+    """Crea una línea como objeto propio o, en modo compacto, como arista de la capa de su categoría."""
+    count("lines_created")
+    if context.scene.topo_compact_geometry:
+        line = layer_add_line(ensure_line_layer(collection, category), a, b, **props)
+        register_line(line)
+        return line
+    prefix, tipo, color = LINE_LAYERS[category]
+    count("objects_created")
+    with stage("create_line.from_pydata"):
+        mesh = bpy.data.meshes.new(name)
+        line = bpy.data.objects.new(mesh.name, mesh)
+        mesh.from_pydata([a, b], [(0,1)], [])
+    if tipo:
+        line["tipo"] = tipo
+    for key, value in props.items():
+        line[key] = value
+    paint_object(line, color)
+    link_object(line, collection)
+    register_line(line)
+    return line
+
+def _create_station(name, tipo, display_type, display_size, color, location=(0.0, 0.0, 0.0), collection=None):
+    """Empty de un nodo o punto, dado de alta y enlazado a `collection` (por defecto, la de su nombre)."""
+    count("objects_created")
+    obj = bpy.data.objects.new(name, None)
+    obj.empty_display_type = display_type
+    obj.empty_display_size = display_size
+    obj.location = location
+    remember_location(obj)
+    set_object_color(obj, color)
+    obj["tipo"] = tipo
+    link_object(obj, collection or ensure_collection(obj.name))
+    register_station(obj)
+    return obj
+
+def _link_origin(context, node, origin_name, eye):
+    """Crea o recoloca el segmento y el texto de distancia de una estación a un punto de intersección."""
+    origin_obj = bpy.data.objects.get(origin_name)
+    if origin_obj is None:
+        return
+    # --- MODIFICADO: USA LA POSICIÓN REAL DEL NODO, NO EL PUNTO DE VISIÓN ---
+    loc, M = Vector(origin_obj.location), Vector(node.location)
+    mid = (loc + M) / 2.0
+    body = f"{(M - Vector(eye)).length:.2f} m"
+    names = node["enlaces"].get(origin_name)
+    seg = get_line(names[0]) if names else bpy.data.objects.get(f"Seg_{origin_name}_{node.name}")
+    text = names[1] if names else f"dist_{origin_name}_{node.name}"
+    if seg is not None and text in label_table():
+        set_line_ends(seg, loc, M)
+        update_label(text, mid, body)
+    else:
+        col = ensure_collection(origin_name)
+        seg = _create_line(context, f"Seg_{origin_name}_{node.name}", loc, M, col, "distancias")
+        text = create_label(context, f"dist_{origin_name}_{node.name}", body, mid, col, 0.9, "texto_distancia", owners=(origin_name, node.name))
+    node["enlaces"][origin_name] = [seg.name, text]
+
+def _ray_geometries(names):
+    """(línea, geometría) de las visuales de un punto que siguen existiendo."""
+    rays = []
+    for name in names:
+        line = get_line(name)
+        geo = line_geometry(line) if line is not None else None
+        if geo is not None:
+            rays.append((line, geo))
+    return rays
+
+def _refresh_links(context, node, rays):
+    """Segmento y texto de distancia desde cada estación que visa el punto (desde su punto de vista)."""
+    if "enlaces" not in node:
+        node["enlaces"] = {}
+    eyes = {}
+    for line, (P, _, _) in rays:
+        eyes.setdefault(line["origen"], P)
+    for origin_name, eye in eyes.items():
+        _link_origin(context, node, origin_name, eye)
+
+@timed("place_cluster_point")
+def _place_cluster_point(context, rays, M, gap, rms, node=None):
+    """Crea, o actualiza en su sitio, el punto de intersección de un grupo de visuales.
+
+    `rays` son pares (línea, geometría), `gap` el mayor hueco entre dos de ellas
+    y `rms` su distancia cuadrática media al punto.
+    """
+    if node is None:
+        node = _create_station(intersection_name(line["origen"] for line, _ in rays), "punto", 'SPHERE', 0.4, COLOR_PUNTO, M)
+    _move_object(node, M)
+    node["gap_interseccion"] = gap
+    node["rms_interseccion"] = rms
+    node["rayos"] = [line.name for line, _ in rays]  # líneas que lo definen
+    if _graph is not None:
+        _graph.set_point_rays(node.name, node["rayos"])
+    _refresh_links(context, node, rays)
+    return node
+
+def _check_intersections(context, new_line_obj):
+    return _check_intersections_batch(context, [new_line_obj])
+
+@timed("check_intersections")
+def _check_intersections_batch(context, new_lines):
+    """Busca intersecciones de varias líneas nuevas en una sola pasada del motor vectorizado.
+
+    Devuelve (puntos creados, puntos actualizados).
+    """
+    # --- MODIFICADO: CALCULA EL PUNTO DE PARTIDA REAL (CON ALTURA) ---
+    ledger = pair_ledger(context)
+    index = get_line_index(context)
+    lines = []  # (objeto, geometría); las nuevas van primero
+    rows = {}   # nombre -> posición en `lines`
+    for obj in {line.name: line for line in new_lines}.values():
+        if ledger.is_sealed(obj.name):
+            continue  # ya cruzada con toda la red (una lectura repetida)
+        geo = line_geometry(obj)
+        if geo is not None:
+            index.insert(obj.name, *geo, origin=obj["origen"])
+            rows[obj.name] = len(lines)
+            lines.append((obj, geo))
+    n_new = len(lines)
+
+    # Solo las líneas que comparten celda con cada nueva (fase amplia del índice). Dos
+    # líneas de la misma estación solo se cortan en el propio punto de vista: se descartan.
+    pairs_a, pairs_b = [], []
+    with stage("check_intersections.candidates"):
+        for a in range(n_new):
+            new_line_obj, geo = lines[a]
+            for other_name in sorted(index.candidates(*geo, exclude_origin=new_line_obj["origen"])):
+                b = rows.get(other_name)
+                if b is not None and b <= a:
+                    continue  # la propia línea, o un par de nuevas ya emparejado
+                if b is None:
+                    other_line = get_line(other_name)
+                    geo2 = line_geometry(other_line) if other_line is not None else None
+                    if geo2 is None:
+                        index.remove(other_name)
+                        continue
+                    b = rows[other_name] = len(lines)
+                    lines.append((other_line, geo2))
+                pairs_a.append(a)
+                pairs_b.append(b)
+    # Fuera los pares que el registro ya da por resueltos
+    ids = ledger.ids([line.name for line, _ in lines])
+    pairs_a = np.array(pairs_a, dtype=np.int64)
+    pairs_b = np.array(pairs_b, dtype=np.int64)
+    keep = ledger.pending(ids[pairs_a], ids[pairs_b])
+    pairs_a, pairs_b = pairs_a[keep], pairs_b[keep]
+    count("candidate_pairs", len(pairs_a))
+    count("ledger_skipped_pairs", int((~keep).sum()))
+    if not len(pairs_a):
+        ledger.seal(ids[:n_new])
+        return 0, 0
+
+    # Todos los pares candidatos se resuelven de una vez con el motor vectorizado
+    starts = np.array([g[0] for _, g in lines])
+    units = np.array([g[1] for _, g in lines])
+    lengths = np.array([g[2] for _, g in lines])
+    margin = context.scene.topo_intersection_margin
+    with stage("check_intersections.solve"):
+        hits = intersect_pairs(starts, units, lengths, pairs_a, pairs_b, margin)
+    ledger.seal(ids[:n_new])  # las nuevas ya se han cruzado con todas las líneas de la red
+    count("intersections_accepted", len(hits.i))
+    return _resolve_hits(context, lines, hits, margin) if len(hits.i) else (0, 0)
+
+@timed("resolve_hits")
+def _resolve_hits(context, lines, hits, margin):
+    """Crea o actualiza los puntos de intersección de los cortes `hits`.
+
+    `lines[k]` es el par (línea, geometría) de cada índice de los cortes. Los
+    grupos y sus posiciones los calcula `cluster_hits`, como en `Survey`; aquí
+    solo se buscan los puntos ya existentes y se llevan los resultados a la
+    escena. Devuelve (puntos creados, puntos actualizados).
+    """
+    lines = list(lines)
+    rows = {line.name: k for k, (line, _) in enumerate(lines)}
+    touched = {lines[k][0].name for k in np.concatenate((hits.i, hits.j)).tolist()}
+    # Un punto que ya usa alguna de las visuales cortadas se ofrece con todas las suyas
+    nodes, anchors = [], []
+    _prune_stations()
+    for obj in station_registry().values():
+        if touched.isdisjoint(obj.get("rayos", ())):
+            continue
+        for line, geo in _ray_geometries(obj["rayos"]):
+            if line.name not in rows:
+                rows[line.name] = len(lines)
+                lines.append((line, geo))
+        nodes.append(obj)
+        anchors.append((tuple(obj.location), [rows[name] for name in obj["rayos"] if name in rows]))
+    with stage("resolve_hits.cluster"):
+        clusters = cluster_hits([g[0] for _, g in lines], [g[1] for _, g in lines], hits, margin, anchors)
+    updated = sum(cluster.anchor is not None for cluster in clusters)
+    count("points_updated", updated)
+    count("points_created", len(clusters) - updated)
+    for cluster in clusters:
+        node = nodes[cluster.anchor] if cluster.anchor is not None else None
+        _place_cluster_point(context, [lines[k] for k in cluster.rays], cluster.location, cluster.gap, cluster.rms, node)
+    return len(clusters) - updated, updated
+
+def intersection_report(created, updated):
+    """Resumen para el usuario de los puntos de intersección de una operación, o "" si no hay."""
+    if not created and not updated:
+        return ""
+    return f"Intersecciones: {created} puntos nuevos, {updated} actualizados"
+
+@timed("create_observation")
+def _create_observation(context, origin_obj, point_name, azimuth, inclination, distance, observer_height):
+    """Crea el rayo (distancia 0) o el punto y segmento de una observación, sin buscar intersecciones.
+
+    Devuelve (línea, creada): si ya había una con la misma lectura, esa y False.
+    """
+    az = corrected_azimuth(azimuth, context.scene.topo_declination if context.scene.topo_use_declination else 0.0)
+    v = Vector(dir_from_az_inc(az, inclination))
+
+    # --- LÓGICA MODIFICADA: USAR ALTURA DEL OBSERVADOR ---
+    feet_pos = origin_obj.location
+    eye_pos = Vector(eye_point(feet_pos, observer_height))
+    is_ray = isclose(distance, 0.0, abs_tol=1e-6)
+
+    # La misma lectura ya registrada no se vuelve a crear (importar dos veces el mismo CSV)
+    if is_ray:
+        identity = line_identity(origin_obj.name, "rayo_observacion", v, observer_height)
+    else:
+        identity = line_identity(origin_obj.name, "observacion_segmento", (eye_pos + distance * v) - eye_pos, observer_height)
+    existing = find_observation(context, identity)
+    if existing is not None:
+        return existing, False
+    col = ensure_collection(origin_obj.name)
+
+    # --- LÓGICA NUEVA: DIBUJAR LÍNEA DE ALTURA SI ES NECESARIO ---
+    if observer_height > 0.0:
+        # Crear línea vertical
+        line_h = _create_line(context, f"Altura_{origin_obj.name}", feet_pos, eye_pos, col, "alturas")
+        # Crear texto de altura
+        mid_h = (feet_pos + eye_pos) / 2.0
+        # --- ROTAR 90° en el eje X ---
+        text_h = create_label(context, f"h_val_{origin_obj.name}", f"{observer_height:.2f} m", mid_h, col, 0.4, "texto_altura",
+                              rotation=radians(90), owners=(origin_obj.name,))
+    
+    if is_ray: # Crear Rayo
+        far_point = eye_pos + RAY_LENGTH * v
+        ray = _create_line(context, f"Rayo_{origin_obj.name}", eye_pos, far_point, col, "rayos",
+                           origen=origin_obj.name, vector=v,
+                           observer_height=observer_height) # Guardar altura
+        return ray, True
+
+    # Crear Punto y Segmento
+    d = distance
+    new_loc = eye_pos + d * v
+    node = _create_station(point_name, "punto", 'ARROWS', 0.3, COLOR_PUNTO, new_loc, ensure_collection(point_name))
+
+    line = _create_line(context, f"Obs_{origin_obj.name}_{node.name}", eye_pos, node.location, col, "segmentos",
+                        origen=origin_obj.name,
+                        destino=node.name, # Guardar destino para la proyección
+                        vector=Vector(node.location) - eye_pos,
+                        observer_height=observer_height, # Guardar altura
+                        is_projected=False) # Marcar como no proyectada
+    
+    mid = (eye_pos + Vector(node.location)) / 2.0
+    dist_text = create_label(context, f"dist_{origin_obj.name}_{node.name}", f"{d:.2f} m", mid, col, 0.9, "texto_distancia",
+                             owners=(origin_obj.name, node.name))
+    
+    # --- NUEVO: GUARDAR REFERENCIAS PARA BORRAR AL PROYECTAR ---
+    set_line_props(line, dist_texto=dist_text)
+    if observer_height > 0.0:
+        set_line_props(line, altura_viz_linea=line_h.name, altura_viz_texto=text_h)
+    return line, True
+
+def _unconverged_report(result):
+    return (f"El ajuste no converge en {result.iterations} iteraciones (sigma0 = {result.sigma0:.2f}); "
+            "no se ha aplicado. Prueba con más iteraciones.")
+
+def _apply_adjustment(context, names, result):
+    """Mueve los puntos ajustados y guarda los residuos en sus líneas (`names`, en el orden
+    de las observaciones del ajuste). Devuelve el resumen para el usuario."""
+    global _line_index
+    moved = set()
+    for name, location in result.locations.items():
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            _move_object(obj, location)
+            moved.add(name)
+    table = observation_cache()
+    kept = [k for k, name in enumerate(names) if name in table.row_of]
+    table.set_column("residuo", [table.row_of[names[k]] for k in kept], result.residuals[kept])
+    for name, residual in zip(names, result.residuals.tolist()):
+        line = get_line(name)
+        if line is None:
+            continue
+        line["residuo"] = residual  # acimut (°), inclinación (°), distancia (m); NaN si no aplica
+        if line["origen"] in moved or line.get("destino") in moved:
+            refresh_line(line)
+    for name in moved:
+        node = bpy.data.objects[name]
+        if "rayos" in node:
+            _refresh_links(context, node, _ray_geometries(node["rayos"]))
+    _line_index = None  # las líneas se han movido
+    return (f"Red ajustada: {len(moved)} puntos, {len(result.links)} visuales, "
+            f"sigma0 = {result.sigma0:.2f} en {result.iterations} iteraciones")
+
+# ==========================
+# Dioptra en directo
+# ==========================
+LIVE_TICK = 0.2  # segundos entre volcados de la cola a la escena
+
+_live = None      # LiveFeed en marcha
+_live_aim = None  # SteadyAim del guardado automático
+
+def live_feed():
+    return _live
+
+def _set_if_changed(scene, prop, value):
+    if not isclose(getattr(scene, prop), value, abs_tol=1e-6):
+        setattr(scene, prop, value)
+
+@timed("live.apply")
+def _apply_live_readings():
+    """Temporizador: vuelca en la escena la última lectura recibida y guarda las punterías quietas.
+
+    Cada pasada escribe las propiedades una sola vez y resuelve todas las
+    observaciones nuevas en un único lote, aunque hayan llegado varias lecturas.
+    """
+    if _live is None:
+        return None
+    readings = _live.drain()
+    context = bpy.context
+    scene = context.scene
+    if readings:
+        reading = readings[-1][1]
+        _set_if_changed(scene, "topo_azimuth", reading.azimuth)
+        _set_if_changed(scene, "topo_inclination", reading.inclination)
+        _set_if_changed(scene, "topo_distance", reading.distance)
+        if reading.ground_distance > 0.0:  # sin calibrar se conserva la altura escrita a mano
+            _set_if_changed(scene, "topo_observer_height", reading.ground_distance)
+        origin_obj = bpy.data.objects.get(scene.topo_active_origin or "")
+        if scene.topo_live_auto_commit and origin_obj is not None:
+            steady = [r for r in (_live_aim.feed(stamp, r) for stamp, r in readings) if r is not None]
+            if steady:
+                with scene_batch(undo="Observación en directo"):
+                    new_lines = [_create_observation(context, origin_obj, scene.topo_new_point_name, r.azimuth, r.inclination,
+                                                     r.distance, scene.topo_observer_height)[0] for r in steady]
+                    _check_intersections_batch(context, new_lines)
+    redraw_3d_views(context)
+    return LIVE_TICK if _live.running else None
+
+def start_live(url, interval=LIVE_INTERVAL):
+    global _live, _live_aim
+    stop_live()
+    _live, _live_aim = LiveFeed(url, interval), SteadyAim()
+    _live.start()
+    if not bpy.app.timers.is_registered(_apply_live_readings):
+        bpy.app.timers.register(_apply_live_readings, first_interval=LIVE_TICK, persistent=True)
+
+def stop_live():
+    global _live
+    if _live is not None:
+        _live.stop()
+        _live = None
+    if bpy.app.timers.is_registered(_apply_live_readings):
+        bpy.app.timers.unregister(_apply_live_readings)
+
+# ==========================
+# Resolución en segundo plano
+# ==========================
+# La copia de la red y lo que se hace con el resultado; el seguimiento del
+# trabajo y su temporizador están en `background`.
+
+def solve_in_background(context, kind, sigma_angle=SIGMA_ANGLE, sigma_distance=SIGMA_DISTANCE, max_iter=MAX_ITERATIONS):
+    """Copia la red y lanza su resolución en segundo plano. Devuelve el trabajo, o None si no hay nada que resolver."""
+    workers = context.scene.topo_solve_workers or None
+    if kind == 'AJUSTE':
+        survey, names = survey_from_scene()
+        if not survey.observations:
+            return None
+        job = BackgroundSolve(adjustment_plan, survey, sigma_angle=sigma_angle, sigma_distance=sigma_distance,
+                              max_iter=max_iter, workers=workers)
+        return start_background_solve(job, partial(_apply_background_adjustment, names))
+    geos = table_geometries()
+    if len(geos) < 2:
+        return None
+    names = [name for name, *_ in geos]
+    starts = np.array([tuple(P) for _, P, _, _, _ in geos], dtype=np.float64)
+    units = np.array([tuple(u) for _, _, u, _, _ in geos], dtype=np.float64)
+    lengths = np.array([length for _, _, _, length, _ in geos], dtype=np.float64)
+    _, groups = np.unique(np.array([origin for *_, origin in geos], dtype=str), return_inverse=True)
+    margin = context.scene.topo_intersection_margin
+    snapshot = pair_ledger(context).snapshot(names)  # LedgerSnapshot de las líneas de la copia
+    job = BackgroundSolve(intersection_plan, starts, units, lengths, margin, groups=groups, workers=workers,
+                          pending=snapshot.pending)
+    return start_background_solve(job, partial(_apply_background_hits, names, margin, snapshot))
+
+def _apply_background_adjustment(names, context, result):
+    if not result.links:
+        return ('WARNING', "Nada que ajustar")
+    if not result.converged:
+        return ('WARNING', _unconverged_report(result))
+    return ('INFO', _apply_adjustment(context, names, result))
+
+def _apply_background_hits(names, margin, snapshot, context, hits):
+    """Aplica los cortes calculados en segundo plano a las líneas que siguen existiendo.
+
+    `names` son las líneas de la copia, en el orden de sus índices.
+    """
+    lines, rows = [], {}  # índice de la copia -> posición en `lines`
+    for k in np.unique(np.concatenate((hits.i, hits.j))).tolist():
+        line = get_line(names[k])
+        geo = line_geometry(line) if line is not None else None
+        if geo is not None:
+            rows[k] = len(lines)
+            lines.append((line, geo))
+    keep = np.array([a in rows and b in rows for a, b in zip(hits.i.tolist(), hits.j.tolist())], dtype=bool)
+    hits = Intersections(*(column[keep] for column in hits))
+    hits = hits._replace(i=np.array([rows[k] for k in hits.i.tolist()], dtype=np.int64),
+                         j=np.array([rows[k] for k in hits.j.tolist()], dtype=np.int64))
+    created, updated = _resolve_hits(context, lines, hits, margin) if len(hits.i) else (0, 0)
+    if snapshot.ledger is _ledger:  # si el registro se ha rehecho entretanto, lo sellado ya no vale
+        snapshot.seal()
+    return ('INFO', f"Intersecciones recalculadas: {created} puntos nuevos y {updated} actualizados con {len(hits.i)} cortes")
+
+# ==========================
+# Exportación
+# ==========================
+# Los puntos salen del registro de estaciones y las líneas de la caché de
+# observaciones, por trozos de EXPORT_CHUNK: cada trozo se escribe antes de
+# preparar el siguiente.
+
+def export_points(chunk=EXPORT_CHUNK):
+    """Trozos (PointChunk) con los nodos, los puntos observados y los de intersección, con su gap."""
+    _prune_stations()
+    names, kinds, xyz, gaps = [], [], [], []
+    for name, obj in station_registry().items():
+        derived = "rayos" in obj
+        names.append(name)
+        kinds.append("interseccion" if derived else obj["tipo"])
+        xyz.append(tuple(obj.location))
+        gaps.append(obj.get("gap_interseccion", np.nan) if derived else np.nan)
+        if len(names) == chunk:
+            yield PointChunk(names, kinds, np.array(xyz, dtype=np.float64), np.array(gaps, dtype=np.float64))
+            names, kinds, xyz, gaps = [], [], [], []
+    if names:
+        yield PointChunk(names, kinds, np.array(xyz, dtype=np.float64), np.array(gaps, dtype=np.float64))
+
+def export_lines(chunk=EXPORT_CHUNK):
+    """Trozos (LineChunk) de las líneas que acaban en un punto: segmentos, proyecciones y líneas manuales.
+
+    Empiezan en el punto de vista y la distancia es la medida (la del vector
+    guardado) o, en las líneas manuales, la geométrica.
+    """
+    table = observation_cache()
+    rows = table.rows()
+    rows = rows[table.columns["destino"][rows] >= 0]
+    for lo in range(0, len(rows), chunk):
+        part = rows[lo:lo + chunk]
+        origins, targets = table.column("origen", part), table.column("destino", part)
+        located = {name: bpy.data.objects.get(name or "") for name in set(origins) | set(targets)}
+        keep = np.array([located[a] is not None and located[b] is not None for a, b in zip(origins, targets)], dtype=bool)
+        if not keep.any():
+            continue
+        part = part[keep]
+        origins = [name for name, k in zip(origins, keep.tolist()) if k]
+        targets = [name for name, k in zip(targets, keep.tolist()) if k]
+        starts = np.array([tuple(located[name].location) for name in origins], dtype=np.float64)
+        starts[:, 2] += np.nan_to_num(table.columns["observer_height"][part])
+        ends = np.array([tuple(located[name].location) for name in targets], dtype=np.float64)
+        measured = np.linalg.norm(table.columns["vector"][part], axis=1)
+        distances = np.where(np.isnan(measured), np.linalg.norm(ends - starts, axis=1), measured)
+        yield LineChunk([table.names[row] for row in part.tolist()], table.column("tipo", part), origins, targets,
+                        starts, ends, distances, table.columns["is_projected"][part], table.columns["residuo"][part])
+
+# ==========================
+# Operadores
+# ==========================
+
+class TOPO_OT_add_node(bpy.types.Operator):
+    bl_idname = "topo.add_node"
+    bl_label = "Añadir nodo/estación"
+    bl_options = {'REGISTER', 'UNDO'}
+    name: bpy.props.StringProperty(name="Nombre", default="Nodo")
+    @timed("op.add_node")
+    def execute(self, context):
+        with scene_batch():
+            empty = _create_station(self.name, "nodo", 'SPHERE', 0.5, COLOR_NODO_PRINCIPAL, collection=ensure_collection(self.name))
+        context.scene.topo_active_origin = empty.name
+        self.report({'INFO'}, f"Nodo '{self.name}' creado")
+        return {'FINISHED'}
+
+class TOPO_OT_add_node_from_obs(bpy.types.Operator):
+    bl_idname = "topo.add_node_from_obs"
+    bl_label = "Nuevo punto desde observación"
+    bl_options = {'REGISTER', 'UNDO'}
+    origin: bpy.props.EnumProperty(name="Origen", items=nodes_enum_items)
+    point_name: bpy.props.StringProperty(name="Nombre del punto", default="Punto")
+    azimuth: bpy.props.FloatProperty(name="Acimut (°)", default=0.0)
+    inclination: bpy.props.FloatProperty(name="Inclinación (°)", default=0.0)
+    distance: bpy.props.FloatProperty(name="Distancia (m)", default=10.0, min=0.0)
+    # --- NUEVA PROPIEDAD ---
+    observer_height: bpy.props.FloatProperty(name="Altura Observador (m)", default=0.0, min=0.0)
+
+    @timed("op.add_node_from_obs")
+    def execute(self, context):
+        origin_obj = bpy.data.objects.get(self.origin)
+        if not origin_obj: return {'CANCELLED'}
+        with scene_batch():
+            line, created = _create_observation(context, origin_obj, self.point_name, self.azimuth, self.inclination, self.distance, self.observer_height)
+            if not created:
+                self.report({'INFO'}, f"Lectura ya registrada ({line.get('destino') or line.name}); no se crea de nuevo.")
+                return {'CANCELLED'}
+            report = intersection_report(*_check_intersections(context, line))
+        if report:
+            self.report({'INFO'}, report)
+        return {'FINISHED'}
+
+class TOPO_OT_search_origin(bpy.types.Operator):
+    """Buscar el nodo/estación de origen por nombre"""
+    bl_idname = "topo.search_origin"
+    bl_label = "Buscar origen"
+    bl_property = "origin"
+    origin: bpy.props.EnumProperty(name="Origen", items=nodes_enum_items)
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+    @timed("op.search_origin")
+    def execute(self, context):
+        if self.origin != "NONE":
+            context.scene.topo_active_origin = self.origin
+        return {'FINISHED'}
+
+class TOPO_OT_import_csv(bpy.types.Operator, ImportHelper):
+    """Importa de una vez las observaciones del CSV descargado de la dioptra (/download)"""
+    bl_idname = "topo.import_csv"
+    bl_label = "Importar CSV de la dioptra"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".csv"
+    filter_glob: bpy.props.StringProperty(default="*.csv", options={'HIDDEN'})
+    origin: bpy.props.EnumProperty(name="Origen", items=nodes_enum_items)
+    use_distance: bpy.props.BoolProperty(
+        name="Usar distancia medida",
+        description="Crear punto y segmento con la distancia del sensor; si no, solo rayos",
+        default=True
+    )
+    use_ground_height: bpy.props.BoolProperty(
+        name="Altura desde calibración",
+        description="Usar la distancia al suelo calibrada como altura del observador",
+        default=True
+    )
+
+    def invoke(self, context, event):
+        if bpy.data.objects.get(context.scene.topo_active_origin or ""):
+            self.origin = context.scene.topo_active_origin
+        return ImportHelper.invoke(self, context, event)
+
+    @timed("op.import_csv")
+    def execute(self, context):
+        origin_obj = bpy.data.objects.get(self.origin)
+        if not origin_obj:
+            self.report({'WARNING'}, "Elige primero el nodo/estación de origen.")
+            return {'CANCELLED'}
+
+        # El archivo se lee entero antes de tocar la escena: un error de lectura no deja nada a medias
+        try:
+            readings = list(read_readings(self.filepath))
+        except OSError as exc:
+            self.report({'ERROR'}, f"No se pudo leer el CSV: {exc}")
+            return {'CANCELLED'}
+
+        # Todas las filas se crean sin buscar intersecciones y se resuelven juntas al final
+        new_lines, skipped, repeated = [], [], 0
+        with scene_batch():
+            for line_num, reading in readings:
+                if reading is None:
+                    skipped.append(line_num)
+                    continue
+                distance = reading.distance if self.use_distance else 0.0
+                height = reading.ground_distance if self.use_ground_height else 0.0
+                line, created = _create_observation(context, origin_obj, reading.name or "Punto", reading.azimuth, reading.inclination, distance, height)
+                new_lines.append(line)
+                repeated += not created
+            report = intersection_report(*_check_intersections_batch(context, new_lines))
+
+        if skipped:
+            self.report({'WARNING'}, f"{len(skipped)} filas ignoradas (líneas {', '.join(map(str, skipped[:10]))}{'...' if len(skipped) > 10 else ''})")
+        already = f" ({repeated} lecturas ya registradas)" if repeated else ""
+        self.report({'INFO'}, f"{len(new_lines) - repeated} observaciones importadas desde {origin_obj.name}{already}" + (f". {report}" if report else ""))
+        return {'FINISHED'}
+
+class _TopoExport(ExportHelper):
+    """Base de los exportadores: `file_format` es la clave del escritor en WRITERS."""
+    file_format = 'CSV'
+
+    use_lines: bpy.props.BoolProperty(
+        name="Incluir líneas",
+        description="Exportar también los segmentos de observación, las distancias proyectadas y las líneas manuales",
+        default=True
+    )
+
+    @timed("op.export")
+    def execute(self, context):
+        prune_observation_cache()
+        try:
+            n_points, n_lines = WRITERS[self.file_format](self.filepath, export_points(),
+                                                          export_lines() if self.use_lines else None)
+        except OSError as exc:
+            self.report({'ERROR'}, f"No se pudo escribir {self.filepath}: {exc}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"{n_points} puntos y {n_lines} líneas exportados a {self.filepath}")
+        return {'FINISHED'}
+
+class TOPO_OT_export_csv(_TopoExport, bpy.types.Operator):
+    """Exporta los puntos de la red a CSV y sus líneas a un segundo CSV (*_lineas.csv)"""
+    bl_idname = "topo.export_csv"
+    bl_label = "Exportar CSV"
+    file_format = 'CSV'
+    filename_ext = ".csv"
+    filter_glob: bpy.props.StringProperty(default="*.csv", options={'HIDDEN'})
+
+class TOPO_OT_export_geojson(_TopoExport, bpy.types.Operator):
+    """Exporta los puntos y líneas de la red a GeoJSON (coordenadas locales de la escena)"""
+    bl_idname = "topo.export_geojson"
+    bl_label = "Exportar GeoJSON"
+    file_format = 'GEOJSON'
+    filename_ext = ".geojson"
+    filter_glob: bpy.props.StringProperty(default="*.geojson;*.json", options={'HIDDEN'})
+
+class TOPO_OT_export_ply(_TopoExport, bpy.types.Operator):
+    """Exporta los puntos y líneas de la red a PLY binario (vértices y aristas)"""
+    bl_idname = "topo.export_ply"
+    bl_label = "Exportar PLY"
+    file_format = 'PLY'
+    filename_ext = ".ply"
+    filter_glob: bpy.props.StringProperty(default="*.ply", options={'HIDDEN'})
+
+class TOPO_OT_live_ingest(bpy.types.Operator):
+    """Conecta o desconecta las lecturas en directo de la dioptra (/json)"""
+    bl_idname = "topo.live_ingest"
+    bl_label = "Lecturas en directo"
+
+    @timed("op.live_ingest")
+    def execute(self, context):
+        if _live is not None and _live.running:
+            stop_live()
+            self.report({'INFO'}, "Dioptra desconectada")
+        else:
+            start_live(context.scene.topo_live_url, context.scene.topo_live_interval)
+            self.report({'INFO'}, f"Leyendo {context.scene.topo_live_url}")
+        return {'FINISHED'}
+
+class TOPO_OT_adjust_network(bpy.types.Operator):
+    """Ajusta por mínimos cuadrados todas las estaciones y puntos con todas las observaciones"""
+    bl_idname = "topo.adjust_network"
+    bl_label = "Ajustar red"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    sigma_angle: bpy.props.FloatProperty(name="Precisión angular (°)", default=SIGMA_ANGLE, min=1e-4)
+    sigma_distance: bpy.props.FloatProperty(name="Precisión distancia (m)", default=SIGMA_DISTANCE, min=1e-4)
+    max_iter: bpy.props.IntProperty(name="Iteraciones máximas", default=MAX_ITERATIONS, min=1)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    @timed("op.adjust_network")
+    def execute(self, context):
+        survey, names = survey_from_scene()
+        result = adjust(survey, sigma_angle=self.sigma_angle, sigma_distance=self.sigma_distance, max_iter=self.max_iter)
+        if not result.links:
+            self.report({'WARNING'}, "No hay observaciones con punto visado que ajustar.")
+            return {'CANCELLED'}
+        if not result.converged:  # las posiciones a medio camino no se aplican
+            self.report({'WARNING'}, _unconverged_report(result))
+            return {'CANCELLED'}
+        with scene_batch():
+            self.report({'INFO'}, _apply_adjustment(context, names, result))
+        return {'FINISHED'}
+
+class TOPO_OT_solve_background(bpy.types.Operator):
+    """Recalcula las intersecciones o ajusta la red en otros procesos, sin bloquear Blender"""
+    bl_idname = "topo.solve_background"
+    bl_label = "Resolver en segundo plano"
+
+    kind: bpy.props.EnumProperty(
+        name="Cálculo",
+        items=[('INTERSECCIONES', "Intersecciones", "Busca de nuevo las intersecciones entre todas las líneas"),
+               ('AJUSTE', "Ajuste", "Ajusta la red por mínimos cuadrados, por bloques independientes")],
+        default='AJUSTE'
+    )
+    sigma_angle: bpy.props.FloatProperty(name="Precisión angular (°)", default=SIGMA_ANGLE, min=1e-4)
+    sigma_distance: bpy.props.FloatProperty(name="Precisión distancia (m)", default=SIGMA_DISTANCE, min=1e-4)
+    max_iter: bpy.props.IntProperty(name="Iteraciones máximas", default=MAX_ITERATIONS, min=1)
+
+    def invoke(self, context, event):
+        if self.kind == 'AJUSTE':
+            return context.window_manager.invoke_props_dialog(self)
+        return self.execute(context)
+
+    @timed("op.solve_background")
+    def execute(self, context):
+        if background_solve() is not None:
+            self.report({'WARNING'}, "Ya hay una resolución en marcha.")
+            return {'CANCELLED'}
+        job = solve_in_background(context, self.kind, self.sigma_angle, self.sigma_distance, self.max_iter)
+        if job is None:
+            self.report({'WARNING'}, "No hay observaciones que resolver.")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Resolviendo en segundo plano con {job.workers} procesos")
+        return {'FINISHED'}
+
+class TOPO_OT_solve_cancel(bpy.types.Operator):
+    """Cancela la resolución en segundo plano"""
+    bl_idname = "topo.solve_cancel"
+    bl_label = "Cancelar"
+
+    @timed("op.solve_cancel")
+    def execute(self, context):
+        cancel_background_solve()
+        self.report({'INFO'}, "Resolución cancelada")
+        return {'FINISHED'}
+
+# --- OPERADOR COMPLETAMENTE NUEVO ---
+class TOPO_OT_project_to_ground(bpy.types.Operator):
+    """Proyecta una observación con altura de observador al suelo."""
+    bl_idname = "topo.project_to_ground"
+    bl_label = "Proyectar al Suelo"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    borrar_originales: bpy.props.BoolProperty(
+        name="Borrar originales",
+        description="Eliminar la línea y textos de la observación con altura",
+        default=True
+    )
+
+    @classmethod
+    def poll(cls, context):
+        # Puedes personalizar la condición según tu lógica
+        return True
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    @timed("op.project_to_ground")
+    def execute(self, context):
+        lines = [line for line in selected_lines(context) if "destino" in line]
+        if not lines:
+            self.report({'WARNING'}, "Selecciona una observación con distancia definida.")
+            return {'CANCELLED'}
+
+        with scene_batch():
+            projected, to_delete, labels_to_delete = [], [], []
+            for line_obj in lines:
+                origin_name = line_obj["origen"]
+                target_name = line_obj["destino"]
+                origin_obj = bpy.data.objects.get(origin_name)
+                target_obj = bpy.data.objects.get(target_name)
+            
+                if not origin_obj or not target_obj:
+                    self.report({'WARNING'}, "No se encontraron el origen o el destino.")
+                    continue
+
+                feet_pos = origin_obj.location
+                target_pos = target_obj.location
+                new_dist = (target_pos - feet_pos).length
+                col = ensure_collection(origin_name)
+            
+                # Nueva línea proyectada
+                new_line = _create_line(context, f"Proy_{origin_name}_{target_name}", feet_pos, target_pos, col, "proyecciones",
+                                        origen=origin_name, destino=target_name, vector=target_pos - feet_pos,
+                                        observer_height=0.0, is_projected=True)
+            
+                # Texto de distancia
+                mid = (feet_pos + target_pos) / 2.0
+                set_line_props(new_line, dist_texto=create_label(context, f"dist_proy_{origin_name}_{target_name}", f"{new_dist:.2f} m", mid,
+                                                                 col, 1.2, "texto_proyeccion", owners=(origin_name, target_name)))
+                projected.append(new_line)
+
+                # Solo borrar si está activado el checkbox
+                if self.borrar_originales:
+                    to_delete.append(line_obj)
+                    height_line = get_line(line_obj["altura_viz_linea"]) if "altura_viz_linea" in line_obj else None
+                    if height_line:
+                        to_delete.append(height_line)
+                    labels_to_delete.extend(line_obj[prop_name] for prop_name in ("dist_texto", "altura_viz_texto") if prop_name in line_obj)
+
+            if not projected:
+                return {'CANCELLED'}
+            delete_lines(to_delete)
+            delete_labels(labels_to_delete)
+            for new_line in projected:
+                index_line(new_line)
+
+        self.report({'INFO'}, f"{len(projected)} observaciones proyectadas al suelo.")
+        last = projected[-1]
+        bpy.context.view_layer.objects.active = last.layer if isinstance(last, EdgeLine) else last
+        return {'FINISHED'}
+
+
+# ==========================
+# Rendimiento
+# ==========================
+# Los operadores y las etapas internas van marcados con @timed/stage (ver
+# core.instrument); solo miden mientras "Medir tiempos" está activado.
+
+PERF_ROWS = 12  # etapas que se listan en el panel
+
+def _perf_toggled(self, context):
+    recorder.enabled = self.topo_perf_enabled
+
+class TOPO_OT_perf_reset(bpy.types.Operator):
+    """Borra los tiempos y contadores medidos"""
+    bl_idname = "topo.perf_reset"
+    bl_label = "Reiniciar"
+
+    def execute(self, context):
+        recorder.reset()
+        return {'FINISHED'}
+
+class TOPO_OT_perf_profile(bpy.types.Operator):
+    """Inicia o para un perfil de cProfile de todo lo que se ejecute mientras tanto"""
+    bl_idname = "topo.perf_profile"
+    bl_label = "cProfile"
+
+    def execute(self, context):
+        if recorder.profiling:
+            recorder.stop_profile()
+            self.report({'INFO'}, "Perfil de cProfile terminado")
+        else:
+            recorder.start_profile()
+            self.report({'INFO'}, "Perfil de cProfile en marcha")
+        return {'FINISHED'}
+
+class TOPO_OT_perf_dump_json(bpy.types.Operator, ExportHelper):
+    """Guarda los tiempos y contadores medidos en JSON"""
+    bl_idname = "topo.perf_dump_json"
+    bl_label = "Guardar tiempos (JSON)"
+    filename_ext = ".json"
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    def execute(self, context):
+        try:
+            recorder.dump_json(self.filepath)
+        except OSError as exc:
+            self.report({'ERROR'}, f"No se pudo escribir {self.filepath}: {exc}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Tiempos guardados en {self.filepath}")
+        return {'FINISHED'}
+
+class TOPO_OT_perf_dump_profile(bpy.types.Operator, ExportHelper):
+    """Para el perfil de cProfile y lo guarda en formato pstats"""
+    bl_idname = "topo.perf_dump_profile"
+    bl_label = "Guardar perfil (cProfile)"
+    filename_ext = ".prof"
+    filter_glob: bpy.props.StringProperty(default="*.prof", options={'HIDDEN'})
+
+    @classmethod
+    def poll(cls, context):
+        return recorder.profiling or recorder.profiled
+
+    def execute(self, context):
+        try:
+            recorder.dump_profile(self.filepath)
+        except (OSError, ValueError) as exc:
+            self.report({'ERROR'}, f"No se pudo guardar el perfil: {exc}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Perfil guardado en {self.filepath}")
+        return {'FINISHED'}
+
+# ==========================
+# Paneles
+# ==========================
+class TOPO_PT_panel(bpy.types.Panel):
+    bl_label = "PayoMapeo"
+    bl_idname = "TOPO_PT_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Topografía'
+    def draw(self, context):
+        s = context.scene
+        layout = self.layout
+        box = layout.box()
+        box.label(text="Opciones generales")
+        row = box.row(align=True)
+        row.prop(s, "topo_use_declination", text="Usar declinación")
+        row.prop(s, "topo_declination")
+        box.prop(s, "topo_intersection_margin")
+        box.prop(s, "topo_compact_geometry")
+        box.prop(s, "topo_label_mode")
+        if s.topo_label_mode != 'OBJETOS':
+            row = box.row(align=True)
+            row.prop(s, "topo_label_distance")
+            row.prop(s, "topo_label_limit")
+        box = layout.box()
+        box.label(text="Nodos / estaciones")
+        box.operator("topo.add_node", icon='EMPTY_AXIS')
+        box.operator("topo.import_csv", icon='IMPORT')
+        row = box.row(align=True)
+        row.label(text="Exportar", icon='EXPORT')
+        row.operator("topo.export_csv", text="CSV")
+        row.operator("topo.export_geojson", text="GeoJSON")
+        row.operator("topo.export_ply", text="PLY")
+        box.operator("topo.adjust_network", icon='MOD_LATTICE')
+        box = layout.box()
+        box.label(text="Resolución en segundo plano")
+        job = background_solve()
+        if job is not None:
+            box.label(text=f"{job.done}/{job.total} tareas" if job.total else "Preparando...", icon='TIME')
+            box.operator("topo.solve_cancel", icon='CANCEL')
+        else:
+            box.prop(s, "topo_solve_workers")
+            row = box.row(align=True)
+            row.operator("topo.solve_background", text="Intersecciones", icon='FULLSCREEN_EXIT').kind = 'INTERSECCIONES'
+            row.operator("topo.solve_background", text="Ajuste", icon='MOD_LATTICE').kind = 'AJUSTE'
+            report = background_report()
+            if report is not None:
+                level, text = report
+                box.label(text=text, icon=REPORT_ICONS[level])
+        box = layout.box()
+        box.label(text="Nuevo punto desde observación")
+        box.label(text="Poner Distancia=0 para crear rayo 'infinito'", icon='INFO')
+        col = box.column(align=True)
+        row = col.row(align=True)
+        row.prop(s, "topo_active_origin", text="Origen")
+        row.operator("topo.search_origin", text="", icon='VIEWZOOM')
+        col.prop(s, "topo_new_point_name", text="Nombre")
+        col.prop(s, "topo_azimuth", text="Acimut (°)")
+        col.prop(s, "topo_inclination", text="Inclinación (°)")
+        col.prop(s, "topo_distance", text="Distancia (m)")
+        # --- NUEVO CAMPO EN LA INTERFAZ ---
+        col.prop(s, "topo_observer_height", text="Altura Obs. (m)")
+        
+        op = col.operator("topo.add_node_from_obs", icon='OUTLINER_OB_EMPTY')
+        op.origin = s.topo_active_origin
+        op.point_name = s.topo_new_point_name
+        op.azimuth = s.topo_azimuth
+        op.inclination = s.topo_inclination
+        op.distance = s.topo_distance
+        op.observer_height = s.topo_observer_height
+        box = layout.box()
+        box.label(text="Dioptra en directo")
+        feed = live_feed()
+        connected = feed is not None and feed.running
+        col = box.column(align=True)
+        col.enabled = not connected
+        col.prop(s, "topo_live_url", text="URL")
+        col.prop(s, "topo_live_interval")
+        box.prop(s, "topo_live_auto_commit")
+        box.operator("topo.live_ingest", text="Desconectar" if connected else "Conectar", icon='PAUSE' if connected else 'PLAY', depress=connected)
+        if connected:
+            box.label(text=f"{feed.received} lecturas, {feed.dropped} descartadas")
+            if feed.error:
+                box.label(text=feed.error, icon='ERROR')
+
+class TOPO_PT_performance(bpy.types.Panel):
+    bl_label = "Rendimiento"
+    bl_idname = "TOPO_PT_performance"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Topografía'
+    bl_parent_id = "TOPO_PT_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.window_manager, "topo_perf_enabled")
+        row = layout.row(align=True)
+        row.operator("topo.perf_reset", icon='X')
+        row.operator("topo.perf_profile", text="Parar cProfile" if recorder.profiling else "Iniciar cProfile",
+                     icon='PAUSE' if recorder.profiling else 'PLAY', depress=recorder.profiling)
+        row = layout.row(align=True)
+        row.operator("topo.perf_dump_json", text="JSON", icon='EXPORT')
+        row.operator("topo.perf_dump_profile", text="cProfile", icon='EXPORT')
+        data = recorder.snapshot()
+        if not data["stages"] and not data["counters"]:
+            layout.label(text="Sin medidas: activa \"Medir tiempos\"" if not recorder.enabled else "Sin medidas todavía")
+            return
+        col = layout.column(align=True)
+        for name, entry in list(data["stages"].items())[:PERF_ROWS]:
+            row = col.row()
+            row.label(text=name)
+            row.label(text=f"{entry['seconds'] * 1000:.1f} ms / {entry['calls']}")
+        if data["counters"]:
+            col = layout.column(align=True)
+            for name, value in data["counters"].items():
+                row = col.row()
+                row.label(text=name)
+                row.label(text=str(value))
+
+# ==========================
+# Operador NUEVO: Crear línea manual
+# ==========================
+class TOPO_OT_create_manual_line(bpy.types.Operator):
+    """Crea una línea entre dos nodos/puntos seleccionados y muestra su distancia"""
+    bl_idname = "topo.create_manual_line"
+    bl_label = "Crear línea manual"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        # Requiere exactamente 2 objetos seleccionados que sean nodo o punto
+        sel = [obj for obj in context.selected_objects if obj.get("tipo") in {"nodo", "punto"}]
+        return len(sel) == 2
+
+    @timed("op.create_manual_line")
+    def execute(self, context):
+        sel = [obj for obj in context.selected_objects if obj.get("tipo") in {"nodo", "punto"}]
+        if len(sel) != 2:
+            self.report({'WARNING'}, "Debes seleccionar exactamente 2 nodos o puntos.")
+            return {'CANCELLED'}
+
+        A, B = sel
+        loc_A, loc_B = A.location, B.location
+        dist = (loc_B - loc_A).length
+
+        with scene_batch():
+            # Crear la línea; origen y destino, para seguir a los extremos si se mueven
+            col = ensure_collection("Lineas_Manual")
+            line_obj = _create_line(context, f"Linea_{A.name}_{B.name}", loc_A, loc_B, col, "manuales",
+                                    origen=A.name, destino=B.name, vector=loc_B - loc_A)
+
+            # Texto de distancia
+            mid = (loc_A + loc_B) / 2.0
+            set_line_props(line_obj, dist_texto=create_label(context, f"dist_{A.name}_{B.name}", f"{dist:.2f} m", mid, col, 0.9,
+                                                             "texto_distancia", owners=(A.name, B.name)))
+
+        self.report({'INFO'}, f"Línea manual creada entre {A.name} y {B.name}. Distancia: {dist:.2f} m")
+        return {'FINISHED'}
+
+
+# ==========================
+# Panel NUEVO: Herramientas de líneas manuales
+# ==========================
+class TOPO_PT_manual_lines(bpy.types.Panel):
+    bl_label = "Líneas Manuales"
+    bl_idname = "TOPO_PT_manual_lines"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Topografía'
+
+    def draw(self, context):
+        layout = self.layout
+        box = layout.box()
+        box.label(text="Selecciona 2 nodos/puntos")
+        box.operator("topo.create_manual_line", icon='MESH_DATA')
+
+
+# --- PANEL ACCIONES ---
+class TOPO_PT_selection_panel(bpy.types.Panel):
+    bl_label = "Acciones de Observación"
+    bl_idname = "TOPO_PT_selection_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Topografía'
+    
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        box = layout.box()
+        obj = context.active_object
+        if obj is None:
+            box.label(text="Selecciona una observación")
+            return
+        if obj.get("tipo") == "capa_lineas":
+            box.label(text=f"Capa: {obj.name} ({len(selected_lines(context))} aristas seleccionadas)")
+        else:
+            box.label(text=f"Observación: {obj.name}")
+            residual = obj.get("residuo")
+            if residual is not None:
+                az, inc, dist = residual
+                text = f"Residuo: {az:+.3f}° / {inc:+.3f}°" if az == az else "Sin punto visado en el ajuste"
+                box.label(text=text + (f" / {dist:+.3f} m" if dist == dist else ""))
+
+        # Aviso para el usuario
+        box.label(
+            text="Sólo líneas con DISTANCIA definida!",
+            icon='INFO'
+        )
+        
+        # Solo el botón, SIN el checkbox redundante
+        box.operator("topo.project_to_ground", icon='TRIA_DOWN_BAR')
+
+
+classes = [
+    TOPO_OT_add_node, 
+    TOPO_OT_add_node_from_obs,
+    TOPO_OT_search_origin,
+    TOPO_OT_import_csv,
+    TOPO_OT_export_csv,
+    TOPO_OT_export_geojson,
+    TOPO_OT_export_ply,
+    TOPO_OT_live_ingest,
+    TOPO_OT_adjust_network,
+    TOPO_OT_solve_background,
+    TOPO_OT_solve_cancel,
+    TOPO_OT_project_to_ground, # Añadir nuevo operador
+    TOPO_PT_panel,
+    TOPO_PT_performance,
+    TOPO_OT_perf_reset,
+    TOPO_OT_perf_profile,
+    TOPO_OT_perf_dump_json,
+    TOPO_OT_perf_dump_profile,
+    TOPO_PT_selection_panel, # Añadir nuevo panel
+    TOPO_OT_create_manual_line,   # <--- NUEVO
+    TOPO_PT_manual_lines   
+]
+def menu_func_import(self, context):
+    self.layout.operator(TOPO_OT_import_csv.bl_idname, text="Dioptra PayoMapeo (.csv)")
+
+def menu_func_export(self, context):
+    self.layout.operator(TOPO_OT_export_csv.bl_idname, text="Red PayoMapeo (.csv)")
+    self.layout.operator(TOPO_OT_export_geojson.bl_idname, text="Red PayoMapeo (.geojson)")
+    self.layout.operator(TOPO_OT_export_ply.bl_idname, text="Red PayoMapeo (.ply)")
+
+def register():
+    for cls in classes: bpy.utils.register_class(cls)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        handlers.append(_invalidate_caches)
+    bpy.app.handlers.depsgraph_update_post.append(_sync_stations)
+    bpy.app.handlers.depsgraph_update_post.append(_propagate_edits)
+    bpy.app.handlers.load_post.append(_file_loaded)
+    bpy.app.handlers.save_pre.append(save_observation_cache)
+    bpy.app.handlers.save_pre.append(_save_pair_ledger)
+    labels.register()
+    bpy.types.Scene.topo_use_declination = bpy.props.BoolProperty(name="Usar declinación", default=False)
+    bpy.types.Scene.topo_declination = bpy.props.FloatProperty(name="Declinación (°)", default=0.0)
+    bpy.types.Scene.topo_intersection_margin = bpy.props.FloatProperty(name="Margen de Intersección (m)", default=0.1, min=0.001, soft_max=5.0, step=0.1, precision=3)
+    bpy.types.Scene.topo_active_origin = bpy.props.EnumProperty(name="Origen", items=nodes_enum_items)
+    bpy.types.Scene.topo_new_point_name = bpy.props.StringProperty(name="Nombre punto", default="Punto")
+    bpy.types.Scene.topo_azimuth = bpy.props.FloatProperty(name="Acimut (°)", default=0.0)
+    bpy.types.Scene.topo_inclination = bpy.props.FloatProperty(name="Inclinación (°)", default=0.0)
+    bpy.types.Scene.topo_distance = bpy.props.FloatProperty(name="Distancia (m)", default=10.0, min=0.0)
+    # --- NUEVA PROPIEDAD DE ESCENA ---
+    bpy.types.Scene.topo_observer_height = bpy.props.FloatProperty(name="Altura Observador (m)", default=0.0, min=0.0)
+    bpy.types.Scene.topo_compact_geometry = bpy.props.BoolProperty(
+        name="Geometría compacta",
+        description="Guardar rayos, segmentos, alturas y proyecciones como aristas de una malla por colección en lugar de un objeto por línea",
+        default=False
+    )
+    bpy.types.Scene.topo_label_mode = bpy.props.EnumProperty(
+        name="Etiquetas",
+        description="Cómo se muestran los textos de distancia y altura",
+        items=[('OBJETOS', "Objetos de texto", "Un objeto de texto por etiqueta"),
+               ('CERCANAS', "Solo cercanas", "Dibujadas sobre la vista 3D, sin objetos: las próximas a la vista y las de lo seleccionado"),
+               ('SUPERPUESTAS', "Superpuestas", "Dibujadas sobre la vista 3D, sin objetos (redes grandes)")],
+        default='OBJETOS',
+        update=label_mode_changed
+    )
+    bpy.types.Scene.topo_label_distance = bpy.props.FloatProperty(name="Distancia (m)", description="Las etiquetas más lejanas de la vista se ocultan", default=LABEL_DISTANCE, min=1.0)
+    bpy.types.Scene.topo_label_limit = bpy.props.IntProperty(name="Máximo", description="Etiquetas visibles como máximo", default=LABEL_LIMIT, min=1)
+    bpy.types.Scene.topo_live_url = bpy.props.StringProperty(
+        name="URL de la dioptra",
+        description="Dirección de /json con la IP que muestra la pantalla de la dioptra",
+        default="http://192.168.1.100/json"
+    )
+    bpy.types.Scene.topo_live_interval = bpy.props.FloatProperty(name="Intervalo (s)", default=LIVE_INTERVAL, min=0.05, soft_max=5.0)
+    bpy.types.Scene.topo_live_auto_commit = bpy.props.BoolProperty(
+        name="Guardar al apuntar",
+        description="Crear la observación sola cuando la puntería se queda quieta un momento",
+        default=False
+    )
+    bpy.types.WindowManager.topo_perf_enabled = bpy.props.BoolProperty(
+        name="Medir tiempos",
+        description="Medir los operadores y las etapas internas del addon (apagado casi no cuesta nada)",
+        default=False,
+        update=_perf_toggled
+    )
+    bpy.types.Scene.topo_solve_workers = bpy.props.IntProperty(
+        name="Procesos",
+        description="Procesos para resolver en segundo plano (0: uno por núcleo)",
+        default=0, min=0
+    )
+
+def unregister():
+    stop_live()
+    cancel_background_solve()
+    labels.unregister()
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
+    for cls in reversed(classes): bpy.utils.unregister_class(cls)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _invalidate_caches in handlers:
+            handlers.remove(_invalidate_caches)
+    for handler in (_sync_stations, _propagate_edits):
+        if handler in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(handler)
+    for handlers, handler in ((bpy.app.handlers.load_post, _file_loaded), (bpy.app.handlers.save_pre, save_observation_cache),
+                              (bpy.app.handlers.save_pre, _save_pair_ledger)):
+        if handler in handlers:
+            handlers.remove(handler)
+    reset_state()
+    del bpy.types.Scene.topo_use_declination; del bpy.types.Scene.topo_declination
+    del bpy.types.Scene.topo_intersection_margin; del bpy.types.Scene.topo_active_origin
+    del bpy.types.Scene.topo_new_point_name; del bpy.types.Scene.topo_azimuth
+    del bpy.types.Scene.topo_inclination; del bpy.types.Scene.topo_distance
+    # --- BORRAR NUEVA PROPIEDAD ---
+    del bpy.types.Scene.topo_observer_height
+    del bpy.types.Scene.topo_compact_geometry
+    del bpy.types.Scene.topo_live_url; del bpy.types.Scene.topo_live_interval
+    del bpy.types.Scene.topo_live_auto_commit
+    del bpy.types.Scene.topo_solve_workers
+    del bpy.types.WindowManager.topo_perf_enabled
+    recorder.stop_profile()
+    recorder.enabled = False
+    del bpy.types.Scene.topo_label_mode; del bpy.types.Scene.topo_label_distance
+    del bpy.types.Scene.topo_label_limit
@@ -0,0 +1,71 @@
+"""Resolución en segundo plano.
+
+La red de la escena se copia (Survey o arrays de líneas) y se resuelve en
+otros procesos. Un temporizador sigue el avance y, al terminar, aplica el
+resultado como lo harían los operadores normales. Lo que cambie en la escena
+mientras tanto no entra en el cálculo.
+"""
+import bpy
+
+from .batch import scene_batch
+from .core.instrument import timed
+from .utils import on_reset, redraw_3d_views
+
+SOLVE_TICK = 0.25  # segundos entre consultas del avance
+
+REPORT_ICONS = {'INFO': 'CHECKMARK', 'WARNING': 'ERROR', 'ERROR': 'CANCEL'}
+
+_solve = None         # BackgroundSolve en marcha
+_solve_apply = None   # apply(context, resultado) -> (nivel, resumen)
+_solve_report = None  # (nivel, resumen) de la última resolución, como en Operator.report
+
+@on_reset
+def _cancel_on_load(loaded):
+    if loaded:
+        cancel_background_solve()  # la copia era de otro archivo
+
+def background_solve():
+    return _solve
+
+def background_report():
+    return _solve_report
+
+def start_background_solve(job, apply):
+    """Lanza `job` (un BackgroundSolve sin arrancar) y, al terminar, llama a `apply(context, resultado)`
+    dentro de un lote de la escena; `apply` devuelve el (nivel, resumen) para el panel."""
+    global _solve, _solve_apply
+    cancel_background_solve()
+    _solve, _solve_apply = job.start(), apply
+    if not bpy.app.timers.is_registered(_solve_tick):
+        bpy.app.timers.register(_solve_tick, first_interval=SOLVE_TICK, persistent=True)
+    return _solve
+
+def cancel_background_solve():
+    """Cancela la resolución en marcha; su resultado ya no se aplica."""
+    global _solve
+    if _solve is not None:
+        _solve.cancel()
+        _solve = None
+    if bpy.app.timers.is_registered(_solve_tick):
+        bpy.app.timers.unregister(_solve_tick)
+
+@timed("background.tick")
+def _solve_tick():
+    """Temporizador: redibuja el avance y, cuando termina, aplica el resultado a la escena."""
+    global _solve, _solve_report
+    if _solve is None:
+        return None
+    context = bpy.context
+    redraw_3d_views(context)
+    if not _solve.finished:
+        return SOLVE_TICK
+    job, _solve = _solve, None
+    if job.error:
+        _solve_report = ('ERROR', f"Error: {job.error}")
+    elif job.cancelled:
+        _solve_report = ('INFO', "Cancelada")
+    else:
+        with scene_batch(undo="Resolver en segundo plano"):
+            _solve_report = _solve_apply(context, job.result)
+    redraw_3d_views(context)  # el resumen sale en el panel
+    return None
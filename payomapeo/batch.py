@@ -0,0 +1,252 @@
+"""Lotes de cambios en la escena.
+
+Los operadores crean nodos, líneas y textos dentro de `scene_batch`. Cada
+cosa se prepara al momento, con su nombre definitivo y sus propiedades, y
+queda registrada en la caché de observaciones, el grafo y el registro de
+pares; lo que toca la escena se deja para el final: los objetos se enlazan a
+su colección todos juntos y las aristas nuevas de cada capa compacta se
+vuelcan de una vez, con una sola ampliación de la malla y un solo
+`update()`; los materiales se asignan por colores, buscando cada uno una vez. Dentro de un operador con UNDO todo queda en un paso de
+deshacer; desde un temporizador el lote añade el suyo al confirmarse. Si
+sale una excepción del lote no se confirma nada: los objetos sin enlazar se
+borran y las cachés se sueltan para rehacerse de la escena.
+"""
+from array import array
+
+import bpy
+import numpy as np
+
+from .core.instrument import count, timed
+from .layers import (EDGE_ATTRIBUTES, EDGE_NAME_FIELDS, EDGE_VECTOR_FIELDS, LINE_LAYERS, EdgeLine, add_layer_rows,
+                     layer_name_index, layer_rows)
+from .utils import apply_material, assign_material, palette_material, reset_state
+
+BULK_FLUSH_RATIO = 8  # con al menos 1/8 de aristas nuevas, la capa se reescribe entera con foreach_set
+
+_batch = None  # SceneBatch abierto
+
+# Lo que se lee de una arista recién añadida mientras no se escriban sus atributos
+_NEW_EDGE = {"vector": (0.0, 0.0, 0.0), "observer_height": 0.0, "is_projected": False, "residuo": (0.0, 0.0, 0.0)}
+
+class PendingEdge(EdgeLine):
+    """Arista de un lote aún sin volcar: guarda extremos y propiedades hasta que se confirma."""
+    def __init__(self, layer, line_id, a, b):
+        super().__init__(layer, line_id)
+        self.ends = (tuple(a), tuple(b))
+        self.props = dict(_NEW_EDGE)
+        self.pending = True
+
+    def get(self, key, default=None):
+        if not self.pending or key == "tipo":
+            return super().get(key, default)
+        value = self.props.get(key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if not self.pending:
+            super().__setitem__(key, value)
+        elif key in EDGE_VECTOR_FIELDS:  # con la precisión del atributo, como si ya estuviera en la malla
+            self.props[key] = tuple(array("f", value))
+        elif key == "observer_height":
+            self.props[key] = float(np.float32(value))
+        else:
+            self.props[key] = value
+
+class SceneBatch:
+    def __init__(self, undo=None):
+        self.undo = undo        # mensaje del paso de deshacer que se añade al confirmar, si lo hay
+        self.depth = 0
+        self.collections = {}   # nombre -> colección
+        self.links = {}         # nombre de colección -> (colección, [objetos por enlazar])
+        self.paints = {}        # color -> [objetos por pintar]
+        self.edges = {}         # nombre de capa -> (capa, [PendingEdge])
+        self.pending = {}       # nombre de línea -> PendingEdge
+
+    def __enter__(self):
+        global _batch
+        if _batch is None:
+            _batch = self
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, *_exc):
+        global _batch
+        self.depth -= 1
+        if self.depth == 0:
+            _batch = None
+            if exc_type is None:
+                self.commit()
+            else:
+                self.discard()
+        return False
+
+    def link(self, obj, collection):
+        self.links.setdefault(collection.name, (collection, []))[1].append(obj)
+
+    def paint(self, obj, color):
+        self.paints.setdefault(tuple(color), []).append(obj)
+
+    def add_edge(self, layer, a, b, **props):
+        line_id = layer["next_id"]
+        layer["next_id"] = line_id + 1
+        line = PendingEdge(layer, line_id, a, b)
+        for key, value in props.items():
+            line[key] = value
+        self.edges.setdefault(layer.name, (layer, []))[1].append(line)
+        self.pending[line.name] = line
+        return line
+
+    @timed("batch.commit")
+    def commit(self):
+        for color, objects in self.paints.items():
+            mat = palette_material(color)
+            for obj in objects:
+                assign_material(obj, mat, color)
+        for layer, edges in self.edges.values():
+            _flush_edges(layer, edges)
+        for collection, objects in self.links.values():
+            link = collection.objects.link
+            for obj in objects:
+                link(obj)
+            count("batch.objects_linked", len(objects))
+        self.edges.clear()
+        self.pending.clear()
+        self.links.clear()
+        self.paints.clear()
+        if self.undo and bpy.ops.ed.undo_push.poll():
+            bpy.ops.ed.undo_push(message=self.undo)
+
+    def discard(self):
+        """Deja la escena sin lo que el lote tenía por enlazar o volcar."""
+        for _collection, objects in self.links.values():
+            for obj in objects:
+                bpy.data.objects.remove(obj)
+        self.edges.clear()
+        self.pending.clear()
+        self.links.clear()
+        self.paints.clear()
+        reset_state()  # las cachés ya conocían lo descartado
+
+def scene_batch(undo=None):
+    """Contexto para crear en lote: el que ya esté abierto o uno nuevo que se confirma al salir."""
+    return _batch if _batch is not None else SceneBatch(undo)
+
+def pending_lines():
+    """Aristas del lote abierto que aún no están en la malla."""
+    return list(_batch.pending.values()) if _batch is not None else []
+
+def link_object(obj, collection):
+    """Enlaza un objeto nuevo a su colección, o lo deja en cola si hay un lote abierto."""
+    if _batch is not None:
+        _batch.link(obj, collection)
+    else:
+        collection.objects.link(obj)
+
+def paint_object(obj, color):
+    """Aplica el material de la paleta a un objeto nuevo, o lo deja en cola si hay un lote abierto."""
+    if _batch is not None:
+        _batch.paint(obj, color)
+    else:
+        apply_material(obj, color)
+
+@timed("ensure_collection")
+def ensure_collection(name, parent=None):
+    col = _batch.collections.get(name) if _batch is not None else None
+    if col is None:
+        col = bpy.data.collections.get(name)
+        if not col:
+            col = bpy.data.collections.new(name)
+            (parent or bpy.context.scene.collection).children.link(col)
+        if _batch is not None:
+            _batch.collections[name] = col
+    return col
+
+def ensure_line_layer(collection, category):
+    """Devuelve (creándola si hace falta) la malla compartida de una categoría de líneas en la colección."""
+    layer = bpy.data.objects.get(collection.get(f"capa_{category}", ""))
+    if layer is not None:
+        return layer
+    prefix, tipo, color = LINE_LAYERS[category]
+    mesh = bpy.data.meshes.new(f"{prefix}_{collection.name}")
+    layer = bpy.data.objects.new(mesh.name, mesh)
+    layer["tipo"] = "capa_lineas"
+    layer["categoria"] = category
+    if tipo:
+        layer["tipo_linea"] = tipo
+    layer["nombres"] = {}
+    layer["next_id"] = 0
+    for name, data_type in EDGE_ATTRIBUTES:
+        mesh.attributes.new(name, data_type, 'EDGE')
+    paint_object(layer, color)
+    link_object(layer, collection)
+    collection[f"capa_{category}"] = layer.name
+    return layer
+
+def layer_add_line(layer, a, b, **props):
+    """Añade una arista a la capa; dentro de un lote se vuelca al confirmarlo, si no, enseguida."""
+    with scene_batch() as batch:
+        return batch.add_edge(layer, a, b, **props)
+
+def _edge_column(layer, edges, name, data_type):
+    """Valores del atributo `name` de las aristas pendientes, como array listo para foreach_set."""
+    if name == "line_id":
+        return np.array([edge.line_id for edge in edges], dtype=np.int32)
+    if name in EDGE_NAME_FIELDS:
+        values = [edge.props.get(name) for edge in edges]
+        return np.array([-1 if value is None else layer_name_index(layer, value) for value in values], dtype=np.int32)
+    return np.array([edge.props[name] for edge in edges], dtype=np.int32 if data_type == 'INT' else np.float32)
+
+@timed("batch.flush_edges")
+def _flush_edges(layer, edges):
+    """Vuelca a la malla de la capa las aristas pendientes de un lote."""
+    mesh = layer.data
+    n, v0, e0 = len(edges), len(mesh.vertices), len(mesh.edges)
+    co = np.array([edge.ends for edge in edges], dtype=np.float32).reshape(-1, 3)
+    mesh.vertices.add(2 * n)
+    mesh.edges.add(n)
+    bulk = n * BULK_FLUSH_RATIO >= e0 + n
+    if bulk:
+        buf = np.empty((v0 + 2 * n) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", buf)
+        buf[v0 * 3:] = co.ravel()
+        mesh.vertices.foreach_set("co", buf)
+        ends = np.empty((e0 + n) * 2, dtype=np.int32)
+        mesh.edges.foreach_get("vertices", ends)
+        ends[e0 * 2:] = np.arange(v0, v0 + 2 * n, dtype=np.int32)
+        mesh.edges.foreach_set("vertices", ends)
+    else:
+        for k, (a, b) in enumerate(zip(co[0::2].tolist(), co[1::2].tolist())):
+            mesh.vertices[v0 + 2 * k].co = a
+            mesh.vertices[v0 + 2 * k + 1].co = b
+            mesh.edges[e0 + k].vertices = (v0 + 2 * k, v0 + 2 * k + 1)
+    for name, data_type in EDGE_ATTRIBUTES:
+        attr = mesh.attributes.get(name) or mesh.attributes.new(name, data_type, 'EDGE')
+        key = "vector" if data_type == 'FLOAT_VECTOR' else "value"
+        values = _edge_column(layer, edges, name, data_type)
+        if bulk:
+            buf = np.empty((e0 + n) * (3 if key == "vector" else 1), dtype=values.dtype)
+            attr.data.foreach_get(key, buf)
+            buf[len(buf) - values.size:] = values.ravel()
+            attr.data.foreach_set(key, buf)
+        else:
+            data = attr.data
+            for k, value in enumerate(values.tolist()):
+                setattr(data[e0 + k], key, value)
+    mesh.update()
+    add_layer_rows(layer, ((edge.line_id, e0 + k) for k, edge in enumerate(edges)))
+    for edge in edges:
+        edge.pending = False
+    count("batch.edges_flushed", n)
+
+def get_line(key):
+    """Objeto línea o arista de capa compacta (`Capa:id`) con ese nombre, o None."""
+    if _batch is not None and key in _batch.pending:
+        return _batch.pending[key]
+    obj = bpy.data.objects.get(key)
+    if obj is not None:
+        return obj
+    layer_name, _, line_id = key.rpartition(":")
+    layer = bpy.data.objects.get(layer_name)
+    if layer is None or layer.get("tipo") != "capa_lineas" or not line_id.isdigit():
+        return None
+    return EdgeLine(layer, int(line_id)) if int(line_id) in layer_rows(layer) else None
@@ -0,0 +1,18 @@
+"""Núcleo de cálculo de PayoMapeo: solo Python y NumPy, sin dependencias de Blender.
+
+- geometry: ángulos, direcciones, alturas y reglas de validez de las intersecciones.
+- model: la red (estaciones, observaciones y puntos derivados) y su resolución.
+- intersect: motor vectorizado de intersecciones.
+- spatial: índice espacial incremental de líneas.
+- cluster: agrupación de intersecciones en puntos de varios rayos.
+- adjust: ajuste de la red por mínimos cuadrados.
+- graph: grafo de dependencias para propagar cambios.
+- store: tabla de observaciones por columnas, empaquetable en bytes (la caché del addon).
+- labels: qué etiquetas mostrar según la distancia a la vista.
+- fieldlog: lectura de los CSV y del /json de la dioptra.
+- export: escritura por trozos de la red a CSV, GeoJSON y PLY.
+- live: consulta en directo de la dioptra en segundo plano.
+- parallel: intersección y ajuste de redes grandes en un grupo de procesos.
+- ledger: registro de los pares de visuales ya intersecados.
+- instrument: tiempos y contadores de las rutas calientes, y perfiles de cProfile.
+"""
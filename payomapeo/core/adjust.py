@@ -0,0 +1,264 @@
+"""Ajuste de la red por mínimos cuadrados (Levenberg-Marquardt disperso).
+
+Cada observación aporta ecuaciones de acimut, inclinación y, si la tiene,
+distancia hacia el punto que visa: su destino en los segmentos o las
+intersecciones en las que participa en los rayos. Las coordenadas de todas
+las estaciones libres y puntos se resuelven a la vez; los nodos quedan fijos.
+
+Con SciPy instalado las ecuaciones normales se resuelven con factorización
+dispersa; sin él, en NumPy eliminando los puntos (complemento de Schur) y
+factorizando el sistema reducido de las estaciones libres.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .intersect import SEGMENT
+
+try:
+    from scipy import sparse
+    from scipy.sparse.linalg import spsolve
+except ImportError:  # SciPy es opcional
+    sparse = None
+
+Adjustment = namedtuple("Adjustment", "locations residuals links link_residuals sigma0 iterations converged")
+
+SIGMA_ANGLE = 0.5      # precisión angular (°) por defecto
+SIGMA_DISTANCE = 0.05  # precisión de distancia (m) por defecto
+SCHUR_MAX_STATIONS = 1000  # estaciones libres a partir de las cuales se itera en vez de factorizar
+MAX_ITERATIONS = 500   # iteraciones de Marquardt; las poligonales con visuales casi paralelas piden más de cien
+STEP_TOL = 1e-3        # corrección, en desviaciones típicas de cada coordenada, por debajo de la cual se ha convergido
+
+def observation_links(survey):
+    """Pares (índice de observación, punto visado) que entran en el ajuste."""
+    links = [(k, obs.target) for k, obs in enumerate(survey.observations) if obs.kind == SEGMENT and obs.target]
+    for point in survey.points.values():
+        links.extend((k, point.name) for k in point.rays)
+    return links
+
+def observation_residuals(k, link_res, n_obs):
+    """Residuos por observación a partir de los de cada ecuación (`link_res`, de la observación `k`).
+
+    Los angulares son la media cuadrática, con signo, de los de sus puntos (un
+    rayo puede tocar varios); el de distancia, el de su segmento.
+    """
+    k = np.asarray(k, dtype=np.int64)
+    res = np.full((n_obs, 3), np.nan)
+    count = np.bincount(k, minlength=n_obs)
+    seen = count > 0
+    for col in range(2):
+        res[seen, col] = np.sqrt(np.bincount(k, link_res[:, col] ** 2, minlength=n_obs)[seen] / count[seen])
+        res[seen, col] *= np.sign(np.bincount(k, link_res[:, col], minlength=n_obs)[seen])
+    has_dist = ~np.isnan(link_res[:, 2])
+    res[k[has_dist], 2] = link_res[has_dist, 2]
+    return res
+
+def _pcg(matvec, b, precondition, tol=1e-10, max_iter=1000):
+    """Gradiente conjugado precondicionado para el sistema simétrico A x = b."""
+    x = np.zeros_like(b)
+    r = b.copy()
+    z = precondition(r)
+    p = z.copy()
+    rz = r @ z
+    stop = tol * np.sqrt(b @ b)
+    for _ in range(max_iter):
+        Ap = matvec(p)
+        alpha = rz / (p @ Ap)
+        x += alpha * p
+        r -= alpha * Ap
+        if np.sqrt(r @ r) <= stop:
+            break
+        z = precondition(r)
+        rz, rz_old = r @ z, rz
+        p = z + (rz / rz_old) * p
+    return x
+
+def _block_sum(index, values, n):
+    """Suma `values` (k, ...) por grupos de `index` en un array (n, ...)."""
+    flat = values.reshape(len(values), int(np.prod(values.shape[1:])))
+    out = np.column_stack([np.bincount(index, flat[:, c], minlength=n) for c in range(flat.shape[1])])
+    return out.reshape((n,) + values.shape[1:])
+
+def _schur_solve(blocks, b, ct, co, cv, is_origin):
+    """Resuelve las ecuaciones normales eliminando primero los puntos.
+
+    Un punto que no es origen de ninguna visual solo se liga a estaciones, así
+    que su bloque 3x3 se invierte por separado y queda un sistema denso pequeño
+    con las estaciones libres (complemento de Schur, como en un ajuste de haces).
+    `ct`, `co`, `cv` son los bloques cruzados (visado, origen) de JᵀJ.
+    """
+    n_blocks = len(blocks)
+    n_o = int(is_origin.sum())
+    q = np.full(n_blocks, -1)
+    q[is_origin] = np.arange(n_o)
+    leaf = ~is_origin
+    inv = np.zeros_like(blocks)
+    inv[leaf] = np.linalg.inv(blocks[leaf])
+    S = np.zeros((n_o, n_o, 3, 3))
+    S[np.arange(n_o), np.arange(n_o)] = blocks[is_origin]
+    rhs = b[is_origin].copy()
+    # Cruces entre estaciones libres
+    oo = is_origin[ct]
+    np.add.at(S, (q[ct[oo]], q[co[oo]]), cv[oo])
+    np.add.at(S, (q[co[oo]], q[ct[oo]]), cv[oo].transpose(0, 2, 1))
+    # Cruces punto-estación sumados por pareja, ordenados por punto
+    pairs, which = np.unique(ct[~oo] * max(n_o, 1) + q[co[~oo]], return_inverse=True)
+    K = _block_sum(which.ravel(), cv[~oo], len(pairs))
+    l, a = pairs // max(n_o, 1), pairs % max(n_o, 1)
+    W = inv[l] @ K
+    KT = K.transpose(0, 2, 1)
+    np.add.at(rhs, a, -(KT @ (inv[l] @ b[l][:, :, None]))[:, :, 0])
+    start = np.searchsorted(l, l)
+    count = np.bincount(l, minlength=n_blocks)[l]
+    for k in range(int(count.max(initial=0)) if n_o else 0):
+        e = np.nonzero(k < count)[0]
+        np.add.at(S, (a[e], a[start[e] + k]), -(KT[e] @ W[start[e] + k]))
+    x = np.zeros((n_blocks, 3))
+    if n_o:
+        x[is_origin] = np.linalg.solve(S.transpose(0, 2, 1, 3).reshape(3 * n_o, 3 * n_o), rhs.ravel()).reshape(-1, 3)
+    coupled = _block_sum(l, (K @ x[is_origin][a][:, :, None])[:, :, 0], n_blocks) if n_o else 0.0
+    x[leaf] = (inv @ (b - coupled)[:, :, None])[leaf, :, 0]
+    return x
+
+def _spread(grad, target, origin, n_blocks):
+    """Raíz de la diagonal de JᵀJ por bloque: la inversa de la desviación típica a priori de cada coordenada."""
+    diag = np.zeros((n_blocks, 3))
+    for end in (target, origin):
+        ok = end >= 0
+        diag += _block_sum(end[ok], grad[ok] ** 2, n_blocks)
+    return np.sqrt(diag)
+
+def _solve_step(grad, target, origin, r, n_blocks, lam):
+    """Paso de Marquardt: (JᵀJ + lam·diag(JᵀJ)) dx = -Jᵀr.
+
+    Cada ecuación liga el punto visado (gradiente `grad`) con su origen
+    (gradiente `-grad`); `target` y `origin` son sus bloques de incógnitas,
+    -1 si están fijos.
+    """
+    outer = grad[:, :, None] * grad[:, None, :]
+    blocks = np.zeros((n_blocks, 3, 3))
+    b = np.zeros((n_blocks, 3))
+    for end, sign in ((target, 1.0), (origin, -1.0)):
+        ok = end >= 0
+        blocks += _block_sum(end[ok], outer[ok], n_blocks)
+        b -= _block_sum(end[ok], sign * grad[ok] * r[ok, None], n_blocks)
+    diag = np.arange(3)
+    blocks[:, diag, diag] += lam * blocks[:, diag, diag] + 1e-12
+    both = (target >= 0) & (origin >= 0)
+    ct, co, cv = target[both], origin[both], -outer[both]
+    if sparse is not None:
+        bi = np.arange(n_blocks)
+        I = np.concatenate([3 * i[:, None, None] + diag[None, :, None] + 0 * diag for i in (bi, ct, co)]).ravel()
+        J = np.concatenate([3 * j[:, None, None] + 0 * diag[None, :, None] + diag for j in (bi, co, ct)]).ravel()
+        V = np.concatenate((blocks, cv, cv.transpose(0, 2, 1))).ravel()
+        A = sparse.coo_matrix((V, (I, J)), shape=(3 * n_blocks, 3 * n_blocks)).tocsc()
+        return spsolve(A, b.ravel()).reshape(-1, 3)
+    is_origin = np.zeros(n_blocks, bool)
+    is_origin[origin[origin >= 0]] = True
+    if is_origin.sum() <= SCHUR_MAX_STATIONS:
+        return _schur_solve(blocks, b, ct, co, cv, is_origin)
+    # Demasiadas estaciones libres para el sistema denso: gradiente conjugado
+    inverse = np.linalg.inv(blocks)
+    def matvec(x):
+        x = x.reshape(-1, 3)
+        y = (blocks @ x[:, :, None])[:, :, 0]
+        y += _block_sum(ct, (cv @ x[co][:, :, None])[:, :, 0], n_blocks)
+        y += _block_sum(co, (cv.transpose(0, 2, 1) @ x[ct][:, :, None])[:, :, 0], n_blocks)
+        return y.ravel()
+    def precondition(x):
+        return (inverse @ x.reshape(-1, 3, 1)).ravel()
+    return _pcg(matvec, b.ravel(), precondition).reshape(-1, 3)
+
+def adjust(survey, fixed=None, sigma_angle=SIGMA_ANGLE, sigma_distance=SIGMA_DISTANCE, max_iter=MAX_ITERATIONS, tol=1e-6):
+    """Ajusta conjuntamente las coordenadas de la red.
+
+    `fixed` son los nombres que no se mueven (por defecto las estaciones de
+    tipo "nodo"). Devuelve un Adjustment con las nuevas posiciones de los
+    puntos libres y los residuos (acimut °, inclinación °, distancia m) de
+    cada observación, NaN donde no hay ecuación. Si no converge en `max_iter`
+    iteraciones `converged` es False y las posiciones no son las ajustadas.
+    """
+    links = observation_links(survey)
+    n_obs = len(survey.observations)
+    if fixed is None:
+        fixed = {name for name, st in survey.stations.items() if st.kind == "nodo"}
+    empty = np.full((n_obs, 3), np.nan)
+    if not links:
+        return Adjustment({}, empty, [], np.empty((0, 3)), 0.0, 0, True)
+
+    # Incógnitas: solo los puntos libres que aparecen en alguna ecuación
+    obs = survey.observations
+    names = list(dict.fromkeys([obs[k].origin for k, _ in links] + [t for _, t in links]))
+    slot = {name: i for i, name in enumerate(names)}
+    P = np.array([survey.location(name) for name in names], dtype=np.float64)
+    free = np.array([name not in fixed for name in names])
+    col_of = np.full(len(names), -1)
+    col_of[free] = np.arange(free.sum()) * 3
+    n = 3 * int(free.sum())
+
+    k = np.array([k for k, _ in links])
+    o = np.array([slot[obs[i].origin] for i in k])
+    t = np.array([slot[target] for _, target in links])
+    h = np.array([obs[i].observer_height for i in k])
+    az_meas = np.radians([obs[i].azimuth + survey.declination for i in k])
+    inc_meas = np.radians([obs[i].inclination for i in k])
+    has_dist = np.array([obs[i].kind == SEGMENT and obs[i].target == target for i, target in links])
+    dist_meas = np.array([obs[i].distance for i in k])[has_dist]
+    w_ang, w_dist = 1.0 / np.radians(sigma_angle), 1.0 / sigma_distance
+    m = len(links)
+
+    def residuals(P):
+        d = P[t] - P[o]
+        d[:, 2] -= h
+        r2 = np.maximum(d[:, 0] ** 2 + d[:, 1] ** 2, 1e-12)
+        s = np.sqrt(r2 + d[:, 2] ** 2)
+        r_az = (np.arctan2(d[:, 1], d[:, 0]) - az_meas + np.pi) % (2 * np.pi) - np.pi
+        r_inc = np.arctan2(d[:, 2], np.sqrt(r2)) - inc_meas
+        r_dist = s[has_dist] - dist_meas
+        return d, r2, s, np.concatenate((r_az * w_ang, r_inc * w_ang, r_dist * w_dist)), (r_az, r_inc, r_dist)
+
+    # Bloque de incógnitas del punto visado y del origen de cada ecuación (-1 si es fijo)
+    block_of = np.where(col_of >= 0, col_of // 3, -1)
+    eq_target = block_of[np.concatenate((t, t, t[has_dist]))]
+    eq_origin = block_of[np.concatenate((o, o, o[has_dist]))]
+
+    def jacobian(d, r2, s):
+        """Gradiente de cada ecuación respecto al punto visado (respecto al origen cambia de signo)."""
+        r = np.sqrt(r2)
+        zero = np.zeros(m)
+        return np.vstack((
+            np.column_stack((-d[:, 1] / r2, d[:, 0] / r2, zero)) * w_ang,
+            np.column_stack((-d[:, 2] * d[:, 0] / (r * s * s), -d[:, 2] * d[:, 1] / (r * s * s), r / (s * s))) * w_ang,
+            (d / s[:, None])[has_dist] * w_dist,
+        ))
+
+    d, r2, s, r, parts = residuals(P)
+    cost = r @ r
+    lam, converged, it = 1e-3, n == 0, 0
+    while not converged and it < max_iter:
+        it += 1
+        grad = jacobian(d, r2, s)
+        dx = _solve_step(grad, eq_target, eq_origin, r, n // 3, lam)
+        P_try = P.copy()
+        P_try[free] += dx
+        trial = residuals(P_try)
+        cost_try = trial[3] @ trial[3]
+        if cost_try <= cost:
+            # Un punto visado desde direcciones casi iguales se desliza sin fin por su visual: su corrección
+            # se mide frente a su propia desviación típica, que en esa dirección es enorme
+            converged = (np.abs(dx).max() < tol or (np.abs(dx) * _spread(grad, eq_target, eq_origin, n // 3)).max() < STEP_TOL
+                         or cost - cost_try <= 1e-14 * max(cost, 1.0))
+            P, (d, r2, s, r, parts), cost = P_try, trial, cost_try
+            lam = max(lam / 10.0, 1e-12)
+        else:
+            lam *= 10.0
+            converged = lam > 1e12  # ya no mejora: mínimo alcanzado
+
+    r_az, r_inc, r_dist = parts
+    link_res = np.full((m, 3), np.nan)
+    link_res[:, 0], link_res[:, 1] = np.degrees(r_az), np.degrees(r_inc)
+    link_res[has_dist, 2] = r_dist
+    dof = len(r) - n
+    sigma0 = float(np.sqrt(cost / dof)) if dof > 0 else 0.0
+    locations = {name: tuple(P[i].tolist()) for i, name in enumerate(names) if free[i]}
+    return Adjustment(locations, observation_residuals(k, link_res, n_obs), links, link_res, sigma0, it, bool(converged))
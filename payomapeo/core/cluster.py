@@ -0,0 +1,147 @@
+"""Agrupación de intersecciones: varias visuales al mismo objetivo dan un solo punto."""
+from collections import namedtuple
+from math import dist
+
+import numpy as np
+
+from .intersect import closest_points
+
+# anchor: índice del punto existente al que se une el grupo, o None si es nuevo; rays: índices de sus rectas
+Cluster = namedtuple("Cluster", "anchor rays location gap rms")
+
+class DisjointSet:
+    """Unión-búsqueda con compresión de caminos sobre claves cualesquiera."""
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        root = parent.setdefault(x, x)
+        while root != parent[root]:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def groups(self):
+        """Raíz -> miembros de cada grupo."""
+        found = {}
+        for x in self.parent:
+            found.setdefault(self.find(x), []).append(x)
+        return found
+
+def link_along_lines(entries, margin, anchors=()):
+    """Agrupa puntos que caen sobre una misma línea a menos de `margin` unos de otros.
+
+    `entries` son tuplas (línea, t, clave, punto). En cada línea se ordenan
+    por `t` y se unen los consecutivos cercanos (enlace simple). Las claves de
+    `anchors` (puntos ya existentes) nunca acaban en el mismo grupo y siempre
+    quedan como raíz del suyo.
+    """
+    ds = DisjointSet()
+    anchored = set(anchors)
+    for key in anchored:
+        ds.find(key)
+    by_line = {}
+    for line, t, key, point in entries:
+        ds.find(key)
+        by_line.setdefault(line, []).append((t, key, point))
+    for items in by_line.values():
+        items.sort(key=lambda item: item[0])
+        for (_, key_a, point_a), (_, key_b, point_b) in zip(items, items[1:]):
+            if dist(point_a, point_b) >= margin:
+                continue
+            root_a, root_b = ds.find(key_a), ds.find(key_b)
+            if root_a == root_b or (root_a in anchored and root_b in anchored):
+                continue
+            if root_b in anchored:
+                root_a, root_b = root_b, root_a
+            ds.parent[root_b] = root_a
+    return ds
+
+def least_squares_points(starts, units, groups, n_groups):
+    """Punto más próximo en mínimos cuadrados a las rectas de cada grupo y su distancia cuadrática media a ellas.
+
+    `groups[k]` es el grupo de la recta k. Con dos rectas el punto coincide con
+    el punto medio de la perpendicular común. Se resuelven todos los grupos a la vez.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    units = np.asarray(units, dtype=np.float64).reshape(-1, 3)
+    units = units / np.linalg.norm(units, axis=1)[:, None]
+    groups = np.asarray(groups, dtype=np.int64)
+    proj = np.eye(3) - units[:, :, None] * units[:, None, :]
+    A = np.zeros((n_groups, 3, 3))
+    b = np.zeros((n_groups, 3))
+    np.add.at(A, groups, proj)
+    np.add.at(b, groups, (proj @ starts[:, :, None])[:, :, 0])
+    X = (np.linalg.pinv(A) @ b[:, :, None])[:, :, 0]
+    offsets = (proj @ (X[groups] - starts)[:, :, None])[:, :, 0]
+    counts = np.bincount(groups, minlength=n_groups)
+    rms = np.sqrt(np.bincount(groups, (offsets ** 2).sum(axis=1), minlength=n_groups) / np.maximum(counts, 1))
+    return X, rms
+
+def pair_gaps(starts, units, groups, n_groups):
+    """Mayor hueco entre dos rectas del mismo grupo: con dos visuales, el de su perpendicular común.
+
+    Es el `gap` de una intersección; un grupo de una sola recta queda a 0.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    units = np.asarray(units, dtype=np.float64).reshape(-1, 3)
+    units = units / np.linalg.norm(units, axis=1)[:, None]
+    groups = np.asarray(groups, dtype=np.int64)
+    order = np.argsort(groups, kind="stable")
+    counts = np.bincount(groups, minlength=n_groups)
+    first = np.cumsum(counts) - counts
+    gaps = np.zeros(n_groups)
+    # Los grupos del mismo tamaño se resuelven juntos, todos sus pares a la vez
+    for size in np.unique(counts[counts > 1]).tolist():
+        which = np.nonzero(counts == size)[0]
+        a, b = np.triu_indices(size, 1)
+        members = order[first[which][:, None] + np.arange(size)]
+        i, j = members[:, a].ravel(), members[:, b].ravel()
+        _, gap, _, _, _ = closest_points(starts[i], units[i], starts[j], units[j])
+        gaps[which] = gap.reshape(len(which), -1).max(axis=1)
+    return gaps
+
+def fit_points(starts, units, groups, n_groups):
+    """(puntos, huecos, rms) de cada grupo de rectas: `least_squares_points` y `pair_gaps` juntos."""
+    points, rms = least_squares_points(starts, units, groups, n_groups)
+    return points, pair_gaps(starts, units, groups, n_groups), rms
+
+def cluster_hits(starts, units, hits, margin, anchors=()):
+    """Agrupa los cortes `hits` (índices de las rectas `starts`, `units`) en puntos y los resuelve.
+
+    `anchors` son los puntos que ya existen, como pares (posición, índices de
+    sus rectas): un grupo que toca uno de ellos se une a él con todas sus
+    rectas, y dos puntos existentes nunca se funden. Devuelve un `Cluster` por
+    grupo, con las rectas del punto existente primero y las nuevas por índice.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    units = np.asarray(units, dtype=np.float64).reshape(-1, 3)
+    units = units / np.linalg.norm(units, axis=1)[:, None]
+    hit_i, hit_j = hits.i.tolist(), hits.j.tolist()
+    touched = set(hit_i) | set(hit_j)
+    entries = []
+    for a, (location, rays) in enumerate(anchors):
+        for k in rays:
+            if k in touched:
+                entries.append((k, float(np.dot(np.subtract(location, starts[k]), units[k])), ("punto", a), tuple(location)))
+    for h, (a, b, M, t1, t2) in enumerate(zip(hit_i, hit_j, hits.points.tolist(), hits.t1.tolist(), hits.t2.tolist())):
+        entries += [(a, t1, h, M), (b, t2, h, M)]
+    linked = link_along_lines(entries, margin, [("punto", a) for a in range(len(anchors))]).groups()
+    found = []  # (punto existente o None, rectas)
+    for root, members in linked.items():
+        group_hits = [h for h in members if isinstance(h, int)]
+        if not group_hits:
+            continue
+        anchor = root[1] if isinstance(root, tuple) else None
+        old = list(dict.fromkeys(anchors[anchor][1])) if anchor is not None else []
+        new = sorted({k for h in group_hits for k in (hit_i[h], hit_j[h])} - set(old))
+        found.append((anchor, tuple(old + new)))
+    if not found:
+        return []
+    rays = np.array([k for _, cluster in found for k in cluster], dtype=np.int64)
+    groups = np.repeat(np.arange(len(found)), [len(cluster) for _, cluster in found])
+    points, gaps, rms = fit_points(starts[rays], units[rays], groups, len(found))
+    return [Cluster(anchor, cluster, tuple(location), gap, spread)
+            for (anchor, cluster), location, gap, spread in zip(found, points.tolist(), gaps.tolist(), rms.tolist())]
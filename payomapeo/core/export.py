@@ -0,0 +1,166 @@
+"""Exportación de la red a CSV, GeoJSON y PLY binario.
+
+Los datos llegan por trozos (PointChunk y LineChunk, de arrays) y cada trozo
+se escribe en cuanto llega, así que la memoria no depende del tamaño de la
+red. Las coordenadas son las locales de la escena, en metros.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+EXPORT_CHUNK = 1 << 15  # elementos por trozo
+
+# names, kinds: listas de cadenas; xyz (n, 3); gaps (n,), NaN si no es de intersección
+PointChunk = namedtuple("PointChunk", "names kinds xyz gaps")
+# starts, ends (n, 3); distances (n,); projected (n,) bool; residuals (n, 3), NaN si no hay
+LineChunk = namedtuple("LineChunk", "names kinds origins targets starts ends distances projected residuals")
+
+POINT_FIELDS = ("nombre", "tipo", "x", "y", "z", "gap")
+LINE_FIELDS = ("nombre", "tipo", "origen", "destino", "x1", "y1", "z1", "x2", "y2", "z2", "distancia", "proyectada",
+               "res_acimut", "res_inclinacion", "res_distancia")
+
+# Código de `tipo` de los vértices del PLY, que no admite cadenas
+PLY_KINDS = {"nodo": 0, "punto": 1, "interseccion": 2, "extremo": 3}
+
+def lines_path(path):
+    """Fichero de las líneas que acompaña al CSV de puntos: `red.csv` -> `red_lineas.csv`."""
+    root, ext = os.path.splitext(path)
+    return f"{root}_lineas{ext or '.csv'}"
+
+# Cada trozo se convierte en texto columna a columna y fila a fila con una
+# plantilla de %: mucho más rápido que pasar cada valor por csv o json.
+
+def _numbers(values, digits, missing):
+    """Columna numérica como textos con `digits` decimales; `missing` en lugar de NaN."""
+    fmt = f"%.{digits}f"
+    return [missing if v != v else fmt % v for v in values.tolist()]
+
+_CSV_SPECIAL = re.compile(r'[",\r\n]')
+
+def _csv_texts(values):
+    if not _CSV_SPECIAL.search("".join(values)):
+        return values
+    return ['"' + v.replace('"', '""') + '"' if _CSV_SPECIAL.search(v) else v for v in values]
+
+_json_text = json.JSONEncoder(ensure_ascii=False).encode
+
+def _json_texts(values):
+    return list(map(_json_text, values))
+
+def _rows(template, columns):
+    return map(template.__mod__, zip(*columns))
+
+# ---- CSV ----
+
+def write_csv(path, points, lines=None):
+    """Escribe los puntos en `path` y, si hay `lines`, las líneas en `lines_path(path)`. Devuelve (puntos, líneas)."""
+    counts = [0, 0]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(POINT_FIELDS) + "\r\n")
+        for chunk in points:
+            f.write("".join(_rows("%s,%s,%.4f,%.4f,%.4f,%s\r\n", (
+                _csv_texts(chunk.names), _csv_texts(chunk.kinds), *chunk.xyz.T.tolist(), _numbers(chunk.gaps, 4, "")))))
+            counts[0] += len(chunk.names)
+    if lines is None:
+        return tuple(counts)
+    with open(lines_path(path), "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(LINE_FIELDS) + "\r\n")
+        for chunk in lines:
+            f.write("".join(_rows("%s,%s,%s,%s,%.4f,%.4f,%.4f,%.4f,%.4f,%.4f,%s,%d,%s,%s,%s\r\n", (
+                _csv_texts(chunk.names), _csv_texts(chunk.kinds), _csv_texts(chunk.origins), _csv_texts(chunk.targets),
+                *chunk.starts.T.tolist(), *chunk.ends.T.tolist(), _numbers(chunk.distances, 4, ""),
+                chunk.projected.astype(int).tolist(), *(_numbers(r, 6, "") for r in chunk.residuals.T)))))
+            counts[1] += len(chunk.names)
+    return tuple(counts)
+
+# ---- GeoJSON ----
+
+_POINT_FEATURE = ('{"type":"Feature","geometry":{"type":"Point","coordinates":[%.4f,%.4f,%.4f]},'
+                  '"properties":{"nombre":%s,"tipo":%s,"gap":%s}}')
+_LINE_FEATURE = ('{"type":"Feature","geometry":{"type":"LineString","coordinates":[[%.4f,%.4f,%.4f],[%.4f,%.4f,%.4f]]},'
+                 '"properties":{"nombre":%s,"tipo":%s,"origen":%s,"destino":%s,"distancia":%s,"proyectada":%s,'
+                 '"residuo":[%s,%s,%s]}}')
+
+def write_geojson(path, points, lines=None):
+    """FeatureCollection con un Point por punto y un LineString 3D por línea. Devuelve (puntos, líneas)."""
+    counts = [0, 0]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        sep = ""
+        for chunk in points:
+            if len(chunk.names):
+                f.write(sep + ",\n".join(_rows(_POINT_FEATURE, (*chunk.xyz.T.tolist(), _json_texts(chunk.names),
+                                                                _json_texts(chunk.kinds), _numbers(chunk.gaps, 4, "null")))))
+                sep = ",\n"
+                counts[0] += len(chunk.names)
+        for chunk in lines or ():
+            if len(chunk.names):
+                f.write(sep + ",\n".join(_rows(_LINE_FEATURE, (
+                    *chunk.starts.T.tolist(), *chunk.ends.T.tolist(), _json_texts(chunk.names), _json_texts(chunk.kinds),
+                    _json_texts(chunk.origins), _json_texts(chunk.targets), _numbers(chunk.distances, 4, "null"),
+                    ["true" if p else "false" for p in chunk.projected.tolist()],
+                    *(_numbers(r, 6, "null") for r in chunk.residuals.T)))))
+                sep = ",\n"
+                counts[1] += len(chunk.names)
+        f.write("\n]}\n")
+    return tuple(counts)
+
+# ---- PLY binario ----
+
+PLY_VERTEX = np.dtype([("x", "<f8"), ("y", "<f8"), ("z", "<f8"), ("tipo", "u1"), ("gap", "<f4")])
+PLY_EDGE = np.dtype([("vertex1", "<i4"), ("vertex2", "<i4"), ("distancia", "<f4"), ("proyectada", "u1")])
+_PLY_COUNT = "{:<12d}"  # ancho fijo: el recuento se reescribe al terminar
+
+def _ply_header(n_vertex, n_edge):
+    return ("ply\nformat binary_little_endian 1.0\ncomment PayoMapeo\n"
+            f"element vertex {_PLY_COUNT.format(n_vertex)}\n"
+            "property double x\nproperty double y\nproperty double z\nproperty uchar tipo\nproperty float gap\n"
+            f"element edge {_PLY_COUNT.format(n_edge)}\n"
+            "property int vertex1\nproperty int vertex2\nproperty float distancia\nproperty uchar proyectada\n"
+            "end_header\n").encode("ascii")
+
+def write_ply(path, points, lines=None):
+    """Vértices (los puntos y los dos extremos de cada línea) y aristas (las líneas).
+
+    Los nombres no caben en PLY: el tipo va codificado como en PLY_KINDS. Las
+    aristas se escriben a un temporal mientras se vuelcan los vértices y se
+    añaden al final. Devuelve (puntos, líneas).
+    """
+    n_points = n_lines = 0
+    with open(path, "wb") as f, tempfile.TemporaryFile() as edges:
+        f.write(_ply_header(0, 0))
+        for chunk in points:
+            block = np.zeros(len(chunk.names), dtype=PLY_VERTEX)
+            block["x"], block["y"], block["z"] = chunk.xyz.T
+            block["tipo"] = [PLY_KINDS.get(kind, PLY_KINDS["punto"]) for kind in chunk.kinds]
+            block["gap"] = chunk.gaps
+            f.write(block.tobytes())
+            n_points += len(block)
+        for chunk in lines or ():
+            n = len(chunk.names)
+            block = np.zeros(2 * n, dtype=PLY_VERTEX)
+            ends = np.empty((2 * n, 3))
+            ends[0::2], ends[1::2] = chunk.starts, chunk.ends
+            block["x"], block["y"], block["z"] = ends.T
+            block["tipo"] = PLY_KINDS["extremo"]
+            block["gap"] = np.nan
+            f.write(block.tobytes())
+            edge = np.zeros(n, dtype=PLY_EDGE)
+            first = n_points + 2 * n_lines + 2 * np.arange(n)
+            edge["vertex1"], edge["vertex2"] = first, first + 1
+            edge["distancia"] = chunk.distances
+            edge["proyectada"] = chunk.projected
+            edges.write(edge.tobytes())
+            n_lines += n
+        edges.seek(0)
+        shutil.copyfileobj(edges, f)
+        f.seek(0)
+        f.write(_ply_header(n_points + 2 * n_lines, n_lines))
+    return n_points, n_lines
+
+WRITERS = {"CSV": write_csv, "GEOJSON": write_geojson, "PLY": write_ply}
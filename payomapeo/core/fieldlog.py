@@ -0,0 +1,110 @@
+"""Lectura de los registros de campo de la dioptra (`datos_telescopio.csv` de /download)
+y de sus lecturas en directo (/json)."""
+import csv
+import json
+import re
+from collections import namedtuple
+
+TOF_OUT_OF_RANGE_MM = 8190  # el VL53L0X devuelve 8190/8191 fuera de rango y 65535 si falla
+
+Reading = namedtuple("Reading", "name distance inclination roll azimuth altitude temp_mpu temp_bmp pressure ground_distance")
+
+# Cabeceras del firmware -> campo de Reading
+COLUMNS = {
+    "Punto": "name",
+    "Distancia(mm)": "distance",
+    "Inclinacion(deg)": "inclination",
+    "Alabeo(deg)": "roll",
+    "Acimut(deg)": "azimuth",
+    "Altitud(m)": "altitude",
+    "TempMPU(C)": "temp_mpu",
+    "TempBMP(C)": "temp_bmp",
+    "Presion(hPa)": "pressure",
+    "DistSueloCalibrada(mm)": "ground_distance",
+}
+
+# Claves de /json -> campo de Reading
+LIVE_KEYS = {
+    "distancia": "distance",
+    "inclinacion": "inclination",
+    "alabeo": "roll",
+    "acimut": "azimuth",
+    "altitud": "altitude",
+    "tempmpu": "temp_mpu",
+    "tempbmp": "temp_bmp",
+    "presion": "pressure",
+    "distancia_suelo_calibrada": "ground_distance",
+}
+
+# Arduino escribe los flotantes no finitos como nan/inf/ovf, que no son JSON
+_NOT_FINITE = re.compile(r"(:\s*)-?(nan|inf|ovf)\b", re.IGNORECASE)
+
+def _mm_to_m(value):
+    mm = float(value)
+    return 0.0 if mm <= 0.0 or mm >= TOF_OUT_OF_RANGE_MM else mm / 1000.0
+
+def parse_row(row, header=tuple(COLUMNS)):
+    """Convierte una fila del CSV en un Reading con distancias en metros.
+
+    Una distancia fuera de rango del sensor se devuelve como 0.0, que el addon
+    interpreta como rayo 'infinito'. El firmware no entrecomilla el nombre,
+    así que las columnas sobrantes se devuelven al nombre del punto.
+    """
+    extra = len(row) - len(header)
+    if extra > 0:
+        row = [",".join(row[:extra + 1])] + list(row[extra + 1:])
+    values = dict(zip((COLUMNS.get(h.strip(), h.strip()) for h in header), row))
+    return Reading(
+        name=values["name"].strip(),
+        distance=_mm_to_m(values["distance"]),
+        inclination=float(values["inclination"]),
+        roll=float(values["roll"]),
+        azimuth=float(values["azimuth"]),
+        altitude=float(values["altitude"]),
+        temp_mpu=float(values["temp_mpu"]),
+        temp_bmp=float(values["temp_bmp"]),
+        pressure=float(values["pressure"]),
+        ground_distance=_mm_to_m(values["ground_distance"]),
+    )
+
+def _safe_parse(row, header=tuple(COLUMNS)):
+    try:
+        return parse_row(row, header)
+    except (KeyError, ValueError):
+        return None
+
+def read_readings(path):
+    """Recorre el CSV fila a fila sin cargarlo entero, saltando las filas vacías.
+
+    Devuelve un generador de (número de línea, Reading), con None en lugar del
+    Reading cuando la fila no se pudo leer.
+    """
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if header[0].strip() not in COLUMNS:
+            # CSV sin cabecera: se asume el orden de columnas del firmware
+            yield reader.line_num, _safe_parse(header)
+            header = tuple(COLUMNS)
+        for row in reader:
+            if row and any(cell.strip() for cell in row):
+                yield reader.line_num, _safe_parse(row, header)
+
+def parse_live(text):
+    """Convierte la respuesta de /json en un Reading sin nombre, o None si no se pudo leer.
+
+    Los sensores sin lectura (nan) quedan como NaN, o como 0.0 las distancias;
+    sin acimut o inclinación la lectura no sirve.
+    """
+    try:
+        data = json.loads(_NOT_FINITE.sub(r"\1null", text))
+        values = {field: data[key] for key, field in LIVE_KEYS.items()}
+        if values["azimuth"] is None or values["inclination"] is None:
+            return None
+        for field in ("distance", "ground_distance"):
+            values[field] = _mm_to_m(values[field] or 0.0)
+        return Reading(name="", **{field: float("nan") if value is None else float(value) for field, value in values.items()})
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
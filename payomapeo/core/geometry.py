@@ -0,0 +1,61 @@
+"""Geometría de las observaciones: ángulos, direcciones, alturas y validez de las intersecciones.
+
+Todo trabaja con tuplas (x, y, z) para no depender de `mathutils`.
+"""
+from math import radians, degrees, sin, cos, atan2, asin, sqrt
+
+RAY_LENGTH = 1000.0   # longitud (m) con la que se dibujan y se cortan los rayos
+T_TOL = 1e-6          # holgura del parámetro al comprobar que el punto cae dentro de la línea
+PARALLEL_TOL = 1e-9   # por debajo, dos líneas se consideran paralelas
+
+def deg2rad(a): return radians(a)
+def rad2deg(a): return degrees(a)
+def wrap_angle_deg(a): a = a % 360.0; return a + 360.0 if a < 0 else a
+
+def corrected_azimuth(azimuth, declination=0.0):
+    """Acimut magnético medido + declinación = acimut geográfico."""
+    return azimuth + declination
+
+def dir_from_az_inc(az_deg, inc_deg):
+    az, inc = deg2rad(az_deg), deg2rad(inc_deg)
+    return (cos(inc) * cos(az), cos(inc) * sin(az), sin(inc))
+
+def az_inc_from_dir(v):
+    """Inversa de `dir_from_az_inc`: (acimut en [0, 360), inclinación) de un vector cualquiera."""
+    norm = sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    return wrap_angle_deg(rad2deg(atan2(v[1], v[0]))), rad2deg(asin(max(-1.0, min(1.0, v[2] / norm))))
+
+def eye_point(location, observer_height):
+    """Punto de vista: la estación elevada la altura del observador."""
+    return (location[0], location[1], location[2] + observer_height)
+
+def point_along(P, v, t):
+    return (P[0] + t * v[0], P[1] + t * v[1], P[2] + t * v[2])
+
+def _dot(a, b): return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+def _sub(a, b): return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+def _cross(a, b): return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+def closest_point_between_rays(P1, v1, P2, v2):
+    """Punto medio, hueco y parámetros (t1, t2) de la perpendicular común a dos rectas.
+
+    Con rectas paralelas devuelve (None, distancia entre rectas, None, None).
+    """
+    w0 = _sub(P1, P2)
+    a, b, c = _dot(v1, v1), _dot(v1, v2), _dot(v2, v2)
+    d, e = _dot(v1, w0), _dot(v2, w0)
+    den = a * c - b * b
+    if abs(den) < PARALLEL_TOL: return None, sqrt(_dot(_cross(w0, v2), _cross(w0, v2))) / sqrt(c), None, None
+    t1 = (b * e - c * d) / den
+    t2 = (a * e - b * d) / den
+    C1, C2 = point_along(P1, v1, t1), point_along(P2, v2, t2)
+    gap = _sub(C1, C2)
+    return tuple((p + q) / 2.0 for p, q in zip(C1, C2)), sqrt(_dot(gap, gap)), t1, t2
+
+def param_valid(t, length):
+    """El punto más próximo cuenta si cae dentro de la línea: 0 <= t <= longitud."""
+    return -T_TOL <= t <= length + T_TOL
+
+def intersection_valid(gap, t1, t2, length1, length2, margin):
+    """Reglas de una intersección: hueco menor que el margen y punto dentro de ambas líneas."""
+    return t1 is not None and gap < margin and param_valid(t1, length1) and param_valid(t2, length2)
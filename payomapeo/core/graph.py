@@ -0,0 +1,85 @@
+"""Grafo de dependencias de la red: estaciones -> observaciones -> puntos derivados.
+
+Las aristas salen de las propiedades `origen`/`destino` de cada línea y de
+los rayos que definen cada punto de intersección. Cuando algo cambia solo se
+recorre lo que cuelga de ello, y la propagación se corta en cuanto un
+recálculo deja su resultado igual.
+"""
+from collections import deque
+
+ORIGIN, TARGET, EDIT = "origen", "destino", "edicion"  # causa del recálculo de una línea
+
+class DependencyGraph:
+    def __init__(self):
+        self.ends = {}        # línea -> (origen, destino o None)
+        self.lines_from = {}  # estación -> {líneas que parten de ella}
+        self.lines_to = {}    # estación -> {líneas que acaban en ella}
+        self.point_rays = {}  # punto de intersección -> (líneas que lo definen)
+        self.ray_points = {}  # línea -> {puntos de intersección que define}
+
+    def __len__(self):
+        return len(self.ends)
+
+    def add_line(self, name, origin, target=None):
+        if name in self.ends:
+            self.remove_line(name)
+        self.ends[name] = (origin, target)
+        self.lines_from.setdefault(origin, set()).add(name)
+        if target:
+            self.lines_to.setdefault(target, set()).add(name)
+
+    def remove_line(self, name):
+        origin, target = self.ends.pop(name, (None, None))
+        for table, key in ((self.lines_from, origin), (self.lines_to, target)):
+            group = table.get(key)
+            if group is not None:
+                group.discard(name)
+                if not group:
+                    del table[key]
+        for point in self.ray_points.pop(name, ()):
+            self.point_rays[point] = tuple(r for r in self.point_rays.get(point, ()) if r != name)
+
+    def set_point_rays(self, point, rays):
+        for ray in self.point_rays.get(point, ()):
+            self.ray_points.get(ray, set()).discard(point)
+        self.point_rays[point] = tuple(rays)
+        for ray in rays:
+            self.ray_points.setdefault(ray, set()).add(point)
+
+    def propagate(self, stations=(), lines=(), on_station=None, on_line=None, on_point=None, max_rounds=100):
+        """Recalcula lo que depende de las estaciones movidas y las líneas editadas.
+
+        - `on_station(nombre)`: efectos de que una estación se haya movido.
+        - `on_line(nombre, causa)`: recalcula una línea; devuelve el nombre de la
+          estación que ha movido (su destino) o None.
+        - `on_point(nombre)`: recoloca un punto de intersección; True si se ha movido.
+
+        Los puntos se recalculan cuando ya están al día todas sus líneas.
+        Devuelve el número de elementos recalculados.
+        """
+        queue = deque([("estacion", name, None) for name in stations] + [("linea", name, EDIT) for name in lines])
+        done = 0
+        for _ in range(max_rounds):
+            points = set()
+            while queue:
+                kind, name, cause = queue.popleft()
+                done += 1
+                if kind == "estacion":
+                    if on_station is not None:
+                        on_station(name)
+                    queue.extend(("linea", line, ORIGIN) for line in sorted(self.lines_from.get(name, ())))
+                    queue.extend(("linea", line, TARGET) for line in sorted(self.lines_to.get(name, ())))
+                    continue
+                moved = on_line(name, cause) if on_line is not None else None
+                if moved:
+                    queue.append(("estacion", moved, None))
+                points |= self.ray_points.get(name, set())
+            if not points:
+                break
+            for point in sorted(points):
+                done += 1
+                if on_point is not None and on_point(point):
+                    queue.append(("estacion", point, None))
+            if not queue:
+                break
+        return done
@@ -0,0 +1,116 @@
+"""Tiempos y contadores de las rutas calientes del addon.
+
+Con la medición apagada casi no cuesta nada: `stage()` devuelve siempre el
+mismo contexto vacío, `count()` vuelve tras una comparación y las funciones
+con `@timed` solo añaden una llamada. Los tiempos son inclusivos: una etapa
+cuenta también lo que tarden las que tenga dentro.
+"""
+import cProfile
+import functools
+import json
+import time
+from contextlib import nullcontext
+
+_NOOP = nullcontext()
+
+class _Stage:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc):
+        self.recorder.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class Recorder:
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}    # nombre -> [llamadas, segundos, máximo]
+        self.counters = {}  # nombre -> total
+        self._profile = None
+        self.profiled = False  # hay un perfil de cProfile terminado para guardar
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+
+    def add(self, name, seconds):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def stage(self, name):
+        """Contexto que mide una etapa; vacío si la medición está apagada."""
+        return _Stage(self, name) if self.enabled else _NOOP
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name):
+        """Decorador: mide cada llamada a la función como la etapa `name`."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        """Etapas (de la más lenta a la más rápida en total) y contadores, listos para JSON."""
+        stages = sorted(self.stages.items(), key=lambda item: -item[1][1])
+        return {
+            "stages": {name: {"calls": calls, "seconds": seconds, "max_seconds": peak,
+                              "per_call_ms": seconds / calls * 1000.0}
+                       for name, (calls, seconds, peak) in stages},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    # ---- cProfile ----
+
+    @property
+    def profiling(self):
+        return self._profile is not None and not self.profiled
+
+    def start_profile(self):
+        self._profile = cProfile.Profile()
+        self.profiled = False
+        self._profile.enable()
+
+    def stop_profile(self):
+        if self.profiling:
+            self._profile.disable()
+            self.profiled = True
+
+    def dump_profile(self, path):
+        """Guarda el último perfil en el formato de pstats (snakeviz, `python -m pstats`...)."""
+        self.stop_profile()
+        if self._profile is None:
+            raise ValueError("No hay ningún perfil de cProfile")
+        self._profile.dump_stats(path)
+
+recorder = Recorder()
+stage = recorder.stage
+count = recorder.count
+timed = recorder.timed
@@ -0,0 +1,154 @@
+"""Motor vectorizado de intersección de rayos y segmentos de observación.
+
+Resuelve de una pasada todos los pares candidatos con las mismas reglas que
+`_check_intersections` del addon: hueco menor que el margen y punto más
+próximo dentro de cada línea (hasta RAY_LENGTH en los rayos, hasta su
+longitud en los segmentos).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .geometry import RAY_LENGTH, T_TOL, PARALLEL_TOL
+
+RAY, SEGMENT = 0, 1
+GRID_CELL_SIZE = 50.0   # lado de celda (m) de la fase amplia
+CHUNK = 1 << 16         # pares por bloque para acotar la memoria
+
+Intersections = namedtuple("Intersections", "i j points gaps t1 t2")
+
+def line_arrays(origins, heights, directions, kinds):
+    """Devuelve (puntos de vista, direcciones unitarias, longitudes) de cada línea.
+
+    `origins` son las posiciones de las estaciones; el punto de vista suma la
+    altura del observador en Z. Los rayos miden RAY_LENGTH y los segmentos la
+    norma de su vector.
+    """
+    starts = np.array(origins, dtype=np.float64).reshape(-1, 3)
+    starts[:, 2] += np.asarray(heights, dtype=np.float64)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    norms = np.linalg.norm(directions, axis=1)
+    units = directions / np.where(norms > 0.0, norms, 1.0)[:, None]
+    lengths = np.where(np.asarray(kinds) == SEGMENT, norms, RAY_LENGTH)
+    return starts, units, lengths
+
+def closest_points(P1, u1, P2, u2):
+    """Versión vectorizada de `geometry.closest_point_between_rays` para direcciones unitarias.
+
+    Devuelve (puntos medios, huecos, t1, t2, no_paralelas). En los pares
+    paralelos el hueco es la distancia entre rectas y t1/t2 valen NaN.
+    """
+    w0 = P1 - P2
+    a = (u1 * u1).sum(axis=1)
+    b = (u1 * u2).sum(axis=1)
+    c = (u2 * u2).sum(axis=1)
+    d = (u1 * w0).sum(axis=1)
+    e = (u2 * w0).sum(axis=1)
+    den = a * c - b * b
+    ok = np.abs(den) >= PARALLEL_TOL
+    den[~ok] = np.nan
+    t1 = (b * e - c * d) / den
+    t2 = (a * e - b * d) / den
+    C1 = P1 + t1[:, None] * u1
+    C2 = P2 + t2[:, None] * u2
+    gaps = np.sqrt(((C1 - C2) ** 2).sum(axis=1))
+    if not ok.all():
+        gaps[~ok] = np.linalg.norm(np.cross(w0[~ok], u2[~ok]), axis=1)
+    return (C1 + C2) / 2.0, gaps, t1, t2, ok
+
+def params_valid(t, lengths):
+    """Un punto es válido si cae dentro de la línea: 0 <= t <= longitud (RAY_LENGTH en los rayos)."""
+    return (t >= -T_TOL) & (t <= lengths + T_TOL)
+
+def intersect_pairs(starts, units, lengths, i, j, margin):
+    """Resuelve los pares (i[k], j[k]) y devuelve solo las intersecciones válidas."""
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    parts = []
+    for lo in range(0, len(i), CHUNK):
+        a, b = i[lo:lo + CHUNK], j[lo:lo + CHUNK]
+        M, gaps, t1, t2, ok = closest_points(starts[a], units[a], starts[b], units[b])
+        with np.errstate(invalid="ignore"):
+            keep = ok & (gaps < margin)
+            keep &= params_valid(t1, lengths[a]) & params_valid(t2, lengths[b])
+        parts.append((a[keep], b[keep], M[keep], gaps[keep], t1[keep], t2[keep]))
+    if not parts:
+        empty = np.empty(0)
+        return Intersections(empty.astype(np.int64), empty.astype(np.int64), empty.reshape(0, 3), empty, empty, empty)
+    return Intersections(*(np.concatenate(col) for col in zip(*parts)))
+
+def _sorted_unique(values):
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+def candidate_pairs(starts, units, lengths, margin, cell_size=GRID_CELL_SIZE):
+    """Fase amplia: pares (i < j) de líneas que pueden quedar a menos de `margin`.
+
+    Cada línea se muestrea en planta cada cuarto de celda y se registra en la
+    celda de cada muestra y en las vecinas a menos de `margin` + medio paso.
+    Dos líneas a menos de `margin` comparten así la celda de su punto más
+    próximo, y basta cruzar las líneas que coinciden en alguna celda.
+    """
+    n = len(starts)
+    s = max(cell_size, 4.0 * margin)
+    step = s / 4.0
+    reach = margin + step / 2.0
+    counts = np.floor(lengths / step).astype(np.int64) + 2
+    line_of = np.repeat(np.arange(n), counts)
+    k = np.arange(len(line_of)) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = np.minimum(k * step, lengths[line_of])
+    grid = (starts[line_of, :2] + units[line_of, :2] * t[:, None]) / s
+    cells = np.floor(grid).astype(np.int64)
+    frac = (grid - cells) * s
+    near = {-1: frac < reach, 0: np.ones_like(frac, dtype=bool), 1: s - frac < reach}
+
+    entry_lines, entry_cells = [], []
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            mask = near[di][:, 0] & near[dj][:, 1]
+            entry_lines.append(line_of[mask])
+            entry_cells.append(cells[mask] + (di, dj))
+    entry_lines = np.concatenate(entry_lines)
+    entry_cells = np.concatenate(entry_cells)
+    if not len(entry_lines):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Celda densa * n + línea: un único entero que ordena por celda y luego por línea
+    lo = entry_cells.min(axis=0)
+    span_y = entry_cells[:, 1].max() - lo[1] + 1
+    dense = (entry_cells[:, 0] - lo[0]) * span_y + (entry_cells[:, 1] - lo[1])
+    codes = _sorted_unique(dense * n + entry_lines)
+    cell_of, lines = codes // n, codes % n
+
+    # Cada entrada se cruza con las siguientes de su misma celda
+    group_end = np.searchsorted(cell_of, cell_of, side="right")
+    partners = group_end - np.arange(len(codes)) - 1
+    bounds = np.cumsum(partners)
+    found = []
+    start = 0
+    while start < len(codes):
+        stop = max(start + 1, int(np.searchsorted(bounds, bounds[start] - partners[start] + CHUNK, side="right")))
+        sp = partners[start:stop]
+        a = np.repeat(lines[start:stop], sp)
+        offsets = np.arange(sp.sum()) - np.repeat(np.cumsum(sp) - sp, sp)
+        b = lines[np.repeat(np.arange(start, stop) + 1, sp) + offsets]
+        found.append(a * n + b)
+        start = stop
+    pairs = _sorted_unique(np.concatenate(found))
+    return pairs // n, pairs % n
+
+def solve_network(origins, heights, directions, kinds, margin, cell_size=GRID_CELL_SIZE, groups=None):
+    """Todas las intersecciones válidas de una red completa de líneas.
+
+    Con `groups` (p. ej. el índice de la estación de cada línea) se descartan
+    los pares del mismo grupo, que solo se cortan en el propio punto de vista.
+    """
+    starts, units, lengths = line_arrays(origins, heights, directions, kinds)
+    i, j = candidate_pairs(starts, units, lengths, margin, cell_size)
+    if groups is not None:
+        groups = np.asarray(groups)
+        keep = groups[i] != groups[j]
+        i, j = i[keep], j[keep]
+    return intersect_pairs(starts, units, lengths, i, j, margin)
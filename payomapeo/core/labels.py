@@ -0,0 +1,34 @@
+"""Selección de las etiquetas (textos de distancia y altura) que merece la pena mostrar.
+
+Con miles de etiquetas solo se dibujan las más próximas al punto de vista;
+el resto se quedan como datos.
+"""
+import numpy as np
+
+LABEL_DISTANCE = 200.0  # distancia (m) a partir de la cual se ocultan
+LABEL_LIMIT = 300       # etiquetas visibles como máximo
+
+def nearest_labels(positions, eye, max_distance=LABEL_DISTANCE, limit=LABEL_LIMIT):
+    """Índices de las etiquetas a menos de `max_distance` de `eye`, de la más cercana
+    a la más lejana y como mucho `limit`."""
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    d2 = ((positions - np.asarray(eye, dtype=np.float64)) ** 2).sum(axis=1)
+    near = np.nonzero(d2 <= max_distance * max_distance)[0]
+    if len(near) > limit:
+        near = near[np.argpartition(d2[near], limit - 1)[:limit]]
+    return near[np.argsort(d2[near], kind="stable")]
+
+def project_labels(positions, matrix, width, height):
+    """Proyecta puntos con una matriz 4x4 de vista-proyección.
+
+    Devuelve (píxeles (n, 2), máscara) donde la máscara marca los puntos que
+    quedan delante de la cámara y dentro de la región de `width` x `height`.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    clip = np.c_[positions, np.ones(len(positions))] @ np.asarray(matrix, dtype=np.float64).T
+    w = clip[:, 3]
+    front = w > 1e-6
+    ndc = clip[:, :2] / np.where(front, w, 1.0)[:, None]
+    pixels = (ndc + 1.0) * 0.5 * (width, height)
+    inside = front & (np.abs(ndc) <= 1.0).all(axis=1)
+    return pixels, inside
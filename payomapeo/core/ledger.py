@@ -0,0 +1,191 @@
+"""Registro de los pares de visuales ya intersecados.
+
+Una línea se identifica por lo que mide (estación, tipo, vector y altura del
+observador), no por su nombre: la misma lectura importada dos veces tiene la
+misma identidad. El registro sabe qué pares se han resuelto ya con un margen,
+hayan dado corte o no, para no repetirlos ni duplicar sus puntos.
+
+Cada identidad lleva dos marcas de un reloj que solo avanza: `added`, cuando
+su geometría cambió por última vez, y `sealed`, cuando se cruzó con todas las
+líneas que había. Un par está resuelto si una de sus líneas se selló después
+de que la otra cambiara, o si se apuntó suelto después de que cambiaran las dos.
+"""
+import io
+
+import numpy as np
+
+FORMAT_VERSION = 2  # la 1 incluía el nombre del punto visado en los segmentos
+
+def line_identity(origin, tipo, vector, observer_height=0.0):
+    """Texto que identifica una línea; el vector va en float32 redondeado a 0,1 mm.
+
+    El punto visado de un segmento no cuenta: Blender puede haberlo renombrado.
+    """
+    x, y, z = (round(c, 4) + 0.0 for c in np.asarray(vector, dtype=np.float32).tolist())
+    h = float(observer_height or 0.0)
+    h = round(h, 3) + 0.0 if h == h else 0.0
+    return f"{origin}|{tipo}|{x:.4f},{y:.4f},{z:.4f}|{h:.3f}"
+
+def _pending(added, sealed, codes, stamps, a, b):
+    """Máscara de los pares (a[k], b[k]) de identidades aún por resolver; -1 es una identidad desconocida."""
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    known = (a >= 0) & (b >= 0)
+    if not known.any():
+        return np.ones(len(a), dtype=bool)
+    lo = np.where(known, np.minimum(a, b), 0)
+    hi = np.where(known, np.maximum(a, b), 0)
+    done = (sealed[lo] > added[hi]) | (sealed[hi] > added[lo])
+    if len(codes):
+        code = (lo << 32) | hi
+        pos = np.minimum(np.searchsorted(codes, code), len(codes) - 1)
+        done |= (codes[pos] == code) & (stamps[pos] > np.maximum(added[lo], added[hi]))
+    return ~(done & known)
+
+class PairLedger:
+    def __init__(self, margin):
+        self.margin = margin    # margen con el que vale lo resuelto (también para uno menor)
+        self.identities = []    # id -> identidad
+        self._id = {}           # identidad -> id
+        self.names = {}         # nombre de línea -> id
+        self._name_of = {}      # id -> última línea registrada con esa identidad
+        self.clock = 0
+        self._added = np.zeros(64, dtype=np.int64)
+        self._sealed = np.full(64, -1, dtype=np.int64)
+        self._pairs = {}        # (lo << 32) | hi -> marca
+        self._pair_arrays = None
+
+    def __len__(self):
+        return len(self.identities)
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def _grow(self, n):
+        capacity = len(self._added)
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity)
+        self._added = np.concatenate((self._added, np.zeros(capacity - len(self._added), dtype=np.int64)))
+        self._sealed = np.concatenate((self._sealed, np.full(capacity - len(self._sealed), -1, dtype=np.int64)))
+
+    def add(self, name, identity, fresh=True):
+        """Asocia la línea `name` a su identidad y devuelve el id.
+
+        Con `fresh` la geometría es nueva: nada de lo resuelto con esa
+        identidad sigue valiendo.
+        """
+        i = self._id.get(identity)
+        if i is None:
+            i = self._id[identity] = len(self.identities)
+            self.identities.append(identity)
+            self._grow(i + 1)
+            fresh = True
+        old = self.names.get(name)
+        if old is not None and old != i and self._name_of.get(old) == name:
+            del self._name_of[old]
+        self.names[name] = i
+        self._name_of[i] = name
+        if fresh:
+            self._added[i] = self.tick()
+            self._sealed[i] = -1
+        return i
+
+    def find(self, identity):
+        """Nombre de la última línea registrada con esa identidad, o None."""
+        i = self._id.get(identity)
+        return self._name_of.get(i) if i is not None else None
+
+    def ids(self, names):
+        return np.array([self.names.get(name, -1) for name in names], dtype=np.int64)
+
+    def is_sealed(self, name):
+        i = self.names.get(name)
+        return i is not None and self._sealed[i] > self._added[i]
+
+    def _pair_index(self):
+        if self._pair_arrays is None:
+            codes = np.fromiter(self._pairs, dtype=np.int64, count=len(self._pairs))
+            order = np.argsort(codes)
+            stamps = np.fromiter(self._pairs.values(), dtype=np.int64, count=len(self._pairs))
+            self._pair_arrays = codes[order], stamps[order]
+        return self._pair_arrays
+
+    def pending(self, a, b):
+        """Máscara de los pares de ids (a[k], b[k]) que faltan por resolver."""
+        return _pending(self._added, self._sealed, *self._pair_index(), a, b)
+
+    def record(self, a, b):
+        """Apunta como resueltos los pares sueltos (a[k], b[k])."""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        keep = (a >= 0) & (b >= 0) & (a != b)
+        if not keep.any():
+            return
+        a, b = a[keep], b[keep]
+        stamp = self.tick()
+        self._pairs.update(dict.fromkeys(((np.minimum(a, b) << 32) | np.maximum(a, b)).tolist(), stamp))
+        self._pair_arrays = None
+
+    def seal(self, ids, stamp=None):
+        """Marca las líneas `ids` como cruzadas con todas las que había al llegar `stamp` (por defecto, ahora)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids >= 0]
+        if stamp is None:
+            stamp = self.tick()
+        ids = ids[self._added[ids] < stamp]  # las que han cambiado desde entonces no
+        self._sealed[ids] = np.maximum(self._sealed[ids], stamp)
+
+    def snapshot(self, names):
+        """Copia para consultar desde otro hilo qué pares de `names` faltan (ver LedgerSnapshot)."""
+        return LedgerSnapshot(self, self.ids(names))
+
+    # ---- Empaquetado ----
+
+    def to_bytes(self):
+        n = len(self.identities)
+        codes, stamps = self._pair_index()
+        names = list(self.names)
+        arrays = {"version": np.array(FORMAT_VERSION), "margin": np.array(self.margin), "clock": np.array(self.clock),
+                  "identities": np.array(self.identities, dtype=str), "added": self._added[:n], "sealed": self._sealed[:n],
+                  "names": np.array(names, dtype=str), "name_ids": np.array([self.names[name] for name in names], dtype=np.int64),
+                  "codes": codes, "stamps": stamps}
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as blob:
+            if int(blob["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Versión de registro desconocida: {int(blob['version'])}")
+            ledger = cls(float(blob["margin"]))
+            ledger.clock = int(blob["clock"])
+            ledger.identities = blob["identities"].tolist()
+            ledger._id = {identity: i for i, identity in enumerate(ledger.identities)}
+            ledger._grow(len(ledger.identities))
+            ledger._added[:len(ledger.identities)] = blob["added"]
+            ledger._sealed[:len(ledger.identities)] = blob["sealed"]
+            ledger.names = dict(zip(blob["names"].tolist(), blob["name_ids"].tolist()))
+            ledger._pairs = dict(zip(blob["codes"].tolist(), blob["stamps"].tolist()))
+        ledger._name_of = {i: name for name, i in ledger.names.items()}
+        return ledger
+
+class LedgerSnapshot:
+    """Estado del registro para las líneas `ids` (índices locales 0..n-1) en un momento dado.
+
+    `pending(i, j)` se puede llamar desde otro hilo; al terminar, `seal()`
+    sella en el registro las líneas que no hayan cambiado desde la copia.
+    """
+    def __init__(self, ledger, ids):
+        self.ledger = ledger
+        self.ids = ids
+        self.stamp = ledger.tick()
+        self._arrays = (ledger._added.copy(), ledger._sealed.copy(), *ledger._pair_index())
+
+    def pending(self, i, j):
+        return _pending(*self._arrays, self.ids[i], self.ids[j])
+
+    def seal(self):
+        self.ledger.seal(self.ids, self.stamp)
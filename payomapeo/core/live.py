@@ -0,0 +1,142 @@
+"""Lecturas en directo de la dioptra (/json) en segundo plano.
+
+Un bucle asyncio en su propio hilo consulta el dispositivo y deja las lecturas
+en una cola acotada; quien la consume (el temporizador del addon) las recoge
+sin esperar nunca a la red. Si la cola se llena se descartan las más antiguas.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from .fieldlog import parse_live
+
+LIVE_INTERVAL = 0.25  # segundos entre consultas
+LIVE_TIMEOUT = 2.0    # segundos de espera por respuesta
+LIVE_QUEUE = 64       # lecturas pendientes como máximo
+MAX_BACKOFF = 5.0     # espera máxima tras errores seguidos
+
+async def fetch(url, timeout=LIVE_TIMEOUT):
+    """GET HTTP/1.0 mínimo con asyncio; devuelve el cuerpo como texto."""
+    parts = urlsplit(url if "://" in url else "http://" + url)
+    if parts.scheme != "http" or not parts.hostname:
+        raise ValueError(f"URL no válida: {url}")
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status = head.split(b" ", 2)[1:2]
+    if status != [b"200"]:
+        raise OSError(f"HTTP {status[0].decode('ascii', 'replace') if status else '?'} en {url}")
+    return body.decode("utf-8", "replace")
+
+class LiveFeed:
+    """Consulta `url` cada `interval` segundos en un hilo propio.
+
+    `drain()` devuelve las lecturas pendientes como (instante, Reading), con el
+    instante de `time.monotonic()` en que llegaron.
+    """
+    def __init__(self, url, interval=LIVE_INTERVAL, timeout=LIVE_TIMEOUT, maxlen=LIVE_QUEUE):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.queue = deque(maxlen=maxlen)
+        self.received = 0   # lecturas válidas recibidas
+        self.dropped = 0    # lecturas descartadas por cola llena
+        self.errors = 0     # consultas fallidas
+        self.error = None   # último error, None tras una consulta correcta
+        self._thread = None
+        self._loop = None
+        self._wake = None
+        self._halt = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._halt.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), name="payomapeo-live", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=1.0):
+        self._halt.set()
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:  # el bucle ya ha terminado
+                pass
+        if self._thread is not None:
+            self._thread.join(wait)
+
+    def drain(self):
+        readings = []
+        while True:
+            try:
+                readings.append(self.queue.popleft())
+            except IndexError:
+                return readings
+
+    def _push(self, reading):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append((time.monotonic(), reading))
+        self.received += 1
+
+    async def _run(self):
+        self._loop, self._wake = asyncio.get_running_loop(), asyncio.Event()
+        failures = 0
+        while not self._halt.is_set():
+            try:
+                reading = parse_live(await fetch(self.url, self.timeout))
+                if reading is None:
+                    raise ValueError("respuesta de /json no reconocida")
+                self._push(reading)
+                self.error, failures = None, 0
+            except (OSError, ValueError, asyncio.TimeoutError) as exc:
+                self.errors += 1
+                failures += 1
+                self.error = str(exc) or type(exc).__name__
+            # Espera interrumpible; tras errores seguidos se espacian los intentos
+            delay = min(self.interval * 2 ** min(failures, 8), MAX_BACKOFF) if failures else self.interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        self._loop = self._wake = None
+
+class SteadyAim:
+    """Decide cuándo guardar sola una puntería.
+
+    Una lectura se acepta cuando acimut e inclinación se mantienen dentro de
+    `tolerance` grados durante `hold` segundos y la puntería se ha apartado
+    más de `tolerance` de la última aceptada.
+    """
+    def __init__(self, tolerance=0.3, hold=1.5):
+        self.tolerance = tolerance
+        self.hold = hold
+        self._anchor = None  # (instante, lectura) donde empezó la puntería actual
+        self._last = None    # última lectura aceptada
+
+    def _near(self, a, b):
+        d_az = abs((a.azimuth - b.azimuth + 180.0) % 360.0 - 180.0)
+        return d_az <= self.tolerance and abs(a.inclination - b.inclination) <= self.tolerance
+
+    def feed(self, stamp, reading):
+        """Devuelve la lectura si completa una puntería quieta nueva; si no, None."""
+        if self._anchor is None or not self._near(self._anchor[1], reading):
+            self._anchor = (stamp, reading)
+            return None
+        if stamp - self._anchor[0] < self.hold or (self._last is not None and self._near(self._last, reading)):
+            return None
+        self._last = reading
+        return reading
@@ -0,0 +1,146 @@
+"""Modelo de la red de estaciones, independiente de Blender.
+
+Un `Survey` guarda las estaciones (nodos y puntos observados con su posición),
+las observaciones hechas desde ellas (rayos o segmentos) y los puntos
+derivados por intersección. El addon lo rellena desde la escena y dibuja lo
+que resuelve; fuera de Blender se puede construir y resolver directamente.
+"""
+from collections import Counter, namedtuple
+from math import isclose
+
+import numpy as np
+
+from .geometry import RAY_LENGTH, corrected_azimuth, dir_from_az_inc, eye_point, point_along
+from .cluster import cluster_hits
+from .intersect import GRID_CELL_SIZE, RAY, SEGMENT, line_arrays, solve_network
+
+Station = namedtuple("Station", "name location kind")                # kind: "nodo" o "punto"
+# rays: índices de las k observaciones; gap: mayor hueco entre dos de ellas; rms: su distancia cuadrática media al punto
+DerivedPoint = namedtuple("DerivedPoint", "name location gap rays rms", defaults=(0.0,))
+
+def intersection_name(origins):
+    """`Int_A_B`, con A y B las dos primeras estaciones distintas de `origins`."""
+    first = list(dict.fromkeys(origins))
+    return f"Int_{first[0]}_{first[1]}"
+
+class Observation(namedtuple("Observation", "origin target azimuth inclination distance observer_height")):
+    """Lectura desde la estación `origin`. Sin distancia es un rayo y no tiene `target`."""
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        return RAY if isclose(self.distance, 0.0, abs_tol=1e-6) else SEGMENT
+
+class Survey:
+    def __init__(self, declination=0.0):
+        self.declination = declination  # se suma a los acimutes medidos
+        self.stations = {}              # nombre -> Station
+        self.observations = []          # en orden de registro
+        self.points = {}                # nombre -> DerivedPoint
+        self._suffixes = {}             # nombre base -> último sufijo usado
+
+    def __len__(self):
+        return len(self.observations)
+
+    def add_station(self, name, location, kind="nodo"):
+        station = self.stations[name] = Station(name, tuple(location), kind)
+        return station
+
+    def location(self, name):
+        """Posición de una estación o de un punto derivado (también sirven de origen)."""
+        found = self.stations.get(name) or self.points.get(name)
+        if found is None:
+            raise KeyError(f"Estación desconocida: {name}")
+        return found.location
+
+    def direction(self, obs):
+        return dir_from_az_inc(corrected_azimuth(obs.azimuth, self.declination), obs.inclination)
+
+    def eye(self, obs):
+        return eye_point(self.location(obs.origin), obs.observer_height)
+
+    def line(self, obs):
+        """(punto de vista, dirección unitaria, longitud) de una observación."""
+        return self.eye(obs), self.direction(obs), obs.distance if obs.kind == SEGMENT else RAY_LENGTH
+
+    def observe(self, origin, azimuth, inclination, distance=0.0, observer_height=0.0, target="Punto"):
+        """Registra una observación; con distancia crea además el punto observado."""
+        self.location(origin)  # falla antes de registrar nada si el origen no existe
+        obs = Observation(origin, None, azimuth, inclination, distance, observer_height)
+        if obs.kind == SEGMENT:
+            obs = obs._replace(target=self._unique_name(target))
+            self.add_station(obs.target, point_along(self.eye(obs), self.direction(obs), distance), "punto")
+        self.observations.append(obs)
+        return obs
+
+    def _unique_name(self, base):
+        """Como Blender: `base`, `base.001`, `base.002`... sin repetir nombres."""
+        name, k = base, self._suffixes.get(base, 0)
+        while name in self.stations or name in self.points:
+            k += 1
+            name = f"{base}.{k:03d}"
+        self._suffixes[base] = k
+        return name
+
+    def line_arrays(self):
+        """(orígenes, alturas, vectores, tipos, grupos) de todas las observaciones para `solve_network`.
+
+        Los vectores de los segmentos llevan la distancia; los grupos numeran la estación de origen.
+        """
+        obs = self.observations
+        origins = np.array([self.location(o.origin) for o in obs], dtype=np.float64).reshape(-1, 3)
+        heights = np.array([o.observer_height for o in obs], dtype=np.float64)
+        kinds = np.array([o.kind for o in obs], dtype=np.int8)
+        az = np.radians(np.array([o.azimuth for o in obs], dtype=np.float64) + self.declination)
+        inc = np.radians(np.array([o.inclination for o in obs], dtype=np.float64))
+        scale = np.where(kinds == SEGMENT, [o.distance for o in obs], 1.0)
+        directions = np.column_stack((np.cos(inc) * np.cos(az), np.cos(inc) * np.sin(az), np.sin(inc))) * scale[:, None]
+        _, groups = np.unique(np.array([o.origin for o in obs], dtype=object).astype(str), return_inverse=True)
+        return origins, heights, directions, kinds, groups
+
+    def intersect(self, margin, cell_size=GRID_CELL_SIZE):
+        """Recalcula todos los puntos de intersección de la red. Devuelve la lista de puntos.
+
+        Las visuales que se cortan cerca del mismo objetivo forman un grupo y dan
+        un único punto `Int_A_B` (A y B, las dos primeras estaciones), ajustado
+        por mínimos cuadrados a todas ellas.
+        """
+        origins, heights, directions, kinds, groups = self.line_arrays()
+        return self.set_intersections(solve_network(origins, heights, directions, kinds, margin, cell_size, groups), margin)
+
+    def set_intersections(self, hits, margin):
+        """Rehace los puntos de intersección a partir de los cortes ya calculados.
+
+        `hits` es un `Intersections` con índices de `self.observations`, como el
+        de `solve_network` (o el de `parallel.intersection_plan`, calculado fuera).
+        Un grupo que comparte visuales con un punto anterior conserva su nombre, y
+        los puntos desde los que se ha observado se mantienen aunque ya no salgan.
+        """
+        # Antes de tocar los puntos: también sirven de origen a las observaciones
+        starts, units, _ = line_arrays(*self.line_arrays()[:4])
+        clusters = cluster_hits(starts, units, hits, margin) if len(self.observations) else []
+        old, self.points = self.points, {}
+        self._suffixes.clear()
+        for name in dict.fromkeys(obs.origin for obs in self.observations):
+            if name in old:
+                self.points[name] = old[name]
+        names = _previous_names(old, [cluster.rays for cluster in clusters])
+        for cluster, name in zip(clusters, names):
+            if name is not None:
+                self.points[name] = DerivedPoint(name, cluster.location, cluster.gap, cluster.rays, cluster.rms)
+        for cluster, name in zip(clusters, names):
+            if name is None:
+                name = self._unique_name(intersection_name(self.observations[k].origin for k in cluster.rays))
+                self.points[name] = DerivedPoint(name, cluster.location, cluster.gap, cluster.rays, cluster.rms)
+        return list(self.points.values())
+
+def _previous_names(points, groups):
+    """Para cada grupo de visuales, el punto anterior con el que comparte más (cada uno una sola vez), o None."""
+    owner = {k: name for name, point in points.items() for k in point.rays}
+    names, taken = [], set()
+    for rays in groups:
+        shared = Counter(owner[k] for k in rays if k in owner and owner[k] not in taken)
+        name = shared.most_common(1)[0][0] if shared else None
+        taken.add(name)
+        names.append(name)
+    return names
@@ -0,0 +1,226 @@
+"""Resolución de redes grandes en segundo plano con un grupo de procesos.
+
+Se trabaja sobre una copia de la red (arrays o un `Survey`), que se reparte
+en tareas independientes: la fase fina de la intersección por trozos de pares
+candidatos, y el ajuste por bloques de puntos libres que no comparten ninguna
+ecuación. Un hilo propio lanza las tareas y junta los resultados; quien lo
+arrancó consulta el avance y el resultado sin esperar nunca, y puede cancelar.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .adjust import MAX_ITERATIONS, SIGMA_ANGLE, SIGMA_DISTANCE, Adjustment, adjust, observation_links, observation_residuals
+from .intersect import GRID_CELL_SIZE, Intersections, candidate_pairs, intersect_pairs
+from .model import Survey
+
+TASK_PAIRS = 1 << 18   # pares candidatos por tarea como máximo
+MIN_TASK_PAIRS = 4096  # por debajo no compensa enviar la tarea a otro proceso
+TASKS_PER_WORKER = 4   # trozos por proceso, para ver el avance y poder cancelar entre ellos
+
+def default_workers():
+    return os.cpu_count() or 1
+
+# ---- Intersección ----
+
+def _intersect_task(rows, starts, units, lengths, i, j, margin):
+    """intersect_pairs sobre las líneas `rows`; devuelve los índices de la red completa."""
+    hits = intersect_pairs(starts, units, lengths, i, j, margin)
+    return hits._replace(i=rows[hits.i], j=rows[hits.j])
+
+def intersection_plan(starts, units, lengths, margin, cell_size=GRID_CELL_SIZE, groups=None, n_tasks=None, pending=None):
+    """Tareas de la intersección de una red de líneas (como `solve_network`).
+
+    La fase amplia se hace aquí; los pares se reparten en unas `n_tasks`
+    tareas y cada una recibe solo sus líneas. Con `pending`, función (i, j) ->
+    máscara como `LedgerSnapshot.pending`, se omiten los pares ya resueltos.
+    Devuelve (tareas, combinar), donde combinar junta los resultados en el
+    mismo orden que daría `intersect_pairs` con todos los pares.
+    """
+    i, j = candidate_pairs(starts, units, lengths, margin, cell_size)
+    if groups is not None:
+        groups = np.asarray(groups)
+        keep = groups[i] != groups[j]
+        i, j = i[keep], j[keep]
+    if pending is not None and len(i):
+        keep = pending(i, j)
+        i, j = i[keep], j[keep]
+    size = len(i) // (n_tasks or default_workers() * TASKS_PER_WORKER) + 1
+    size = min(max(size, MIN_TASK_PAIRS), TASK_PAIRS)
+    tasks = []
+    for lo in range(0, len(i), size):
+        rows, local = np.unique(np.concatenate((i[lo:lo + size], j[lo:lo + size])), return_inverse=True)
+        half = len(local) // 2
+        tasks.append((_intersect_task, (rows, starts[rows], units[rows], lengths[rows], local[:half], local[half:], margin)))
+
+    def combine(results):
+        if not results:
+            return intersect_pairs(starts, units, lengths, i, j, margin)  # sin pares: resultado vacío
+        return Intersections(*(np.concatenate(col) for col in zip(*results)))
+    return tasks, combine
+
+# ---- Ajuste por bloques ----
+
+def split_survey(survey, fixed, n_parts=None):
+    """Parte la red en redes menores que se pueden ajustar por separado.
+
+    Dos puntos libres van al mismo bloque si alguna ecuación los une; las
+    estaciones fijas no unen nada. Los bloques se reparten en `n_parts` partes
+    (por defecto, una por bloque) de tamaño parecido. Devuelve [(Survey de la
+    parte, índices de sus observaciones en `survey`)].
+    """
+    links = observation_links(survey)
+    obs = survey.observations
+    parent = {}
+
+    def find(name):
+        root = parent.setdefault(name, name)
+        while root != parent[root]:
+            root = parent[root]
+        while parent[name] != root:
+            parent[name], name = root, parent[name]
+        return root
+
+    for k, target in links:
+        ends = [name for name in (obs[k].origin, target) if name not in fixed]
+        if len(ends) == 2:
+            parent[find(ends[0])] = find(ends[1])
+    blocks = {}  # raíz (None: ecuaciones sin puntos libres, solo para sus residuos) -> [(k, punto visado)]
+    for k, target in links:
+        free = target if target not in fixed else obs[k].origin if obs[k].origin not in fixed else None
+        blocks.setdefault(find(free) if free is not None else None, []).append((k, target))
+
+    # De mayor a menor, cada bloque a la parte con menos ecuaciones
+    n_parts = min(n_parts or len(blocks), len(blocks))
+    bins, load = [[] for _ in range(n_parts)], [0] * n_parts
+    for block in sorted(blocks.values(), key=len, reverse=True):
+        b = load.index(min(load))
+        bins[b] += block
+        load[b] += len(block)
+
+    parts = []
+    for block in bins:
+        ks = sorted({k for k, _ in block})
+        local = {k: n for n, k in enumerate(ks)}
+        targets = set(block)
+        part = Survey(survey.declination)
+        for k in ks:
+            o = obs[k]
+            # Un segmento cuyo destino cae en otra parte solo aporta aquí sus visuales a puntos
+            part.observations.append(o if (k, o.target) in targets else o._replace(target=None))
+        names = {o.origin for o in part.observations} | {target for _, target in block}
+        for name in names:
+            if name in survey.stations:
+                part.stations[name] = survey.stations[name]
+            else:
+                point = survey.points[name]
+                rays = tuple(local[k] for k in point.rays if (k, name) in targets)
+                part.points[name] = point._replace(rays=rays)
+        parts.append((part, np.array(ks, dtype=np.int64)))
+    return parts
+
+def adjustment_plan(survey, fixed=None, sigma_angle=SIGMA_ANGLE, sigma_distance=SIGMA_DISTANCE, max_iter=MAX_ITERATIONS,
+                    tol=1e-6, n_tasks=None):
+    """Tareas del ajuste de la red (como `adjust`), unas `n_tasks` partes independientes.
+
+    Devuelve (tareas, combinar); combinar da un Adjustment de la red completa,
+    con sigma0 calculado con todas las ecuaciones de todas las partes.
+    """
+    if fixed is None:
+        fixed = {name for name, st in survey.stations.items() if st.kind == "nodo"}
+    parts = split_survey(survey, fixed, n_tasks or default_workers() * TASKS_PER_WORKER)
+    tasks = [(adjust, (part, set(fixed) & (set(part.stations) | set(part.points)), sigma_angle, sigma_distance, max_iter, tol))
+             for part, _ in parts]
+
+    def combine(results):
+        n_obs = len(survey.observations)
+        if not results:
+            return Adjustment({}, np.full((n_obs, 3), np.nan), [], np.empty((0, 3)), 0.0, 0, True)
+        locations, links, link_res = {}, [], []
+        for (_, ks), result in zip(parts, results):
+            locations.update(result.locations)
+            links += [(int(ks[k]), target) for k, target in result.links]
+            link_res.append(result.link_residuals)
+        link_res = np.concatenate(link_res)
+        k = np.array([k for k, _ in links], dtype=np.int64)
+        scaled = np.column_stack((link_res[:, :2] / sigma_angle, link_res[:, 2] / sigma_distance))
+        dof = int((~np.isnan(scaled)).sum()) - 3 * len(locations)
+        sigma0 = float(np.sqrt(np.nansum(scaled ** 2) / dof)) if dof > 0 else 0.0
+        return Adjustment(locations, observation_residuals(k, link_res, n_obs), links, link_res, sigma0,
+                          max(result.iterations for result in results), all(result.converged for result in results))
+    return tasks, combine
+
+# ---- Trabajo en segundo plano ----
+
+class BackgroundSolve:
+    """Ejecuta `plan(*args, **kwargs)` y sus tareas en segundo plano.
+
+    `plan` devuelve (tareas, combinar) como `intersection_plan` o
+    `adjustment_plan`: las tareas, pares (función, argumentos), se reparten
+    en `workers` procesos y `combinar(resultados)` da `result`. Los procesos
+    se arrancan con "spawn", sin heredar el estado de Blender. Al cancelar ya
+    no se lanzan más tareas; las que estén en marcha terminan y se descartan.
+    """
+    def __init__(self, plan, *args, workers=None, **kwargs):
+        self.workers = workers or default_workers()
+        self.total = 0          # tareas del plan (0 mientras se prepara)
+        self.done = 0           # tareas terminadas
+        self.result = None
+        self.error = None       # texto del error si algo falló
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(plan, args, kwargs), name="payomapeo-solve", daemon=True)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def finished(self):
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Espera a que termine (para scripts y pruebas; el addon solo consulta `finished`)."""
+        self._thread.join(timeout)
+        return self.finished
+
+    def _run(self, plan, args, kwargs):
+        try:
+            tasks, combine = plan(*args, **kwargs)
+            self.total = len(tasks)
+            results = self._execute(tasks) if tasks else []
+            if self._cancel.is_set():
+                self.cancelled = True
+                return
+            self.result = combine(results)
+        except Exception as exc:  # el hilo no tiene a quién propagarla: se guarda para quien consulta
+            self.error = f"{type(exc).__name__}: {exc}"
+
+    def _execute(self, tasks):
+        results = [None] * len(tasks)
+        pool = ProcessPoolExecutor(min(self.workers, len(tasks)), mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = {pool.submit(fn, *args): n for n, (fn, args) in enumerate(tasks)}
+            pending = set(futures)
+            while pending and not self._cancel.is_set():
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[futures[future]] = future.result()
+                    self.done += 1
+        finally:
+            pool.shutdown(wait=not self._cancel.is_set(), cancel_futures=True)
+        return results
@@ -0,0 +1,86 @@
+"""Índice espacial incremental de las líneas de observación."""
+from math import floor, inf
+
+INDEX_CELL_SIZE = 25.0  # lado de celda (m) del índice espacial de líneas
+
+class LineIndex:
+    """Rejilla uniforme en planta (XY) sobre rayos y segmentos de observación.
+
+    Cada línea se registra en las celdas que atraviesa más un anillo de vecinas,
+    así dos líneas a menos de `cell_size` siempre comparten alguna celda y basta
+    recorrer las celdas de la línea consultada para obtener sus candidatas.
+    Las líneas se agrupan además por estación de origen para descartar de golpe
+    las de la misma estación.
+    """
+    def __init__(self, cell_size=INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}    # (i, j) -> {nombre de línea}
+        self.lines = {}    # nombre de línea -> celdas ocupadas
+        self.origins = {}  # nombre de línea -> estación de origen
+        self.groups = {}   # estación de origen -> {nombre de línea}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, name):
+        return name in self.lines
+
+    def _traverse(self, P, v, length):
+        """Celdas que cruza el tramo P -> P + length*v (DDA 2D)."""
+        s = self.cell_size
+        x0, y0 = P[0], P[1]
+        x1, y1 = x0 + v[0] * length, y0 + v[1] * length
+        i, j = floor(x0 / s), floor(y0 / s)
+        i1, j1 = floor(x1 / s), floor(y1 / s)
+        dx, dy = x1 - x0, y1 - y0
+        step_i, step_j = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        t_max_x = ((i + (step_i > 0)) * s - x0) / dx if dx else inf
+        t_max_y = ((j + (step_j > 0)) * s - y0) / dy if dy else inf
+        t_dx = s / abs(dx) if dx else inf
+        t_dy = s / abs(dy) if dy else inf
+        cells = [(i, j)]
+        while (i, j) != (i1, j1):
+            if j == j1 or (i != i1 and t_max_x < t_max_y):
+                i += step_i
+                t_max_x += t_dx
+            else:
+                j += step_j
+                t_max_y += t_dy
+            cells.append((i, j))
+        return cells
+
+    def insert(self, name, P, v, length, origin=None):
+        if name in self.lines:
+            self.remove(name)
+        occupied = {(i + di, j + dj) for i, j in self._traverse(P, v, length) for di in (-1, 0, 1) for dj in (-1, 0, 1)}
+        for cell in occupied:
+            self.cells.setdefault(cell, set()).add(name)
+        self.lines[name] = occupied
+        self.origins[name] = origin
+        self.groups.setdefault(origin, set()).add(name)
+
+    def remove(self, name):
+        for cell in self.lines.pop(name, ()):
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(name)
+                if not bucket:
+                    del self.cells[cell]
+        origin = self.origins.pop(name, None)
+        group = self.groups.get(origin)
+        if group is not None:
+            group.discard(name)
+            if not group:
+                del self.groups[origin]
+
+    def candidates(self, P, v, length, exclude_origin=None):
+        """Nombres de las líneas que pueden quedar a menos de `cell_size` del tramo.
+
+        Con `exclude_origin` se omiten las líneas observadas desde esa estación.
+        """
+        found = set()
+        for cell in self._traverse(P, v, length):
+            found |= self.cells.get(cell, set())
+        if exclude_origin is not None:
+            found -= self.groups.get(exclude_origin, set())
+        return found
@@ -0,0 +1,205 @@
+"""Tabla de observaciones por columnas.
+
+Cada línea de observación es una fila; las columnas son arrays de NumPy con
+los mismos nombres que las propiedades de las líneas en Blender (`origen`,
+`destino`, `vector`...). Los textos se guardan como índices a una tabla de
+cadenas, y hay índices por estación de origen y por destino. La tabla se
+empaqueta entera en bytes (npz) para guardarla dentro del .blend.
+
+En el addon es una caché: lo que vale son las propiedades de las líneas, y
+la tabla se rehace a partir de ellas cuando no cuadra con la escena.
+"""
+import io
+
+import numpy as np
+
+# columna -> (tipo, anchura); las de tipo str guardan índices a `strings`, -1 si no hay valor
+COLUMNS = {
+    "tipo": (str, 1),
+    "origen": (str, 1),
+    "destino": (str, 1),
+    "dist_texto": (str, 1),
+    "altura_viz_linea": (str, 1),
+    "altura_viz_texto": (str, 1),
+    "vector": (float, 3),
+    "observer_height": (float, 1),
+    "is_projected": (bool, 1),
+    "residuo": (float, 3),
+}
+FORMAT_VERSION = 1
+
+def _empty(kind, width, n):
+    if kind is str:
+        return np.full(n, -1, dtype=np.int32)
+    if kind is bool:
+        return np.zeros(n, dtype=bool)
+    return np.full((n, width) if width > 1 else n, np.nan)
+
+class ObservationTable:
+    def __init__(self, capacity=64):
+        self.names = []       # nombre de la línea por fila; None en las filas borradas
+        self.row_of = {}      # nombre -> fila
+        self.strings = []     # cadenas internadas
+        self._string_id = {}
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.columns = {key: _empty(kind, width, capacity) for key, (kind, width) in COLUMNS.items()}
+        self._by = {"origen": {}, "destino": {}}  # índice de cadena -> {filas}
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def __contains__(self, name):
+        return name in self.row_of
+
+    def _intern(self, value):
+        i = self._string_id.get(value)
+        if i is None:
+            i = self._string_id[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def _grow(self, n):
+        capacity = len(self.alive)
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity)
+        self.alive = np.concatenate((self.alive, np.zeros(capacity - len(self.alive), dtype=bool)))
+        for key, (kind, width) in COLUMNS.items():
+            column = self.columns[key]
+            self.columns[key] = np.concatenate((column, _empty(kind, width, capacity - len(column))))
+
+    def _index(self, key, row, old, new):
+        if key not in self._by:
+            return
+        if old >= 0:
+            group = self._by[key].get(old)
+            if group is not None:
+                group.discard(row)
+                if not group:
+                    del self._by[key][old]
+        if new >= 0:
+            self._by[key].setdefault(new, set()).add(row)
+
+    def add(self, name, **values):
+        """Añade una fila (o actualiza la que ya tenga ese nombre). Devuelve su índice."""
+        row = self.row_of.get(name)
+        if row is None:
+            row = len(self.names)
+            self._grow(row + 1)
+            self.names.append(name)
+            self.row_of[name] = row
+            self.alive[row] = True
+        self.set(name, **values)
+        return row
+
+    def set(self, name, **values):
+        """Cambia columnas de una fila; las columnas desconocidas se ignoran."""
+        row = self.row_of[name]
+        for key, value in values.items():
+            spec = COLUMNS.get(key)
+            if spec is None:
+                continue
+            column = self.columns[key]
+            if spec[0] is str:
+                new = self._intern(str(value)) if value else -1
+                self._index(key, row, int(column[row]), new)
+                column[row] = new
+            elif spec[0] is bool:
+                column[row] = bool(value)
+            else:
+                column[row] = np.nan if value is None else value
+
+    def get(self, name, key, default=None):
+        row = self.row_of.get(name)
+        if row is None:
+            return default
+        kind, width = COLUMNS[key]
+        value = self.columns[key][row]
+        if kind is str:
+            return self.strings[value] if value >= 0 else default
+        if kind is bool:
+            return bool(value)
+        if width > 1:
+            return default if np.isnan(value).all() else tuple(value.tolist())
+        return default if np.isnan(value) else float(value)
+
+    def remove(self, names):
+        for name in names:
+            row = self.row_of.pop(name, None)
+            if row is None:
+                continue
+            for key in self._by:
+                self._index(key, row, int(self.columns[key][row]), -1)
+            self.alive[row] = False
+            self.names[row] = None
+
+    def rows(self):
+        """Filas vivas, en orden de alta."""
+        return np.nonzero(self.alive[:len(self.names)])[0]
+
+    def rows_from(self, origin):
+        """Filas de las líneas que parten de una estación."""
+        i = self._string_id.get(origin)
+        return sorted(self._by["origen"].get(i, ())) if i is not None else []
+
+    def rows_to(self, target):
+        """Filas de las líneas que acaban en una estación."""
+        i = self._string_id.get(target)
+        return sorted(self._by["destino"].get(i, ())) if i is not None else []
+
+    def column(self, key, rows=None):
+        """Columna entera (o de `rows`); las de texto, decodificadas a listas de cadenas o None."""
+        rows = self.rows() if rows is None else np.asarray(rows, dtype=np.int64)
+        values = self.columns[key][rows]
+        if COLUMNS[key][0] is str:
+            return [self.strings[i] if i >= 0 else None for i in values.tolist()]
+        return values
+
+    def where(self, key, values, rows=None):
+        """Filas (de entre `rows`) cuya columna de texto `key` está en `values`."""
+        rows = self.rows() if rows is None else np.asarray(rows, dtype=np.int64)
+        ids = [self._string_id[v] for v in values if v in self._string_id]
+        return rows[np.isin(self.columns[key][rows], ids)]
+
+    def set_column(self, key, rows, values):
+        """Escribe de una vez una columna numérica en varias filas."""
+        self.columns[key][np.asarray(rows, dtype=np.int64)] = values
+
+    # ---- Empaquetado ----
+
+    def to_bytes(self):
+        """Tabla compactada (sin filas borradas) en formato npz."""
+        rows = self.rows()
+        used = sorted({int(i) for key, (kind, _) in COLUMNS.items() if kind is str
+                       for i in np.unique(self.columns[key][rows]) if i >= 0})
+        remap = np.full(len(self.strings) + 1, -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        arrays = {"version": np.array(FORMAT_VERSION),
+                  "names": np.array([self.names[r] for r in rows.tolist()], dtype=str),
+                  "strings": np.array([self.strings[i] for i in used], dtype=str)}
+        for key, (kind, _) in COLUMNS.items():
+            column = self.columns[key][rows]
+            arrays[key] = remap[column] if kind is str else column
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as blob:
+            if int(blob["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Versión de tabla desconocida: {int(blob['version'])}")
+            names = blob["names"].tolist()
+            table = cls(max(len(names), 64))
+            table.strings = blob["strings"].tolist()
+            table._string_id = {s: i for i, s in enumerate(table.strings)}
+            table.names = names
+            table.row_of = {name: row for row, name in enumerate(names)}
+            table.alive[:len(names)] = True
+            for key in COLUMNS:
+                table.columns[key][:len(names)] = blob[key]
+        for key, index in table._by.items():
+            for row, i in enumerate(table.columns[key][:len(names)].tolist()):
+                if i >= 0:
+                    index.setdefault(i, set()).add(row)
+        return table
@@ -0,0 +1,224 @@
+"""Etiquetas de distancia y altura.
+
+Los datos de cada etiqueta (texto, posición, escala...) se guardan en la
+escena y el objeto de texto es solo una forma de mostrarla (OBJETOS). Si no,
+se dibujan encima de la vista 3D sin crear nada: las próximas a la vista y
+las de lo seleccionado (CERCANAS) o solo las próximas (SUPERPUESTAS). Lo que
+se dibuja no toca la escena, así que tampoco el historial de deshacer.
+"""
+import blf
+import bpy
+import numpy as np
+
+from .batch import link_object, paint_object
+from .core.instrument import count, timed
+from .core.labels import nearest_labels, project_labels
+from .utils import COLOR_ALTURA, COLOR_DISTANCIA, COLOR_PROYECCION, on_reset
+
+LABEL_STORE = "topo_etiquetas"  # propiedad de la escena: nombre -> datos de la etiqueta
+LABEL_COLORS = {"texto_distancia": COLOR_DISTANCIA, "texto_altura": COLOR_ALTURA, "texto_proyeccion": COLOR_PROYECCION}
+LABEL_FONT_SIZE = 13  # tamaño de las etiquetas superpuestas (px)
+
+_labels = None          # copia en Python de la tabla de la escena
+_label_arrays = None    # (nombres, posiciones (n, 3), estación -> índices) para elegir las que se dibujan
+_label_suffix = {}      # nombre base -> último sufijo .001, .002... usado
+_label_draw_handle = None
+
+@on_reset
+def _reset_labels(loaded):
+    global _labels, _label_arrays
+    _labels = _label_arrays = None
+    _label_suffix.clear()
+
+def _label_record(body, location, scale, tipo, rotation, collection, owners):
+    return {"texto": body, "pos": tuple(location), "escala": scale, "tipo": tipo, "rot": rotation,
+            "coleccion": collection, "de": list(owners)}
+
+def _plain(record):
+    return {key: value.to_list() if hasattr(value, "to_list") else value for key, value in record.items()}
+
+def label_store(scene=None):
+    """Tabla de etiquetas de la escena; la primera vez adopta los textos que ya existan como objeto."""
+    scene = scene or bpy.context.scene
+    if LABEL_STORE not in scene:
+        scene[LABEL_STORE] = {}
+        store = scene[LABEL_STORE]
+        for obj in bpy.data.objects:
+            if obj.get("tipo") in LABEL_COLORS:
+                collection = obj.users_collection[0].name if obj.users_collection else ""
+                store[obj.name] = _label_record(obj.data.body, obj.location, obj.scale[0], obj["tipo"],
+                                                obj.rotation_euler[0], collection, ())
+    return scene[LABEL_STORE]
+
+def label_table():
+    global _labels
+    if _labels is None:
+        _labels = {name: _plain(record) for name, record in label_store().items()}
+    return _labels
+
+def label_arrays():
+    global _label_arrays
+    if _label_arrays is None:
+        table = label_table()
+        names = list(table)
+        owners = {}
+        for i, name in enumerate(names):
+            for owner in table[name]["de"]:
+                owners.setdefault(owner, []).append(i)
+        _label_arrays = (names, np.array([table[name]["pos"] for name in names], dtype=np.float64).reshape(-1, 3), owners)
+    return _label_arrays
+
+def label_object(name):
+    """Objeto de texto de la etiqueta, o None si ahora no se muestra como objeto."""
+    obj = bpy.data.objects.get(name or "")
+    return obj if obj is not None and obj.get("tipo") in LABEL_COLORS else None
+
+def _unique_label_name(name):
+    table = label_table()
+    if name not in table and bpy.data.objects.get(name) is None:
+        return name
+    k = _label_suffix.get(name, 0) + 1
+    while f"{name}.{k:03d}" in table or bpy.data.objects.get(f"{name}.{k:03d}") is not None:
+        k += 1
+    _label_suffix[name] = k
+    return f"{name}.{k:03d}"
+
+@timed("create_text_object")
+def _create_text_object(name, body, location, collection, scale=0.3, tipo="texto_info", color=None):
+    count("objects_created")
+    txt_data = bpy.data.curves.new(name=name, type='FONT')
+    txt_obj = bpy.data.objects.new(name, txt_data)
+    txt_data.body = body
+    txt_obj.location = location
+    txt_obj.scale = (scale, scale, scale)
+    txt_obj["tipo"] = tipo
+    if color:
+        paint_object(txt_obj, color)
+    link_object(txt_obj, collection)
+    return txt_obj
+
+
+def _materialize_label(name, record):
+    collection = bpy.data.collections.get(record["coleccion"]) or bpy.context.scene.collection
+    obj = _create_text_object(name, record["texto"], record["pos"], collection, record["escala"], record["tipo"],
+                              LABEL_COLORS[record["tipo"]])
+    obj.rotation_euler[0] = record["rot"]
+    return obj
+
+def _remove_label_object(obj):
+    data = obj.data
+    bpy.data.objects.remove(obj, do_unlink=True)
+    if data is not None and data.users == 0:
+        bpy.data.curves.remove(data)
+
+@timed("create_label")
+def create_label(context, name, body, location, collection, scale, tipo, rotation=0.0, owners=()):
+    """Registra una etiqueta y crea su objeto de texto si el modo de etiquetas lo pide.
+
+    `owners` son las estaciones o puntos a los que acompaña: en modo CERCANAS,
+    al seleccionarlos se dibuja aunque esté lejos. Devuelve el nombre de la etiqueta.
+    """
+    global _label_arrays
+    count("labels_created")
+    name = _unique_label_name(name)
+    record = _label_record(body, location, scale, tipo, rotation, collection.name, owners)
+    label_store(context.scene)[name] = record
+    label_table()[name] = record
+    _label_arrays = None
+    if context.scene.topo_label_mode == 'OBJETOS':
+        _materialize_label(name, record)
+    return name
+
+def update_label(name, location=None, body=None):
+    """Cambia la posición o el texto de una etiqueta, y de su objeto si lo tiene."""
+    global _label_arrays
+    record = label_table().get(name or "")
+    if record is None:
+        return
+    stored = label_store()[name]
+    if location is not None:
+        record["pos"] = stored["pos"] = tuple(location)
+        _label_arrays = None
+    if body is not None:
+        record["texto"] = stored["texto"] = body
+    obj = label_object(name)
+    if obj is not None:
+        if location is not None:
+            obj.location = location
+        if body is not None:
+            obj.data.body = body
+
+def delete_labels(names):
+    global _label_arrays
+    table, store = label_table(), label_store()
+    for name in names:
+        if table.pop(name, None) is not None:
+            del store[name]
+        obj = label_object(name)
+        if obj is not None:
+            _remove_label_object(obj)
+    _label_arrays = None
+
+def shown_labels(context, eye):
+    """Índices (en `label_arrays`) de las etiquetas que se dibujan: las próximas a la vista y,
+    en modo CERCANAS, también las de lo seleccionado."""
+    scene = context.scene
+    names, positions, owners = label_arrays()
+    near = nearest_labels(positions, eye, scene.topo_label_distance, scene.topo_label_limit)
+    if scene.topo_label_mode != 'CERCANAS':
+        return near
+    selected = [i for obj in getattr(context, "selected_objects", None) or () for i in owners.get(obj.name, ())]
+    if not selected:
+        return near
+    return np.concatenate((near, np.setdiff1d(selected, near)))
+
+def update_label_objects(context):
+    """Crea o borra objetos de texto para que coincidan con el modo de etiquetas de la escena."""
+    table = label_table()
+    wanted = set(table) if context.scene.topo_label_mode == 'OBJETOS' else set()
+    shown = {obj.name for obj in bpy.data.objects if obj.get("tipo") in LABEL_COLORS}
+    for name in (shown & table.keys()) - wanted:
+        _remove_label_object(bpy.data.objects[name])
+    for name in wanted - shown:
+        _materialize_label(name, table[name])
+
+def label_mode_changed(self, context):
+    update_label_objects(context)
+
+def _blf_size(font, size):
+    try:
+        blf.size(font, size)
+    except TypeError:  # Blender < 4.0 pide también los dpi
+        blf.size(font, size, 72)
+
+@timed("labels.draw")
+def _draw_labels():
+    """Dibujo sobre la vista 3D de las etiquetas de los modos CERCANAS y SUPERPUESTAS."""
+    context = bpy.context
+    rv3d, region = context.region_data, context.region
+    if rv3d is None or region is None or context.scene.topo_label_mode == 'OBJETOS':
+        return
+    names, positions, _ = label_arrays()
+    if not names:
+        return
+    near = shown_labels(context, tuple(rv3d.view_matrix.inverted().translation))
+    pixels, inside = project_labels(positions[near], rv3d.perspective_matrix, region.width, region.height)
+    table, font = label_table(), 0
+    _blf_size(font, LABEL_FONT_SIZE)
+    for i, (x, y) in zip(near[inside].tolist(), pixels[inside].tolist()):
+        record = table[names[i]]
+        width, height = blf.dimensions(font, record["texto"])
+        blf.color(font, *LABEL_COLORS[record["tipo"]])
+        blf.position(font, x - width / 2.0, y - height / 2.0, 0)
+        blf.draw(font, record["texto"])
+
+
+def register():
+    global _label_draw_handle
+    _label_draw_handle = bpy.types.SpaceView3D.draw_handler_add(_draw_labels, (), 'WINDOW', 'POST_PIXEL')
+
+def unregister():
+    global _label_draw_handle
+    if _label_draw_handle is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(_label_draw_handle, 'WINDOW')
+        _label_draw_handle = None
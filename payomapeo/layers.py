@@ -0,0 +1,175 @@
+"""Líneas de observación: objetos sueltos o aristas de las capas compactas.
+
+En modo compacto las líneas de cada categoría de una colección son aristas
+de una sola malla (la capa), con sus propiedades como atributos por arista.
+`EdgeLine` da a cada arista la interfaz de un objeto línea, para que el resto
+del addon las trate igual.
+"""
+import bpy
+import numpy as np
+
+from .utils import COLOR_ALTURA, COLOR_DISTANCIA, COLOR_PROYECCION, COLOR_RAYO, on_reset
+
+LINE_TYPES = {"rayo_observacion", "observacion_segmento"}
+def is_line_object(obj):
+    return obj.type == 'MESH' and obj.get("tipo") in LINE_TYPES
+
+# categoría -> (prefijo de la capa, tipo de sus líneas, color)
+LINE_LAYERS = {
+    "rayos": ("Rayos", "rayo_observacion", COLOR_RAYO),
+    "segmentos": ("Segmentos", "observacion_segmento", COLOR_DISTANCIA),
+    "distancias": ("Distancias", None, COLOR_DISTANCIA),
+    "alturas": ("Alturas", None, COLOR_ALTURA),
+    "proyecciones": ("Proyecciones", "observacion_segmento", COLOR_PROYECCION),
+    "manuales": ("Manuales", "linea_manual", COLOR_DISTANCIA),
+}
+# Atributos por arista; los de texto se guardan como índice en la tabla "nombres" de la capa
+EDGE_NAME_FIELDS = ("origen", "destino", "dist_texto", "altura_viz_linea", "altura_viz_texto")
+EDGE_ATTRIBUTES = (("line_id", 'INT'), ("vector", 'FLOAT_VECTOR'), ("observer_height", 'FLOAT'), ("is_projected", 'INT'), ("residuo", 'FLOAT_VECTOR')) + tuple((f, 'INT') for f in EDGE_NAME_FIELDS)
+EDGE_VECTOR_FIELDS = {name for name, data_type in EDGE_ATTRIBUTES if data_type == 'FLOAT_VECTOR'}
+
+_layer_rows = {}   # nombre de capa -> {line_id: índice de arista}
+_layer_names = {}  # nombre de capa -> [nombres por índice]
+
+@on_reset
+def _reset_layers(loaded):
+    _layer_rows.clear()
+    _layer_names.clear()
+
+class EdgeLine:
+    """Una arista de una capa compacta, con la misma interfaz que un objeto línea (get, [], in, name)."""
+    def __init__(self, layer, line_id):
+        self.layer = layer
+        self.line_id = line_id
+        self.name = f"{layer.name}:{line_id}"
+
+    def _edge(self):
+        return layer_rows(self.layer)[self.line_id]
+
+    def get(self, key, default=None):
+        if key == "tipo":
+            return self.layer.get("tipo_linea", default)
+        attr = self.layer.data.attributes.get(key)
+        if attr is None:
+            return default
+        item = attr.data[self._edge()]
+        if key in EDGE_VECTOR_FIELDS:
+            return tuple(item.vector)
+        if key in EDGE_NAME_FIELDS:
+            return layer_names(self.layer)[item.value] if item.value >= 0 else default
+        if key == "is_projected":
+            return bool(item.value)
+        return item.value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        attr = self.layer.data.attributes.get(key)
+        if attr is None:  # capa creada antes de existir este atributo
+            attr = self.layer.data.attributes.new(key, dict(EDGE_ATTRIBUTES)[key], 'EDGE')
+        item = attr.data[self._edge()]
+        if key in EDGE_VECTOR_FIELDS:
+            item.vector = value
+        elif key in EDGE_NAME_FIELDS:
+            item.value = layer_name_index(self.layer, value)
+        else:
+            item.value = value
+
+def layer_rows(layer):
+    rows = _layer_rows.get(layer.name)
+    if rows is None:
+        ids = np.empty(len(layer.data.edges), dtype=np.int32)
+        layer.data.attributes["line_id"].data.foreach_get("value", ids)
+        rows = _layer_rows[layer.name] = {int(line_id): e for e, line_id in enumerate(ids)}
+    return rows
+
+def add_layer_rows(layer, rows):
+    """Apunta aristas añadidas a la malla, como pares (line_id, índice de arista), si la capa ya estaba leída."""
+    known = _layer_rows.get(layer.name)
+    if known is not None:
+        known.update(rows)
+
+def layer_names(layer):
+    names = _layer_names.get(layer.name)
+    if names is None:
+        table = layer["nombres"]
+        names = [None] * len(table)
+        for name, i in table.items():
+            names[i] = name
+        _layer_names[layer.name] = names
+    return names
+
+def layer_name_index(layer, name):
+    table = layer["nombres"]
+    i = table.get(name)
+    if i is None:
+        names = layer_names(layer)
+        i = table[name] = len(names)
+        names.append(name)
+    return i
+
+def layer_remove_lines(layer, line_ids):
+    """Quita aristas de una capa reconstruyendo la malla con las que quedan."""
+    mesh = layer.data
+    rows = layer_rows(layer)
+    drop = {rows[i] for i in line_ids if i in rows}
+    if not drop:
+        return
+    n_edges = len(mesh.edges)
+    keep = np.array([e for e in range(n_edges) if e not in drop], dtype=np.int64)
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    ends = np.empty(n_edges * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", ends)
+    co = co.reshape(-1, 3)[ends.reshape(-1, 2)[keep].ravel()]
+    values = {}
+    for name, data_type in EDGE_ATTRIBUTES:
+        if mesh.attributes.get(name) is None:
+            continue
+        key, width, dtype = ("vector", 3, np.float32) if data_type == 'FLOAT_VECTOR' else ("value", 1, np.float32 if data_type == 'FLOAT' else np.int32)
+        buf = np.empty(n_edges * width, dtype=dtype)
+        mesh.attributes[name].data.foreach_get(key, buf)
+        values[name] = (key, buf.reshape(n_edges, width)[keep].ravel())
+
+    mesh.clear_geometry()
+    mesh.vertices.add(len(co))
+    mesh.edges.add(len(keep))
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.edges.foreach_set("vertices", np.arange(len(co), dtype=np.int32))
+    for name, data_type in EDGE_ATTRIBUTES:
+        if name not in values:
+            continue
+        attr = mesh.attributes.get(name) or mesh.attributes.new(name, data_type, 'EDGE')
+        key, buf = values[name]
+        attr.data.foreach_set(key, buf)
+    mesh.update()
+    _layer_rows.pop(layer.name, None)
+
+def iter_lines():
+    """Todas las líneas de observación, sean objetos sueltos o aristas de capas compactas."""
+    for obj in bpy.data.objects:
+        if is_line_object(obj):
+            yield obj
+        elif obj.get("tipo") == "capa_lineas" and obj.get("tipo_linea") in LINE_TYPES:
+            for line_id in layer_rows(obj):
+                yield EdgeLine(obj, line_id)
+
+def selected_lines(context):
+    """La línea activa, o las aristas seleccionadas si lo activo es una capa compacta."""
+    obj = context.active_object
+    if obj is None:
+        return []
+    if obj.get("tipo") != "capa_lineas":
+        return [obj]
+    selected = np.zeros(len(obj.data.edges), dtype=bool)
+    obj.data.edges.foreach_get("select", selected)
+    ids = np.empty(len(obj.data.edges), dtype=np.int32)
+    obj.data.attributes["line_id"].data.foreach_get("value", ids)
+    return [EdgeLine(obj, int(line_id)) for line_id in ids[selected]]
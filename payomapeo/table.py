@@ -0,0 +1,203 @@
+"""Caché de observaciones.
+
+Lo que vale son las propiedades de cada línea (o los atributos de su arista
+en las capas compactas). Las consultas (red para el ajuste, índice espacial,
+grafo) leen en su lugar una copia por columnas (core.store), que se rehace
+de las líneas cuando deja de cuadrar, como tras deshacer. Al guardar se deja
+una instantánea en un bloque de texto del .blend solo para no rehacerla al
+abrir el archivo; si falta o no cuadra con la escena, se ignora.
+"""
+import base64
+import hashlib
+import zipfile
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from mathutils import Vector
+
+from .batch import get_line, pending_lines
+from .core.geometry import RAY_LENGTH
+from .core.instrument import timed
+from .core.store import COLUMNS, ObservationTable
+from .layers import EDGE_ATTRIBUTES, EDGE_NAME_FIELDS, LINE_TYPES, layer_names
+from .utils import on_reset
+
+OBS_BLOB = "PayoMapeo_cache_observaciones"  # instantánea de la caché (npz en base64)
+TABLE_TYPES = LINE_TYPES | {"linea_manual"}
+
+_obs_cache = None       # ObservationTable; se carga o reconstruye perezosamente
+_obs_from_blob = False  # tras abrir un archivo la caché puede salir de su instantánea
+
+@on_reset
+def _reset_observation_cache(loaded):
+    global _obs_cache, _obs_from_blob
+    _obs_cache = None
+    _obs_from_blob = loaded
+
+def _line_props(line):
+    return {key: line.get(key) for key in COLUMNS if key in line}
+
+def set_line_props(line, **props):
+    """Escribe propiedades de una línea y las copia a la caché de observaciones."""
+    for key, value in props.items():
+        line[key] = value
+    if _obs_cache is not None and line.name in _obs_cache:
+        _obs_cache.set(line.name, **props)
+
+def cache_line(line):
+    """Da de alta una línea nueva en la caché, si ya está hecha."""
+    if _obs_cache is not None:
+        _obs_cache.add(line.name, **_line_props(line))
+
+def uncache_lines(names):
+    if _obs_cache is not None:
+        _obs_cache.remove(names)
+
+def missing_from_cache(name):
+    """True si la caché ya está hecha y no tiene esa línea (creada fuera de los operadores)."""
+    return _obs_cache is not None and name not in _obs_cache
+
+def _scene_table_lines():
+    """Objetos línea y capas compactas de la escena que van a la caché."""
+    objects, layers = [], []
+    for obj in bpy.data.objects:
+        tipo = obj.get("tipo")
+        if tipo in TABLE_TYPES and obj.type == 'MESH':
+            objects.append(obj)
+        elif tipo == "capa_lineas" and obj.get("tipo_linea") in TABLE_TYPES:
+            layers.append(obj)
+    return objects, layers
+
+def _layer_columns(layer):
+    """Atributos de las aristas de una capa que van a la caché, leídos de una vez: nombre -> array."""
+    mesh = layer.data
+    n = len(mesh.edges)
+    data = {}
+    for name, data_type in EDGE_ATTRIBUTES:
+        attr = mesh.attributes.get(name)
+        if attr is None or (name not in COLUMNS and name != "line_id"):
+            continue
+        key, width, dtype = ("vector", 3, np.float32) if data_type == 'FLOAT_VECTOR' else ("value", 1, np.float32 if data_type == 'FLOAT' else np.int32)
+        buf = np.empty(n * width, dtype=dtype)
+        attr.data.foreach_get(key, buf)
+        data[name] = buf.reshape(n, width) if width > 1 else buf
+    return data
+
+@timed("scene_signature")
+def scene_signature():
+    """Firma con que se guardan los bloques de texto: si deja de cuadrar con la escena, el bloque no vale.
+
+    Resume el nombre, los extremos (origen y destino), el vector y la altura
+    del observador de cada línea; en las capas compactas se leen por columnas.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    objects, layers = _scene_table_lines()
+    for obj in objects:
+        vector = obj.get("vector")
+        digest.update(repr((obj.name, obj.get("tipo"), obj.get("origen"), obj.get("destino"),
+                            None if vector is None else tuple(vector), obj.get("observer_height"))).encode())
+    for layer in layers:
+        digest.update(repr((layer.name, layer.get("tipo_linea"), layer_names(layer))).encode())
+        data = _layer_columns(layer)
+        for name in ("line_id", "origen", "destino", "vector", "observer_height"):
+            if name in data:
+                digest.update(data[name].tobytes())
+    return digest.hexdigest()
+
+def _add_layer_rows(table, layer):
+    """Filas de una capa compacta leyendo sus atributos de una vez."""
+    n = len(layer.data.edges)
+    if n == 0:
+        return
+    data = _layer_columns(layer)
+    names = layer_names(layer)
+    tipo = layer.get("tipo_linea")
+    for e in range(n):
+        values = {"tipo": tipo}
+        for name, column in data.items():
+            if name == "line_id":
+                continue
+            if name in EDGE_NAME_FIELDS:
+                values[name] = names[column[e]] if column[e] >= 0 else None
+            elif name == "is_projected":
+                values[name] = bool(column[e])
+            else:
+                values[name] = column[e]
+        table.add(f"{layer.name}:{int(data['line_id'][e])}", **values)
+
+@timed("observation_cache.build")
+def _build_observation_cache():
+    table = ObservationTable()
+    objects, layers = _scene_table_lines()
+    for obj in objects:
+        table.add(obj.name, **_line_props(obj))
+    for layer in layers:
+        _add_layer_rows(table, layer)
+    return table
+
+def read_blob(name, loader):
+    """`loader(bytes)` del bloque de texto `name`, si sigue cuadrando con la escena; si no, None."""
+    text = bpy.data.texts.get(name)
+    if text is None or text.get("firma") != scene_signature():
+        return None
+    try:
+        return loader(base64.b64decode(text.as_string()))
+    except (ValueError, KeyError, OSError, zipfile.BadZipFile):  # bloque dañado: se reconstruye
+        return None
+
+def write_blob(name, data, firma):
+    text = bpy.data.texts.get(name) or bpy.data.texts.new(name)
+    text.use_fake_user = True
+    text.from_string(base64.b64encode(data).decode("ascii"))
+    text["firma"] = firma
+
+def _load_observation_cache():
+    """La instantánea guardada en el archivo, si sigue cuadrando con la escena."""
+    return read_blob(OBS_BLOB, ObservationTable.from_bytes)
+
+def observation_cache():
+    global _obs_cache, _obs_from_blob
+    if _obs_cache is None:
+        _obs_cache = (_load_observation_cache() if _obs_from_blob else None) or _build_observation_cache()
+        _obs_from_blob = False
+        for line in pending_lines():  # aristas de un lote que aún no están en la malla
+            if "origen" in line and line.name not in _obs_cache:
+                _obs_cache.add(line.name, **_line_props(line))
+    return _obs_cache
+
+def table_geometries(rows=None):
+    """(nombre, P, dirección unitaria, longitud, origen) de las observaciones de la caché, calculado por columnas."""
+    table = observation_cache()
+    rows = table.where("tipo", LINE_TYPES, rows)
+    origins = table.column("origen", rows)
+    located = {name: bpy.data.objects.get(name or "") for name in set(origins)}
+    keep = np.array([located[name] is not None for name in origins], dtype=bool)
+    keep &= ~np.isnan(table.columns["vector"][rows]).any(axis=1)
+    rows = rows[keep]
+    origins = [name for name, k in zip(origins, keep.tolist()) if k]
+    if not origins:
+        return []
+    P = np.array([tuple(located[name].location) for name in origins], dtype=np.float64)
+    P[:, 2] += np.nan_to_num(table.columns["observer_height"][rows])
+    v = table.columns["vector"][rows]
+    norm = np.linalg.norm(v, axis=1)
+    u = v / np.where(norm > 0, norm, 1.0)[:, None]
+    segment = np.array([tipo == "observacion_segmento" for tipo in table.column("tipo", rows)], dtype=bool)
+    length = np.where(segment, norm, RAY_LENGTH)
+    return [(table.names[row], Vector(p), Vector(d), float(l), origin)
+            for row, p, d, l, origin in zip(rows.tolist(), P.tolist(), u.tolist(), length.tolist(), origins)]
+
+def prune_observation_cache():
+    """Quita de la caché las líneas que ya no existen (borradas a mano)."""
+    table = observation_cache()
+    table.remove([name for name in list(table.row_of) if get_line(name) is None])
+
+@persistent
+@timed("observation_cache.save")
+def save_observation_cache(*_args):
+    """Guarda la instantánea de la caché; si no se ha tocado desde que se abrió el archivo, la guardada sigue valiendo."""
+    if _obs_cache is None and _obs_from_blob:
+        return
+    prune_observation_cache()
+    write_blob(OBS_BLOB, observation_cache().to_bytes(), scene_signature())
@@ -0,0 +1,77 @@
+"""Colores, paleta de materiales y utilidades de Blender que comparten las demás partes del addon.
+
+Cada parte del addon que guarda estado entre llamadas (cachés, registros,
+temporizadores) se apunta con `on_reset` para soltarlo cuando el archivo deja
+de ser el mismo: al abrir otro, al deshacer o rehacer y al desactivar el addon.
+"""
+import bpy
+
+# ==========================
+# Constantes y Colores
+# ==========================
+COLOR_NODO_PRINCIPAL = (0.2, 1.0, 0.2, 1.0)
+COLOR_PUNTO = (0.0, 0.4, 0.0, 1.0)
+COLOR_RAYO = (0.2, 0.6, 1.0, 1.0)
+COLOR_DISTANCIA = (1.0, 0.9, 0.2, 1.0)
+# --- NUEVO COLOR ---
+COLOR_ALTURA = (0.8, 0.1, 0.8, 1.0)
+COLOR_PROYECCION = (0.2, 0.8, 1.0, 1.0)  # texto de proyección al suelo
+
+# ==========================
+# Estado por archivo
+# ==========================
+
+_resets = []  # funciones(loaded) que sueltan el estado de cada parte
+
+def on_reset(func):
+    """Apunta `func(loaded)` para soltar su estado; `loaded` es True tras abrir un archivo."""
+    _resets.append(func)
+    return func
+
+def reset_state(loaded=False):
+    for func in _resets:
+        func(loaded)
+
+# ==========================
+# Utilidades
+# ==========================
+
+def set_object_color(obj, color):
+    """Establece el color de un objeto directamente. Ideal para Empties y el modo 'Object Color'."""
+    obj.color = color
+
+# Paleta: un material por color COLOR_*, buscado por nombre. No se guardan referencias entre
+# llamadas (tras deshacer o borrarlo a mano apuntarían a datos liberados); dentro de un lote
+# cada color se busca una sola vez al confirmarlo (batch.paint_object).
+
+def material_name(color, mat_name_prefix="Topo_Mat"):
+    return f"{mat_name_prefix}_{int(color[0]*255)}_{int(color[1]*255)}_{int(color[2]*255)}"
+
+def palette_material(color, mat_name_prefix="Topo_Mat"):
+    """Material de un color de la paleta; se crea la primera vez que hace falta en el archivo."""
+    name = material_name(color, mat_name_prefix)
+    mat = bpy.data.materials.get(name)
+    if not mat:
+        mat = bpy.data.materials.new(name=name)
+        mat.use_nodes = False
+        mat.diffuse_color = color
+    return mat
+
+def assign_material(obj, mat, color):
+    """Pone `mat` como primer material del objeto y su color como color de objeto."""
+    materials = obj.data.materials
+    if len(materials) == 0:
+        materials.append(mat)
+    elif materials[0] != mat:
+        materials[0] = mat
+    set_object_color(obj, color)
+
+def apply_material(obj, color, mat_name_prefix="Topo_Mat"):
+    """Aplica el material de la paleta con un color específico. Ideal para texto y mallas."""
+    assign_material(obj, palette_material(color, mat_name_prefix), color)
+
+def redraw_3d_views(context):
+    for window in getattr(context.window_manager, "windows", ()):
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
@@ -0,0 +1,6 @@
+"""Las pruebas usan `payomapeo.core` y `benchmarks`, sin Blender."""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
@@ -0,0 +1,34 @@
+"""Convergencia del ajuste en las redes de los benchmarks."""
+import numpy as np
+import pytest
+
+from networks import make_survey
+from payomapeo.core.adjust import MAX_ITERATIONS, SIGMA_ANGLE, SIGMA_DISTANCE, adjust
+from payomapeo.core.parallel import adjustment_plan
+
+def traverse(n_stations=25, seed=0):
+    """La poligonal de `benchmarks/run.py` con sus opciones por defecto, ya intersecada."""
+    survey = make_survey("traverse", n_stations, 20, seed=seed)
+    survey.intersect(0.5)
+    return survey
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("sigmas", [(SIGMA_ANGLE, SIGMA_DISTANCE), (0.05, 0.05)])  # los del addon y los de run.py
+def test_traverse_converges(seed, sigmas):
+    survey = traverse(seed=seed)
+    sigma_angle, sigma_distance = sigmas
+    result = adjust(survey, sigma_angle=sigma_angle, sigma_distance=sigma_distance)
+    assert result.converged
+    assert result.iterations < MAX_ITERATIONS
+    # Todas las estaciones de la poligonal salvo la primera son libres y se recolocan
+    assert set(result.locations) >= {f"S{i}" for i in range(1, 25)}
+    assert np.isfinite(result.sigma0)
+
+def test_unconverged_is_reported():
+    result = adjust(traverse(), max_iter=5)
+    assert not result.converged and result.iterations == 5
+
+def test_plan_reports_unconverged_parts():
+    tasks, combine = adjustment_plan(traverse(), max_iter=5, n_tasks=2)
+    results = [function(*args) for function, args in tasks]
+    assert not combine(results).converged
@@ -0,0 +1,87 @@
+"""Exportadores: CSV, GeoJSON y PLY de trozos pequeños, leídos de vuelta."""
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from payomapeo.core.export import (PLY_EDGE, PLY_KINDS, PLY_VERTEX, LineChunk, PointChunk, lines_path, write_csv, write_geojson,
+                                   write_ply)
+
+NAN = float("nan")
+
+def points():
+    return [PointChunk(["A", 'Pozo "norte", 2'], ["nodo", "interseccion"],
+                       np.array([[0.0, 0.0, 0.0], [10.5, -2.25, 1.0]]), np.array([NAN, 0.0125])),
+            PointChunk(["P"], ["punto"], np.array([[1.0, 2.0, 3.0]]), np.array([NAN]))]
+
+def lines():
+    return [LineChunk(["Seg_A_P", "Proy_A,P"], ["observacion_segmento", "observacion_segmento"], ["A", "A"], ["P", "P"],
+                      np.array([[0.0, 0.0, 1.5], [0.0, 0.0, 0.0]]), np.array([[1.0, 2.0, 3.0], [1.0, 2.0, 3.0]]),
+                      np.array([3.5, NAN]), np.array([False, True]), np.array([[0.001, NAN, -0.02], [NAN, NAN, NAN]]))]
+
+def test_csv_quotes_and_empty_fields(tmp_path):
+    path = tmp_path / "red.csv"
+    assert write_csv(str(path), points(), lines()) == (3, 2)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["nombre"] for row in rows] == ["A", 'Pozo "norte", 2', "P"]
+    assert rows[0]["gap"] == "" and rows[1]["gap"] == "0.0125"
+    assert (rows[1]["x"], rows[1]["y"], rows[1]["z"]) == ("10.5000", "-2.2500", "1.0000")
+    with open(lines_path(str(path)), newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["nombre"] for row in rows] == ["Seg_A_P", "Proy_A,P"]
+    assert rows[0]["res_acimut"] == "0.001000" and rows[0]["res_inclinacion"] == ""
+    assert rows[1]["distancia"] == "" and rows[1]["proyectada"] == "1"
+
+def test_csv_without_lines(tmp_path):
+    path = tmp_path / "red.csv"
+    assert write_csv(str(path), points()) == (3, 0)
+    assert not (tmp_path / "red_lineas.csv").exists()
+
+def test_geojson_is_valid(tmp_path):
+    path = tmp_path / "red.geojson"
+    assert write_geojson(str(path), points(), lines()) == (3, 2)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    features = data["features"]
+    assert data["type"] == "FeatureCollection" and len(features) == 5
+    assert features[1]["properties"] == {"nombre": 'Pozo "norte", 2', "tipo": "interseccion", "gap": 0.0125}
+    assert features[0]["properties"]["gap"] is None
+    assert features[3]["geometry"] == {"type": "LineString", "coordinates": [[0.0, 0.0, 1.5], [1.0, 2.0, 3.0]]}
+    assert features[3]["properties"]["residuo"] == [0.001, None, -0.02]
+    assert features[4]["properties"]["distancia"] is None and features[4]["properties"]["proyectada"] is True
+
+@pytest.mark.parametrize("chunks", [[], [PointChunk([], [], np.empty((0, 3)), np.empty(0))]])
+def test_empty_geojson(tmp_path, chunks):
+    path = tmp_path / "vacia.geojson"
+    assert write_geojson(str(path), chunks, []) == (0, 0)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"type": "FeatureCollection", "features": []}
+
+def read_ply(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    end = data.index(b"end_header\n") + len(b"end_header\n")
+    header = data[:end].decode("ascii").splitlines()
+    counts = {line.split()[1]: int(line.split()[2]) for line in header if line.startswith("element ")}
+    vertices = np.frombuffer(data, PLY_VERTEX, counts["vertex"], end)
+    edges = np.frombuffer(data, PLY_EDGE, counts["edge"], end + vertices.nbytes)
+    assert end + vertices.nbytes + edges.nbytes == len(data)
+    return vertices, edges
+
+def test_ply_header_counts_match_data(tmp_path):
+    path = tmp_path / "red.ply"
+    assert write_ply(str(path), points(), lines()) == (3, 2)
+    vertices, edges = read_ply(path)
+    assert len(vertices) == 3 + 2 * 2 and len(edges) == 2
+    assert vertices["tipo"].tolist() == [PLY_KINDS[k] for k in ("nodo", "interseccion", "punto")] + [PLY_KINDS["extremo"]] * 4
+    assert edges["vertex1"].tolist() == [3, 5] and edges["vertex2"].tolist() == [4, 6]
+    assert np.allclose([vertices["x"][4], vertices["y"][4], vertices["z"][4]], (1.0, 2.0, 3.0))
+    assert edges["proyectada"].tolist() == [0, 1]
+
+def test_empty_ply(tmp_path):
+    path = tmp_path / "vacia.ply"
+    assert write_ply(str(path), []) == (0, 0)
+    vertices, edges = read_ply(path)
+    assert len(vertices) == 0 and len(edges) == 0
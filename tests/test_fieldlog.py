@@ -0,0 +1,71 @@
+"""Lectura del CSV que descarga la dioptra (/download)."""
+import pytest
+
+from payomapeo.core.fieldlog import COLUMNS, parse_row, read_readings
+
+# Como lo escribe handleGuardar en dioptra.ino: el nombre tal cual, sin comillas,
+# la distancia en mm (8190/8191 fuera de rango) y el acimut con dos decimales
+HEADER = ("Punto,Distancia(mm),Inclinacion(deg),Alabeo(deg),Acimut(deg),Altitud(m),"
+          "TempMPU(C),TempBMP(C),Presion(hPa),DistSueloCalibrada(mm)\n")
+SAMPLE = HEADER + (
+    "Pozo 1,2345,1.5,-0.3,123.45,600.2,24.1,20.5,1013.2,1500\n"
+    "Pozo 2, esquina N,1200,-2.0,0.1,310.00,600.1,24.0,20.4,1013.1,1500\n"
+    "\n"
+    "Lejos,8191,0.5,0.0,45.00,600.0,24.0,20.4,1013.1,8190\n"
+    "Roto,abc,0.5,0.0,45.00,600.0,24.0,20.4,1013.1,1500\n"
+    "Corto,100,0.5\n"
+    "Cero,0,0.0,0.0,0.00,600.0,24.0,20.4,1013.1,0\n"
+)
+
+@pytest.fixture
+def log(tmp_path):
+    def write(text):
+        path = tmp_path / "datos_telescopio.csv"
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+    return write
+
+def test_parse_row_converts_units():
+    reading = parse_row("Pozo 1,2345,1.5,-0.3,123.45,600.2,24.1,20.5,1013.2,1500".split(","))
+    assert reading.name == "Pozo 1" and reading.distance == pytest.approx(2.345)
+    assert (reading.inclination, reading.roll, reading.azimuth) == (1.5, -0.3, 123.45)
+    assert reading.ground_distance == pytest.approx(1.5)
+
+def test_names_with_commas_are_joined_back():
+    reading = parse_row("Pozo 2, esquina N, bis,1200,-2.0,0.1,310.00,600.1,24.0,20.4,1013.1,1500".split(","))
+    assert reading.name == "Pozo 2, esquina N, bis"
+    assert reading.distance == pytest.approx(1.2) and reading.azimuth == 310.0
+
+@pytest.mark.parametrize("mm", ["8190", "8191", "65535", "0", "-5"])
+def test_out_of_range_distance_is_zero(mm):
+    reading = parse_row(f"P,{mm},0.0,0.0,0.00,600.0,24.0,20.4,1013.1,{mm}".split(","))
+    assert reading.distance == 0.0 and reading.ground_distance == 0.0
+
+def test_read_sample_log(log):
+    rows = list(read_readings(log(SAMPLE)))
+    assert [line for line, _ in rows] == [2, 3, 5, 6, 7, 8]  # la fila vacía no cuenta
+    readings = dict(rows)
+    assert readings[2].name == "Pozo 1" and readings[3].name == "Pozo 2, esquina N"
+    assert readings[5].distance == 0.0 and readings[5].ground_distance == 0.0
+    assert readings[6] is None and readings[7] is None  # distancia que no es un número, fila corta
+    assert readings[8].distance == 0.0 and readings[8].azimuth == 0.0
+
+def test_log_without_header_uses_firmware_order(log):
+    rows = list(read_readings(log(SAMPLE[len(HEADER):])))
+    assert rows[0][0] == 1 and rows[0][1].name == "Pozo 1"
+    assert rows[1][1].name == "Pozo 2, esquina N"
+    assert len(rows) == 6
+
+def test_columns_in_another_order(log):
+    header = list(COLUMNS)
+    header[1], header[4] = header[4], header[1]
+    rows = list(read_readings(log(",".join(header) + "\nP,123.45,1.5,-0.3,2345,600.2,24.1,20.5,1013.2,1500\n")))
+    assert rows[0][1].distance == pytest.approx(2.345) and rows[0][1].azimuth == 123.45
+
+def test_missing_column_makes_rows_unreadable(log):
+    header = HEADER.replace(",DistSueloCalibrada(mm)", "")
+    assert list(read_readings(log(header + "P,2345,1.5,-0.3,123.45,600.2,24.1,20.5,1013.2\n"))) == [(2, None)]
+
+def test_empty_log(log):
+    assert list(read_readings(log(""))) == []
+    assert list(read_readings(log(HEADER))) == []
@@ -0,0 +1,54 @@
+"""Grafo de dependencias: en qué orden se recalcula lo que cuelga de un cambio."""
+from payomapeo.core.graph import EDIT, ORIGIN, TARGET, DependencyGraph
+
+def network():
+    """A y B visan el punto X con r1 y r2; desde X sale s1 hacia P, y A tiene un segmento a P."""
+    graph = DependencyGraph()
+    graph.add_line("r1", "A")
+    graph.add_line("r2", "B")
+    graph.add_line("s1", "X", "P")
+    graph.add_line("seg", "A", "P")
+    graph.set_point_rays("X", ("r1", "r2"))
+    return graph
+
+def run(graph, stations=(), lines=(), moved_points=(), targets=None):
+    """Llamadas de `propagate` en orden; cada línea de `targets` mueve su destino la primera vez."""
+    calls = []
+    graph.propagate(stations, lines,
+                    on_station=lambda name: calls.append(("estacion", name)),
+                    on_line=lambda name, cause: calls.append(("linea", name, cause)) or (targets or {}).pop(name, None),
+                    on_point=lambda name: calls.append(("punto", name)) or name in moved_points)
+    return calls
+
+def test_points_after_all_their_lines():
+    calls = run(network(), stations=("A", "B"), moved_points=("X",))
+    assert calls == [("estacion", "A"), ("estacion", "B"),
+                     ("linea", "r1", ORIGIN), ("linea", "seg", ORIGIN), ("linea", "r2", ORIGIN),
+                     ("punto", "X"),
+                     ("estacion", "X"), ("linea", "s1", ORIGIN)]
+
+def test_point_that_does_not_move_stops_the_propagation():
+    calls = run(network(), stations=("A",))
+    assert calls[-1] == ("punto", "X") and ("linea", "s1", ORIGIN) not in calls
+
+def test_moved_target_is_followed():
+    calls = run(network(), lines=("seg",), targets={"seg": "P"})
+    assert calls == [("linea", "seg", EDIT), ("estacion", "P"), ("linea", "s1", TARGET), ("linea", "seg", TARGET)]
+
+def test_removed_line_no_longer_defines_its_point():
+    graph = network()
+    graph.remove_line("r2")
+    assert graph.point_rays["X"] == ("r1",) and "B" not in graph.lines_from
+    assert run(graph, stations=("B",)) == [("estacion", "B")]
+    graph.set_point_rays("X", ("s1",))
+    assert "X" not in graph.ray_points.get("r1", set())
+
+def test_cycles_stop_after_max_rounds():
+    graph = DependencyGraph()
+    graph.add_line("a", "X")
+    graph.add_line("b", "Y")
+    graph.set_point_rays("Y", ("a",))
+    graph.set_point_rays("X", ("b",))
+    calls = []
+    done = graph.propagate(("X",), on_line=lambda *_: None, on_point=lambda name: calls.append(name) or True, max_rounds=5)
+    assert calls == ["Y", "X", "Y", "X", "Y"] and done == 3 * 5
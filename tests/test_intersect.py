@@ -0,0 +1,128 @@
+"""Motor vectorizado de intersecciones frente a la fuerza bruta."""
+import numpy as np
+import pytest
+
+from payomapeo.core.cluster import cluster_hits, least_squares_points, pair_gaps
+from payomapeo.core.geometry import RAY_LENGTH, closest_point_between_rays, dir_from_az_inc, intersection_valid
+from payomapeo.core.intersect import RAY, SEGMENT, candidate_pairs, intersect_pairs, line_arrays, solve_network
+
+def random_network(seed, n_stations=8, n_lines=60, size=400.0):
+    """Líneas casi horizontales desde estaciones al azar, para que muchas se corten en planta."""
+    rng = np.random.default_rng(seed)
+    stations = np.column_stack((rng.uniform(0.0, size, (n_stations, 2)), rng.normal(0.0, 0.05, n_stations)))
+    groups = rng.integers(0, n_stations, n_lines)
+    origins = stations[groups]
+    heights = rng.uniform(0.0, 1.8, n_lines)
+    directions = np.array([dir_from_az_inc(az, inc) for az, inc in
+                           zip(rng.uniform(0.0, 360.0, n_lines), rng.normal(0.0, 0.02, n_lines))])
+    kinds = np.where(rng.random(n_lines) < 0.4, SEGMENT, RAY)
+    directions *= np.where(kinds == SEGMENT, rng.uniform(20.0, 300.0, n_lines), 1.0)[:, None]
+    return origins, heights, directions, kinds, groups
+
+def brute_force(starts, units, lengths, margin, groups=None):
+    """Pares (i, j) válidos probando todos los pares, uno a uno, con las reglas de geometry."""
+    found = set()
+    for i in range(len(starts)):
+        for j in range(i + 1, len(starts)):
+            if groups is not None and groups[i] == groups[j]:
+                continue
+            _, gap, t1, t2 = closest_point_between_rays(tuple(starts[i]), tuple(units[i]), tuple(starts[j]), tuple(units[j]))
+            if intersection_valid(gap, t1, t2, lengths[i], lengths[j], margin):
+                found.add((i, j))
+    return found
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("margin", [0.1, 2.0])
+def test_solve_network_matches_brute_force(seed, margin):
+    origins, heights, directions, kinds, groups = random_network(seed)
+    starts, units, lengths = line_arrays(origins, heights, directions, kinds)
+    expected = brute_force(starts, units, lengths, margin, groups)
+    hits = solve_network(origins, heights, directions, kinds, margin, cell_size=25.0, groups=groups)
+    assert set(zip(hits.i.tolist(), hits.j.tolist())) == expected
+    assert (hits.gaps < margin).all()
+
+@pytest.mark.parametrize("seed", range(20))
+def test_candidate_pairs_cover_every_intersection(seed):
+    margin = 1.0
+    origins, heights, directions, kinds, _ = random_network(seed)
+    starts, units, lengths = line_arrays(origins, heights, directions, kinds)
+    i, j = candidate_pairs(starts, units, lengths, margin, cell_size=10.0)
+    assert (i < j).all()
+    pairs = set(zip(i.tolist(), j.tolist()))
+    assert len(pairs) == len(i), "pares repetidos"
+    assert brute_force(starts, units, lengths, margin) <= pairs
+
+def test_candidate_pairs_without_lines():
+    i, j = candidate_pairs(np.empty((0, 3)), np.empty((0, 3)), np.empty(0), 0.1)
+    assert len(i) == len(j) == 0
+
+def crossing(at):
+    """Dos rayos que se cortan a `at` metros del primero: uno hacia el este y otro hacia el norte."""
+    origins = [(0.0, 0.0, 0.0), (at, -100.0, 0.0)]
+    directions = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0)]
+    return origins, [0.0, 0.0], directions
+
+def test_rays_are_cut_at_ray_length():
+    for at, expected in ((RAY_LENGTH - 1.0, 1), (RAY_LENGTH + 1.0, 0)):
+        origins, heights, directions = crossing(at)
+        hits = solve_network(origins, heights, directions, [RAY, RAY], 0.1)
+        assert len(hits.i) == expected, at
+
+def test_segments_are_cut_at_their_length():
+    origins, heights, directions = crossing(50.0)
+    for length, expected in ((60.0, 1), (40.0, 0)):
+        scaled = [tuple(length * c for c in directions[0]), directions[1]]
+        hits = solve_network(origins, heights, scaled, [SEGMENT, RAY], 0.1)
+        assert len(hits.i) == expected, length
+
+def test_same_station_lines_are_excluded():
+    origins = [(0.0, 0.0, 0.0)] * 2 + [(50.0, -50.0, 0.0)]
+    directions = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 1.0, 0.0)]
+    heights, kinds = [1.5] * 3, [RAY] * 3
+    both = solve_network(origins, heights, directions, kinds, 0.1)
+    assert set(zip(both.i.tolist(), both.j.tolist())) == {(0, 1), (0, 2)}  # (0, 1) en el propio punto de vista
+    apart = solve_network(origins, heights, directions, kinds, 0.1, groups=[0, 0, 1])
+    assert set(zip(apart.i.tolist(), apart.j.tolist())) == {(0, 2)}
+    assert np.allclose(apart.points[0], (50.0, 0.0, 1.5))
+
+def test_intersect_pairs_without_pairs():
+    starts, units, lengths = line_arrays([(0.0, 0.0, 0.0)], [0.0], [(1.0, 0.0, 0.0)], [RAY])
+    hits = intersect_pairs(starts, units, lengths, [], [], 0.1)
+    assert len(hits.i) == 0 and hits.points.shape == (0, 3)
+
+def test_least_squares_points():
+    target = np.array([10.0, 20.0, 3.0])
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(-50.0, 50.0, (4, 3))
+    units = target - starts  # sin normalizar: la función lo hace
+    # Grupo 0: cuatro rectas que pasan por el objetivo. Grupo 1: dos rectas que se cruzan a 0.2 m
+    starts = np.vstack((starts, [(0.0, 0.0, 0.0), (5.0, -5.0, 0.2)]))
+    units = np.vstack((units, [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0)]))
+    X, rms = least_squares_points(starts, units, [0, 0, 0, 0, 1, 1], 2)
+    assert np.allclose(X[0], target)
+    assert rms[0] == pytest.approx(0.0, abs=1e-9)
+    # Con dos rectas: el punto medio de la perpendicular común, a medio hueco de cada una
+    M, gap, _, _ = closest_point_between_rays((0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (5.0, -5.0, 0.2), (0.0, 1.0, 0.0))
+    assert np.allclose(X[1], M)
+    assert rms[1] == pytest.approx(gap / 2.0)
+
+def test_pair_gaps():
+    # Grupo 0: dos rectas a 0.2 m. Grupo 1: tres rectas, la más separada a 2 m. Grupo 2: una sola recta
+    starts = [(0.0, 0.0, 0.0), (5.0, -5.0, 0.2), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (3.0, 0.0, 0.0), (0.0, 0.0, 0.0)]
+    units = [(1.0, 0.0, 0.0), (0.0, 2.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0), (1.0, 0.0, 0.0)]
+    gaps = pair_gaps(starts, units, [0, 0, 1, 1, 1, 2], 3)
+    assert np.allclose(gaps, [0.2, 2.0, 0.0])
+
+def test_cluster_hits_joins_existing_points():
+    # Tres visuales al (50, 50, 0): la 0 y la 1 ya definen un punto; la 2 es nueva. La 3 va a otro sitio
+    origins = [(0.0, 0.0, 0.0), (100.0, 0.0, 0.0), (50.0, 0.0, 0.0), (0.0, 200.0, 0.0)]
+    directions = [(1.0, 1.0, 0.0), (-1.0, 1.0, 0.0), (0.0, 1.0, 0.0), (1.0, 0.0, 0.0)]
+    starts, units, lengths = line_arrays(origins, [0.0] * 4, directions, [RAY] * 4)
+    hits = intersect_pairs(starts, units, lengths, [0, 1, 2], [2, 2, 3], 0.1)
+    anchors = [((50.0, 50.0, 0.0), [0, 1])]
+    clusters = sorted(cluster_hits(starts, units, hits, 0.1, anchors), key=lambda cluster: cluster.anchor is None)
+    assert [(cluster.anchor, cluster.rays) for cluster in clusters] == [(0, (0, 1, 2)), (None, (2, 3))]
+    assert np.allclose(clusters[0].location, (50.0, 50.0, 0.0))
+    assert clusters[0].gap == pytest.approx(0.0, abs=1e-9) and clusters[0].rms == pytest.approx(0.0, abs=1e-9)
+    # Sin puntos existentes, los mismos cortes dan dos puntos nuevos
+    assert sorted(cluster.rays for cluster in cluster_hits(starts, units, hits, 0.1)) == [(0, 1, 2), (2, 3)]
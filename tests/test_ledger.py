@@ -0,0 +1,67 @@
+"""Registro de pares: qué queda por resolver al sellar, volver a añadir y guardar."""
+import numpy as np
+
+from payomapeo.core.ledger import PairLedger, line_identity
+
+def ledger(*names):
+    """Registro con una línea por nombre, cada una con su identidad."""
+    ledger = PairLedger(0.1)
+    for k, name in enumerate(names):
+        ledger.add(name, line_identity("A", "rayo_observacion", (1.0, float(k), 0.0)))
+    return ledger
+
+def pending(ledger, a, b):
+    return ledger.pending(ledger.ids([a]), ledger.ids([b])).tolist()
+
+def test_sealed_lines_become_pending_when_added_again():
+    book = ledger("r0", "r1")
+    assert pending(book, "r0", "r1") == [True]
+    book.seal(book.ids(["r0", "r1"]))
+    assert book.is_sealed("r0") and pending(book, "r0", "r1") == [False]
+    # Misma identidad sin cambios: lo resuelto sigue valiendo
+    book.add("r0", book.identities[book.names["r0"]], fresh=False)
+    assert pending(book, "r0", "r1") == [False]
+    # La geometría ha cambiado: vuelve a estar por resolver hasta sellarla otra vez
+    book.add("r0", book.identities[book.names["r0"]])
+    assert not book.is_sealed("r0") and pending(book, "r0", "r1") == [True]
+    book.seal(book.ids(["r0"]))
+    assert pending(book, "r0", "r1") == [False]
+
+def test_recorded_pair_without_hit_is_done():
+    book = ledger("r0", "r1", "r2")
+    book.record(book.ids(["r0"]), book.ids(["r1"]))
+    assert pending(book, "r0", "r1") == [False] and pending(book, "r1", "r0") == [False]
+    assert pending(book, "r0", "r2") == [True]
+    # Un par apuntado antes de que cambie una de sus líneas ya no vale
+    book.add("r1", book.identities[book.names["r1"]])
+    assert pending(book, "r0", "r1") == [True]
+
+def test_unknown_lines_are_pending():
+    book = ledger("r0")
+    assert book.pending(np.array([0, -1]), np.array([-1, 0])).tolist() == [True, True]
+
+def test_bytes_round_trip():
+    book = ledger("r0", "r1", "r2", "r3")
+    book.seal(book.ids(["r0", "r1"]))
+    book.record(book.ids(["r2"]), book.ids(["r3"]))
+    again = PairLedger.from_bytes(book.to_bytes())
+    assert again.margin == book.margin and again.clock == book.clock
+    assert again.identities == book.identities and again.names == book.names
+    a, b = np.triu_indices(4, 1)
+    assert again.pending(a, b).tolist() == book.pending(a, b).tolist()
+    assert again.find(book.identities[2]) == "r2"
+    # Sigue funcionando después de cargado
+    assert again.add("r4", line_identity("B", "rayo_observacion", (0.0, 1.0, 0.0))) == 4
+    assert again.pending(np.array([0]), np.array([4])).tolist() == [True]
+
+def test_snapshot_does_not_seal_lines_changed_after_it():
+    book = ledger("r0", "r1", "r2")
+    snapshot = book.snapshot(["r0", "r1", "r2"])
+    assert snapshot.pending(np.array([0, 0]), np.array([1, 2])).tolist() == [True, True]
+    book.add("r1", book.identities[book.names["r1"]])  # cambia mientras se resuelve en otro hilo
+    snapshot.seal()
+    assert book.is_sealed("r0") and book.is_sealed("r2")
+    assert not book.is_sealed("r1")
+    assert pending(book, "r0", "r2") == [False]
+    # r0 y r2 se sellaron antes de que cambiara r1: sus pares con él siguen por resolver
+    assert pending(book, "r0", "r1") == [True] and pending(book, "r1", "r2") == [True]
@@ -0,0 +1,112 @@
+"""LiveFeed contra un servidor HTTP local que hace de dioptra."""
+import math
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from payomapeo.core.live import LiveFeed
+
+# Lo que devuelve /json de la dioptra: `nan` sin comillas si un sensor no responde,
+# 8191 mm si el láser está fuera de rango y la altura calibrada en mm
+BODY = ('{"distancia":%s,"inclinacion":1.5,"alabeo":0.0,"acimut":123.4,"altitud":600.0,'
+        '"tempmpu":nan,"tempbmp":20.5,"presion":1013.2,"distancia_suelo_calibrada":1500}')
+
+class Dioptra(BaseHTTPRequestHandler):
+    distance = "2345"
+
+    def do_GET(self):
+        if self.path != "/json":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write((BODY % self.distance).encode("ascii"))
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def dioptra():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Dioptra)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    Dioptra.distance = "2345"
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_readings_from_local_server(dioptra):
+    feed = LiveFeed(dioptra + "/json", interval=0.02)
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.received >= 3)
+    finally:
+        feed.stop()
+    assert not feed.running
+    readings = feed.drain()
+    assert len(readings) >= 3 and feed.drain() == []
+    stamps = [stamp for stamp, _ in readings]
+    assert stamps == sorted(stamps)
+    reading = readings[-1][1]
+    assert reading.azimuth == pytest.approx(123.4)
+    assert reading.inclination == pytest.approx(1.5)
+    assert reading.distance == pytest.approx(2.345)       # mm -> m
+    assert reading.ground_distance == pytest.approx(1.5)  # altura calibrada, mm -> m
+    assert math.isnan(reading.temp_mpu)
+    assert reading.temp_bmp == pytest.approx(20.5)
+    assert feed.errors == 0 and feed.error is None
+
+def test_out_of_range_distance_is_zero(dioptra):
+    Dioptra.distance = "8191"
+    feed = LiveFeed(dioptra + "/json", interval=0.02)
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.received >= 1)
+    finally:
+        feed.stop()
+    assert feed.drain()[0][1].distance == 0.0
+
+def test_full_queue_drops_oldest(dioptra):
+    feed = LiveFeed(dioptra + "/json", interval=0.01, maxlen=2)
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.dropped >= 1)
+    finally:
+        feed.stop()
+    assert len(feed.drain()) == 2
+
+def test_http_error_is_reported(dioptra):
+    feed = LiveFeed(dioptra + "/no-existe", interval=0.02)
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.errors >= 1)
+    finally:
+        feed.stop()
+    assert "404" in feed.error
+    assert feed.received == 0 and not feed.running
+
+def test_bad_port_stops_cleanly():
+    feed = LiveFeed(f"http://127.0.0.1:{free_port()}/json", interval=0.02, timeout=0.5)
+    feed.start()
+    assert wait_for(lambda: feed.errors >= 2)
+    start = time.monotonic()
+    feed.stop()
+    assert not feed.running
+    assert time.monotonic() - start < 1.0  # la espera entre reintentos se interrumpe al parar
+    assert feed.received == 0 and feed.error
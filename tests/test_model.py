@@ -0,0 +1,67 @@
+"""Survey: puntos de intersección que se reutilizan como estaciones."""
+from math import atan2, degrees, hypot
+
+import pytest
+
+from payomapeo.core.intersect import line_arrays
+from payomapeo.core.model import Survey
+from payomapeo.core.parallel import intersection_plan
+
+def crossings():
+    """A y B visan dos objetivos comunes: salen `Int_A_B` en (50, 50, 0) e `Int_A_B.001` en (50, 20, 10).
+
+    Las visuales a uno y otro objetivo se cruzan en planta pero no en altura.
+    """
+    survey = Survey()
+    survey.add_station("A", (0.0, 0.0, 0.0))
+    survey.add_station("B", (100.0, 0.0, 0.0))
+    survey.add_station("C", (0.0, 100.0, 0.0))
+    survey.observe("A", 45.0, 0.0)
+    survey.observe("B", 135.0, 0.0)
+    up = degrees(atan2(10.0, hypot(50.0, 20.0)))
+    survey.observe("A", degrees(atan2(20.0, 50.0)), up)
+    survey.observe("B", 180.0 - degrees(atan2(20.0, 50.0)), up)
+    return survey
+
+def test_resolve_with_observations_from_a_derived_point():
+    survey = crossings()
+    points = {point.name: point for point in survey.intersect(0.1)}
+    assert set(points) == {"Int_A_B", "Int_A_B.001"}
+    assert points["Int_A_B"].location == pytest.approx((50.0, 50.0, 0.0))
+    # Desde el segundo punto, con la vista por encima de las visuales que lo definen
+    survey.observe("Int_A_B.001", 90.0, 0.0, 10.0, observer_height=1.5, target="Q")
+    again = {point.name: point for point in survey.intersect(0.1)}
+    assert set(again) == {"Int_A_B", "Int_A_B.001"}
+    assert again["Int_A_B.001"].location == pytest.approx((50.0, 20.0, 10.0))
+    assert survey.location("Int_A_B.001") == pytest.approx((50.0, 20.0, 10.0))
+
+def test_names_follow_the_rays_not_the_order():
+    survey = crossings()
+    survey.intersect(0.1)
+    survey.observe("Int_A_B.001", 90.0, 0.0, 10.0, observer_height=1.5, target="Q")
+    # Una visual nueva desde C al primer objetivo: el punto crece y los dos nombres siguen en su sitio
+    survey.observe("C", -45.0, 0.0)
+    points = {point.name: point for point in survey.intersect(0.1)}
+    assert points["Int_A_B"].rays == (0, 1, 5)
+    assert points["Int_A_B.001"].rays == (2, 3)
+
+def test_observed_point_is_kept_when_it_no_longer_intersects():
+    survey = crossings()
+    survey.intersect(0.1)
+    survey.observe("Int_A_B", 0.0, 0.0, 10.0, observer_height=1.5, target="Q")
+    survey.observations[1] = survey.observations[1]._replace(azimuth=300.0)  # B ya no visa ese objetivo
+    points = {point.name: point for point in survey.intersect(0.1)}
+    assert "Int_A_B" in points and points["Int_A_B"].location == pytest.approx((50.0, 50.0, 0.0))
+    assert len(survey.intersect(0.1)) == len(points)
+
+def test_plan_result_applies_after_observing_from_a_derived_point():
+    """El resultado de la intersección en segundo plano se aplica con `set_intersections`."""
+    survey = crossings()
+    survey.intersect(0.1)
+    survey.observe("Int_A_B.001", 90.0, 0.0, 10.0, observer_height=1.5, target="Q")
+    origins, heights, directions, kinds, groups = survey.line_arrays()
+    starts, units, lengths = line_arrays(origins, heights, directions, kinds)
+    tasks, combine = intersection_plan(starts, units, lengths, 0.1, groups=groups, n_tasks=2)
+    points = {point.name: point for point in survey.set_intersections(combine([f(*args) for f, args in tasks]), 0.1)}
+    assert set(points) == {"Int_A_B", "Int_A_B.001"}
+    assert points["Int_A_B.001"].location == pytest.approx((50.0, 20.0, 10.0))
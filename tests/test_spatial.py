@@ -0,0 +1,93 @@
+"""Índice espacial de líneas: las candidatas frente a la distancia en planta calculada a mano."""
+from math import cos, hypot, radians, sin
+
+import numpy as np
+import pytest
+
+from payomapeo.core.spatial import LineIndex
+
+CELL = 25.0
+
+def point_segment(p, a, b):
+    ab = b - a
+    t = np.clip(np.dot(p - a, ab) / np.dot(ab, ab), 0.0, 1.0) if np.dot(ab, ab) else 0.0
+    return float(np.linalg.norm(p - (a + t * ab)))
+
+def plan_distance(a0, a1, b0, b1):
+    """Distancia en planta entre dos tramos."""
+    d1, d2 = a1 - a0, b1 - b0
+    den = d1[0] * d2[1] - d1[1] * d2[0]
+    if den:
+        w = b0 - a0
+        t = (w[0] * d2[1] - w[1] * d2[0]) / den
+        u = (w[0] * d1[1] - w[1] * d1[0]) / den
+        if 0.0 <= t <= 1.0 and 0.0 <= u <= 1.0:
+            return 0.0
+    return min(point_segment(a0, b0, b1), point_segment(a1, b0, b1), point_segment(b0, a0, a1), point_segment(b1, a0, a1))
+
+def random_lines(seed, n=80):
+    rng = np.random.default_rng(seed)
+    lines = []
+    for k in range(n):
+        P = rng.uniform(-150.0, 150.0, 3)
+        az = rng.uniform(0.0, 360.0)
+        v = (cos(radians(az)), sin(radians(az)), rng.uniform(-0.2, 0.2))
+        lines.append((f"L{k}", P, v, rng.uniform(1.0, 120.0), f"E{k % 7}"))
+    # Sobre bordes de celda, verticales y horizontales, y de longitud nula
+    lines += [("borde_x", (25.0, -60.0, 0.0), (0.0, 1.0, 0.0), 120.0, "F"),
+              ("borde_y", (-80.0, 50.0, 0.0), (1.0, 0.0, 0.0), 160.0, "F"),
+              ("esquina", (0.0, 0.0, 0.0), (-1.0, -1.0, 0.0), 70.0, "F"),
+              ("punto", (12.0, 12.0, 0.0), (0.0, 0.0, 1.0), 5.0, "G")]
+    return lines
+
+def ends(P, v, length):
+    P, v = np.asarray(P, dtype=float)[:2], np.asarray(v, dtype=float)[:2]
+    return P, P + length * v
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_candidates_match_brute_force(seed):
+    lines = random_lines(seed)
+    index = LineIndex(CELL)
+    for name, P, v, length, origin in lines:
+        index.insert(name, P, v, length, origin)
+    segments = {name: ends(P, v, length) for name, P, v, length, _ in lines}
+    for name, P, v, length, _ in lines:
+        found = index.candidates(P, v, length)
+        for other, (b0, b1) in segments.items():
+            distance = plan_distance(*segments[name], b0, b1)
+            if distance < CELL:  # a menos de una celda (el margen máximo): tiene que salir
+                assert other in found, (name, other, distance)
+            elif distance > 2 * hypot(CELL, CELL):  # más allá de dos celdas vecinas: no puede salir
+                assert other not in found, (name, other, distance)
+
+def test_traverse_visits_contiguous_cells():
+    index = LineIndex(CELL)
+    for P, v, length in [((3.0, 4.0, 0.0), (0.6, 0.8, 0.0), 200.0), ((-1.0, -1.0, 0.0), (-1.0, 0.0, 0.0), 80.0),
+                         ((25.0, 25.0, 0.0), (-0.6, 0.8, 0.0), 130.0), ((10.0, 10.0, 0.0), (0.0, 1.0, 0.0), 0.0)]:
+        cells = index._traverse(P, v, length)
+        assert cells[0] == (int(np.floor(P[0] / CELL)), int(np.floor(P[1] / CELL)))
+        end = (P[0] + v[0] * length, P[1] + v[1] * length)
+        assert cells[-1] == (int(np.floor(end[0] / CELL)), int(np.floor(end[1] / CELL)))
+        assert all(abs(i1 - i0) + abs(j1 - j0) == 1 for (i0, j0), (i1, j1) in zip(cells, cells[1:]))
+
+def test_margin_near_a_cell_border():
+    """Dos líneas paralelas a lados de un borde de celda, a menos del margen."""
+    index = LineIndex(CELL)
+    index.insert("a", (0.0, 24.9, 0.0), (1.0, 0.0, 0.0), 10.0, "A")
+    index.insert("b", (0.0, 25.1, 0.0), (1.0, 0.0, 0.0), 10.0, "B")
+    index.insert("lejos", (0.0, 100.0, 0.0), (1.0, 0.0, 0.0), 10.0, "C")
+    assert index.candidates((0.0, 24.9, 0.0), (1.0, 0.0, 0.0), 10.0) == {"a", "b"}
+    assert index.candidates((0.0, 24.9, 0.0), (1.0, 0.0, 0.0), 10.0, exclude_origin="A") == {"b"}
+
+def test_remove_and_reinsert():
+    index = LineIndex(CELL)
+    index.insert("a", (0.0, 0.0, 0.0), (1.0, 0.0, 0.0), 100.0, "A")
+    index.insert("b", (50.0, -10.0, 0.0), (0.0, 1.0, 0.0), 20.0, "A")
+    index.remove("a")
+    assert "a" not in index and len(index) == 1
+    assert index.candidates((0.0, 0.0, 0.0), (1.0, 0.0, 0.0), 10.0) == set()
+    index.insert("b", (500.0, 500.0, 0.0), (1.0, 0.0, 0.0), 10.0, "B")  # se mueve y cambia de estación
+    assert index.candidates((50.0, 0.0, 0.0), (1.0, 0.0, 0.0), 1.0) == set()
+    assert index.groups == {"B": {"b"}}
+    index.remove("b")
+    assert not index.cells and not index.groups
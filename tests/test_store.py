@@ -0,0 +1,63 @@
+"""Tabla de observaciones: índices por estación y empaquetado."""
+import io
+
+import numpy as np
+import pytest
+
+from payomapeo.core.store import COLUMNS, ObservationTable
+
+def table():
+    table = ObservationTable(capacity=2)  # crece al añadir
+    table.add("r1", tipo="rayo_observacion", origen="A", vector=(1.0, 0.0, 0.0), observer_height=1.5)
+    table.add("s1", tipo="observacion_segmento", origen="A", destino="P", vector=(0.0, 3.0, 0.0), dist_texto="dist_A_P")
+    table.add("s2", tipo="observacion_segmento", origen="B", destino="P", vector=(0.0, -4.0, 0.0), is_projected=True)
+    table.add("m1", tipo="linea_manual", origen="P", destino="A", residuo=(0.1, None, 0.2))
+    return table
+
+def test_indexes_after_remove():
+    t = table()
+    assert t.rows_from("A") == [0, 1] and t.rows_to("P") == [1, 2] and t.rows_to("A") == [3]
+    t.remove(["s1", "no_existe"])
+    assert t.rows_from("A") == [0] and t.rows_to("P") == [2]
+    t.remove(["m1"])
+    assert t.rows_to("A") == [] and t.rows_from("P") == []
+    assert "s1" not in t and len(t) == 2 and t.rows().tolist() == [0, 2]
+    # Cambiar el origen mueve la fila de índice
+    t.set("s2", origen="A", destino=None)
+    assert t.rows_from("A") == [0, 2] and t.rows_from("B") == [] and t.rows_to("P") == []
+    assert t.add("s1", origen="C") == 4  # un nombre borrado vuelve como fila nueva
+    assert t.rows_from("C") == [4]
+
+def test_bytes_round_trip():
+    t = table()
+    t.remove(["s1"])
+    again = ObservationTable.from_bytes(t.to_bytes())
+    assert again.names == ["r1", "s2", "m1"]
+    for name in again.names:
+        for key in COLUMNS:
+            a, b = again.get(name, key), t.get(name, key)
+            assert a == b or np.allclose(a, b, equal_nan=True), (name, key, a, b)
+    assert again.get("m1", "residuo") == pytest.approx((0.1, np.nan, 0.2), nan_ok=True)
+    assert again.rows_from("A") == [0] and again.rows_to("P") == [1] and again.rows_to("A") == [2]
+    assert "dist_A_P" not in again.strings  # solo se guardan las cadenas que se usan
+    # Sigue funcionando después de cargada
+    again.remove(["r1"])
+    again.add("r2", origen="A")
+    assert again.rows_from("A") == [3] and len(again) == 3
+
+def test_where_and_columns():
+    t = table()
+    assert t.where("tipo", {"observacion_segmento", "no_hay"}).tolist() == [1, 2]
+    assert t.column("destino") == [None, "P", "P", "A"]
+    assert t.column("is_projected").tolist() == [False, False, True, False]
+    assert t.get("r1", "destino", "-") == "-" and t.get("s1", "observer_height") is None
+
+def test_unknown_version_is_rejected():
+    data = ObservationTable().to_bytes()
+    t = ObservationTable.from_bytes(data)
+    assert len(t) == 0
+    buffer = io.BytesIO()
+    with np.load(io.BytesIO(data)) as blob:
+        np.savez(buffer, **{**dict(blob), "version": np.array(99)})
+    with pytest.raises(ValueError):
+        ObservationTable.from_bytes(buffer.getvalue())